@@ -1,17 +1,34 @@
+import time
+_IMPORT_START = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import io
-import time
 import os
 import json
 from auth import get_authenticated_session
+from bacdive_client import configure_endpoints, configure_transport, is_offline, needs_credentials
+from cache_backend import configure_cache_backend
+from fetch_queue import FINISHED_STATUSES, configure_queue, get_fetch_queue
 from bacdive_mapper import (
     fetch_and_cache_profiles_by_taxonomy,
-    calculate_weighted_similarity,
-    normalize_columns,
+    parse_user_ranges,
     get_single_strain_json,
-    WEIGHTS 
+    has_valid_cache,
+    load_cache,
+    cache_version,
+    get_weight_presets,
+    MatchMatrix,
 )
+from range_index import get_range_index
+from input_loader import load_upload, sample_records
+from report_builder import REPORT_FORMATS, submit_report
+from profile_table import EXPORTERS, build_profile_table
+from species_consensus import build_species_consensus, get_species_profiles
+from likelihood_tables import LikelihoodMatrix, build_likelihood_tables, get_likelihood_tables
+from startup import StartupTimer, start_background_warmup
+import metrics
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 # --- 1. Konfigurasi Aplikasi ---
 st.set_page_config(
@@ -20,14 +37,53 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Fragment (Streamlit >= 1.37) dirender ulang secara terpisah dari skrip utama
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+RESULTS_PAGE_SIZES = (10, 25, 50, 100)
+poll_fragment = fragment(run_every=2) if hasattr(st, "fragment") else (lambda func: func)
+DETAIL_PAGE_SIZES = (100, 250, 500, 1000)
+REPORT_FORMAT_LABELS = {"docx": ".docx", "xlsx": ".xlsx", "html": ".html", "csv": "CSV (.zip)"}
+# Saat ganti preset, detail perbandingan hanya disusun ulang untuk kandidat teratas ini
+RERANK_DETAIL_LIMIT = 10
+SCORING_METHODS = {"weighted": "Kemiripan berbobot", "probabilistic": "Probabilistik (posterior per spesies)"}
+
 # --- 2. Inisialisasi Sesi ---
+@st.cache_resource
+def get_startup_timer():
+    """Timer fase startup, satu per proses server; fase impor dicatat saat pertama dibuat."""
+    timer = StartupTimer()
+    timer.record("import modul", _IMPORT_SECONDS)
+    return timer
+
 @st.cache_resource
 def init_session():
+    timer = get_startup_timer()
+    # Opsional: event metrik ditulis ke log JSON-lines ([metrics] log_file di secrets.toml)
+    metrics_log = st.secrets.get("metrics", {}).get("log_file")
+    if metrics_log:
+        metrics.METRICS.configure_log(metrics_log)
     try:
-        email = st.secrets["bacdive"]["email"]
-        password = st.secrets["bacdive"]["password"]
-        session = get_authenticated_session(email, password)
+        settings = st.secrets.get("bacdive", {})
+        # Opsional: arahkan ke server lain (mis. mock_bacdive_server.py untuk uji lokal)
+        configure_endpoints(settings.get("api_base_url"), settings.get("token_url"))
+        # Opsional: mode offline ketat atau record/replay arsip fixture
+        configure_transport(settings.get("mode"), settings.get("fixture_dir"))
+        # Opsional: backend cache (json/sqlite) dan cache bersama antar replika (redis://...)
+        cache_settings = st.secrets.get("cache", {})
+        configure_cache_backend(cache_settings.get("backend"), cache_settings.get("path"), cache_settings.get("shared_url"))
+        # Opsional: lokasi antrian job untuk worker latar belakang (cache_manager.py worker)
+        configure_queue(st.secrets.get("queue", {}).get("path"))
+        if needs_credentials():
+            email = settings["email"]
+            password = settings["password"]
+        else:
+            email = password = None
+        with timer.phase("autentikasi"):
+            session = get_authenticated_session(email, password)
         if session:
+            # Profile store dimuat (dan genus di [startup] prefetch_genera diambil) di latar belakang
+            prefetch_genera = st.secrets.get("startup", {}).get("prefetch_genera", [])
+            start_background_warmup(session, prefetch_genera, timer)
             return session
         else:
             st.error("Autentikasi BacDive gagal. Periksa kredensial Anda di secrets.toml.")
@@ -39,6 +95,32 @@ def init_session():
         st.error(f"Gagal menginisialisasi sesi: {e}")
         return None
 
+def render_performance_panel():
+    """Panel sidebar: durasi per tahap, rasio cache hit, dan jumlah status HTTP sejak server dimulai."""
+    snap = metrics.snapshot()
+    if not snap["timings"] and not snap["counters"]:
+        st.caption("Belum ada data performa.")
+        return
+    if snap["timings"]:
+        st.dataframe(
+            pd.DataFrame([{
+                "Tahap": t["name"] + "".join(f" [{v}]" for v in t["labels"].values()),
+                "Jumlah": t["count"],
+                "Total (s)": round(t["total"], 3),
+                "Rata-rata (ms)": round(t["mean"] * 1000, 1),
+                "Maks (ms)": round(t["max"] * 1000, 1),
+            } for t in snap["timings"]]),
+            hide_index=True,
+        )
+    for label, name in (("Cache genus", "cache_lookups"), ("Cache file (memo)", "cache_file_loads")):
+        counts = metrics.counter_values(snap, name, "result")
+        ratio = metrics.hit_ratio(counts, hit="hit" if name == "cache_lookups" else "memo")
+        if ratio is not None:
+            st.caption(f"{label}: {ratio:.0%} hit dari {sum(counts.values())} lookup")
+    statuses = metrics.counter_values(snap, "http_responses", "status")
+    if statuses:
+        st.caption("Status HTTP: " + ", ".join(f"{s}×{n}" for s, n in sorted(statuses.items())))
+
 # --- 3. PERBAIKAN: Fungsi Debug untuk Testing ---
 def test_json_structure(session, genus="Bacillus"):
     """Fungsi untuk testing struktur JSON response."""
@@ -93,8 +175,18 @@ def test_json_structure(session, genus="Bacillus"):
                                 st.json({k: v for k, v in morphology.items() if k in ['cell morphology', 'motility', 'gram stain']})
 
 # --- 4. PERBAIKAN: Logika Inti dengan Enhanced Logging ---
-def process_sample(session, user_input, log_container):
-    """Fungsi utama untuk memproses satu sampel: fetch, cache, dan analisis."""
+def process_sample(session, user_input, log_container, range_min_overlap=0.0, species_first=False, strain_drilldown=3, weights=None, scoring=None, probabilistic=False):
+    """
+    Fungsi utama untuk memproses satu sampel: fetch, cache, dan analisis.
+    Jika range_min_overlap > 0, kandidat lebih dulu disaring lewat index rentang
+    (suhu/pH/NaCl) sehingga hanya strain dengan overlap minimal tersebut yang dinilai.
+    Jika species_first aktif, yang dinilai adalah profil konsensus per spesies; strain dari
+    `strain_drilldown` spesies teratas dinilai ulang dan disimpan di result["strains"].
+    Jika probabilistic aktif, spesies diranking menurut posterior dari tabel likelihood
+    (likelihood_tables.py), juga dengan drill-down strain.
+    `weights` adalah WeightVector preset Mode Akuakultur milik sesi ini. Jika dict `scoring`
+    diberikan, matriks kecocokan disimpan di sana agar hasil bisa dinilai ulang (rerank_reports).
+    """
     genus = user_input.get("Genus")
     if not genus or pd.isna(genus):
         st.warning("Kolom 'Genus' tidak ditemukan atau kosong untuk sampel ini. Sampel dilewati.")
@@ -131,108 +223,180 @@ def process_sample(session, user_input, log_container):
         status_placeholder.empty()
         return []
     
+    # Rentang input di-parse sekali per sampel
+    user_ranges = parse_user_ranges(user_input)
+    total_fetched = len(raw_profiles)
+
+    if range_min_overlap > 0:
+        allowed_ids = get_range_index(genus, raw_profiles).filter_ids(user_ranges, range_min_overlap)
+        if allowed_ids is not None:
+            raw_profiles = {bid: p for bid, p in raw_profiles.items() if str(bid) in allowed_ids}
+            log_container.info(f"📐 Filter rentang (overlap ≥ {range_min_overlap:.0%}): {len(raw_profiles)} kandidat tersisa")
+            if not raw_profiles:
+                status_placeholder.warning(f"Tidak ada profil genus '{genus}' yang lolos filter rentang pertumbuhan.")
+                return []
+
     status_placeholder.success(f"Ditemukan {len(raw_profiles)} profil untuk genus '{genus}'. Memulai analisis perbandingan...")
     log_container.info(f"✅ Found {len(raw_profiles)} valid profiles. Starting similarity analysis...")
     time.sleep(2)
 
-    # PERBAIKAN: Melanjutkan bagian yang terpotong
-    identification_results = []
     progress_bar = st.progress(0)
-    total_profiles = len(raw_profiles)
 
-    for i, (bacdive_id, bacdive_profile) in enumerate(raw_profiles.items()):
-        status_placeholder.text(f"⚙️ Membandingkan dengan profil {i+1} dari {total_profiles} (ID: {bacdive_id})...")
-        
-        try:
-            score, details = calculate_weighted_similarity(user_input, bacdive_profile)
-            
-            # PERBAIKAN: Enhanced logging untuk debugging similarity calculation
-            log_container.info(f"🧮 Similarity calculated for ID {bacdive_id}: {score:.2f}%")
-            
-            if score > 0:
-                identification_results.append({
-                    "Rank": 0,
-                    "Nama Bakteri": bacdive_profile.get("Nama Bakteri", "N/A"),
-                    "Persentase": score,
-                    "ID": bacdive_id,
-                    "details": details
-                })
-        except Exception as e:
-            log_container.error(f"❌ Error calculating similarity for ID {bacdive_id}: {str(e)}")
-            continue
-            
-        progress_bar.progress((i + 1) / total_profiles)
+    def update_progress(i, total, bacdive_id):
+        status_placeholder.text(f"⚙️ Membandingkan dengan profil {i} dari {total} (ID: {bacdive_id})...")
+        progress_bar.progress(i / total)
+
+    if probabilistic:
+        # Tabel likelihood tersimpan di cache hanya untuk genus utuh (tanpa filter rentang)
+        if len(raw_profiles) == total_fetched:
+            tables = get_likelihood_tables(genus, raw_profiles)
+        else:
+            tables = build_likelihood_tables(raw_profiles)
+        log_container.info(f"🎲 Tabel likelihood: {len(tables['taxa'])} spesies x {len(tables['tests'])} uji")
+    elif species_first:
+        # Skoring per spesies: satu profil konsensus per spesies, lalu drill-down ke strain
+        if len(raw_profiles) == total_fetched:
+            candidates = get_species_profiles(genus, raw_profiles)
+        else:
+            candidates = build_species_consensus(raw_profiles)
+        log_container.info(f"🧬 {len(raw_profiles)} strain diringkas menjadi {len(candidates)} profil spesies")
+    else:
+        candidates = raw_profiles
+
+    # Matriks kecocokan tidak bergantung bobot; disimpan untuk ganti preset tanpa menilai ulang
+    with metrics.span("scoring"):
+        if probabilistic:
+            matrix = LikelihoodMatrix(user_input, tables)
+            candidates = dict(zip(matrix.ids, matrix.profiles))
+        else:
+            matrix = MatchMatrix(user_input, candidates, user_ranges)
+        identification_results = matrix.rank(weights, log_container=log_container, progress_callback=update_progress)
+        strain_matrix = None
+        if species_first or probabilistic:
+            strain_matrix = MatchMatrix(user_input, raw_profiles, user_ranges)
+            attach_strain_drilldown(identification_results, candidates, strain_matrix, weights, strain_drilldown)
+    if scoring is not None:
+        scoring.update(matrix=matrix, strain_matrix=strain_matrix, candidates=candidates, strain_drilldown=strain_drilldown)
 
     status_placeholder.text("✅ Perbandingan selesai!")
     time.sleep(1)
     status_placeholder.empty()
     progress_bar.empty()
     
-    # Sort results by similarity score
-    identification_results.sort(key=lambda x: x["Persentase"], reverse=True)
-    for i, result in enumerate(identification_results):
-        result["Rank"] = i + 1
-    
     log_container.info(f"🎯 Final results: {len(identification_results)} matches found")
     if identification_results:
         log_container.info(f"🏆 Top match: {identification_results[0]['Nama Bakteri']} ({identification_results[0]['Persentase']:.2f}%)")
         
     return identification_results
 
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_profile_table(genera, store_version):
+    """Tabel detail kolumnar untuk genus terpilih; di-cache per versi cache (store_version)."""
+    return build_profile_table(load_cache(), genera)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def export_profile_table(genera, store_version, fmt):
+    """Isi file unduhan (CSV/Parquet), dibuat hanya saat diminta dan di-cache per versi cache."""
+    return EXPORTERS[fmt][2](load_profile_table(genera, store_version))
+
+JOB_STATUS_LABELS = {"queued": "⏳ Antre", "running": "⬇️ Diambil", "done": "✅ Selesai", "failed": "❌ Gagal"}
+
+@poll_fragment
+def _poll_fetch_jobs(genera):
+    """Status job fetch di worker latar belakang; rerun penuh setelah semua genus selesai."""
+    jobs = get_fetch_queue().jobs(genera)
+    finished = sum(1 for job in jobs.values() if job["status"] in FINISHED_STATUSES)
+    if finished == len(genera):
+        st.rerun()
+    st.progress(finished / len(genera), text=f"Worker mengambil profil: {finished}/{len(genera)} genus selesai")
+    st.dataframe(pd.DataFrame([{
+        "Genus": genus,
+        "Status": JOB_STATUS_LABELS.get(jobs[genus]["status"], jobs[genus]["status"]) if genus in jobs else "-",
+        "Progres": jobs[genus]["message"] if genus in jobs else "",
+        "Permintaan": jobs[genus]["requests"] if genus in jobs else 0,
+    } for genus in genera]), hide_index=True)
+    st.caption("Unduhan tetap berjalan di worker walaupun halaman ini ditutup; buka lagi untuk melihat hasilnya.")
+    if st.button("🔄 Cek status unduhan", key="fetch-jobs-poll"):
+        st.rerun()
+
+def queue_genus_downloads(genera_list):
+    """
+    Jika ada worker latar belakang yang hidup, genus yang belum ada di cache dimasukkan ke antrian
+    dan halaman berhenti di sini sampai semua job selesai. Mengembalikan genus yang sudah ditangani
+    worker (tidak perlu diambil di skrip ini).
+    """
+    if is_offline() or not get_fetch_queue().active_workers():
+        return set()
+    pending = tuple(str(g) for g in genera_list if not has_valid_cache(str(g)))
+    if not pending:
+        return set()
+    jobs = get_fetch_queue().enqueue(pending)
+    if any(job["status"] not in FINISHED_STATUSES for job in jobs.values()):
+        _poll_fetch_jobs(pending)
+        st.stop()
+    failed = [genus for genus, job in jobs.items() if job["status"] == "failed"]
+    if failed:
+        st.warning(f"Worker gagal mengambil genus: {', '.join(failed)}. " +
+                   "; ".join(f"{g}: {jobs[g]['message']}" for g in failed))
+    return set(jobs)
+
 def fetch_and_display_detailed_profiles(session, genera_list):
     """Mengambil semua profil mentah, menampilkannya dalam tabel detail, dan mengembalikan tabel tersebut."""
     st.header("3. Data Detail dari BacDive")
     st.info("Tabel ini berisi data lengkap yang diambil dari BacDive untuk setiap strain, yang telah diratakan (flattened) dari format JSON aslinya.")
 
-    all_dfs = []
+    # Unduhan panjang diserahkan ke worker jika ada; sisanya diambil langsung seperti biasa
+    handled = queue_genus_downloads(genera_list)
     progress_bar = st.progress(0, text="Mengambil profil untuk semua genus...")
 
     for i, genus in enumerate(genera_list):
+        if str(genus) in handled:
+            progress_bar.progress((i + 1) / len(genera_list), text=f"Profil {genus} diambil oleh worker")
+            continue
         status_placeholder = st.empty()
         # Log container and expander removed for a cleaner UI.
-        raw_profiles = fetch_and_cache_profiles_by_taxonomy(session, genus, status_placeholder)
-
-        if raw_profiles:
-            all_profiles_list = []
-            for bacdive_id, profile_data in raw_profiles.items():
-                if isinstance(profile_data, dict):
-                    # Buat salinan untuk dimodifikasi, ini lebih aman
-                    row_data = profile_data.copy()
-                    row_data['bacdive_id'] = bacdive_id
-                    row_data['genus_input'] = genus
-                    all_profiles_list.append(row_data)
-            
-            if all_profiles_list:
-                all_dfs.append(pd.DataFrame(all_profiles_list))
-        
+        fetch_and_cache_profiles_by_taxonomy(session, genus, status_placeholder)
         progress_bar.progress((i + 1) / len(genera_list), text=f"Selesai mengambil profil untuk {genus}")
         status_placeholder.empty()
 
     progress_bar.empty()
-    
-    if not all_dfs:
-        st.warning("Tidak ada profil yang ditemukan untuk genus yang diberikan.")
-        return pd.DataFrame()
 
-    final_df = pd.concat(all_dfs, ignore_index=True)
+    # Tabel dibangun langsung dari cache, bukan dari salinan profil per genus
+    genera = tuple(sorted(str(g) for g in genera_list))
+    store_version = cache_version()
+    final_df = load_profile_table(genera, store_version)
 
-    # Reorder columns to put important ones first
-    cols = ['bacdive_id', 'genus_input'] + [col for col in final_df.columns if col not in ['bacdive_id', 'genus_input']]
-    final_df = final_df[cols]
+    if final_df.empty:
+        st.warning("Tidak ada profil yang ditemukan untuk genus yang diberikan.")
+        return final_df
 
     with st.expander("Tampilkan/Sembunyikan Tabel Data Detail", expanded=True):
-        st.dataframe(final_df)
-        
-        csv_buffer = io.StringIO()
-        final_df.to_csv(csv_buffer, index=False)
-        
-        st.download_button(
-            label="📥 Download Data Detail Lengkap (.csv)",
-            data=csv_buffer.getvalue(),
-            file_name="bacdive_detailed_data.csv",
-            mime="text/csv",
-            key="download-detailed-profiles"
-        )
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            page_size = st.selectbox("Baris per halaman", DETAIL_PAGE_SIZES, key="detail-page-size")
+        total_pages = max(1, -(-len(final_df) // page_size))
+        with col2:
+            page = st.number_input(f"Halaman (dari {total_pages}, {len(final_df)} strain)",
+                                   min_value=1, max_value=total_pages, value=1, key="detail-page")
+        st.dataframe(final_df.iloc[(page - 1) * page_size: page * page_size], hide_index=True)
+
+        export_format = st.radio("Format unduhan:", list(EXPORTERS.keys()), horizontal=True, key="detail-export-format")
+        file_name, mime, _ = EXPORTERS[export_format]
+        if st.button("Siapkan File Unduhan", key="prepare-detailed-profiles"):
+            st.session_state["detail-export"] = (genera, store_version, export_format)
+
+        if st.session_state.get("detail-export") == (genera, store_version, export_format):
+            try:
+                st.download_button(
+                    label=f"📥 Download Data Detail Lengkap (.{export_format})",
+                    data=export_profile_table(genera, store_version, export_format),
+                    file_name=file_name,
+                    mime=mime,
+                    key="download-detailed-profiles"
+                )
+            except ImportError:
+                st.error("Ekspor Parquet membutuhkan paket 'pyarrow'.")
+                st.code("pip install pyarrow")
     return final_df
 
 # --- 5. Tampilan Aplikasi (UI) ---
@@ -250,6 +414,210 @@ def highlight_comparison(s):
             colors.append('')
     return colors
 
+class SampleLog:
+    """Meniru st.container() untuk log proses satu sampel, tetapi hanya menyimpan pesan di memori."""
+    def __init__(self):
+        self.lines = []
+
+    def info(self, message):
+        self.lines.append(f"[INFO] {message}")
+
+    def warning(self, message):
+        self.lines.append(f"[WARNING] {message}")
+
+    def error(self, message):
+        self.lines.append(f"[ERROR] {message}")
+
+    def success(self, message):
+        self.lines.append(f"[SUCCESS] {message}")
+
+    def exception(self, exc):
+        self.lines.append(f"[EXCEPTION] {exc}")
+
+def attach_strain_drilldown(results, candidates, strain_matrix, weights, strain_drilldown=3):
+    """Menilai strain dari `strain_drilldown` spesies teratas dan menyimpannya di result["strains"]."""
+    for result in results[:strain_drilldown]:
+        result["strains"] = strain_matrix.rank(weights, ids=candidates[result["ID"]]["strain_ids"])
+
+def rerank_reports(all_sample_reports, weights):
+    """
+    Menilai ulang semua sampel untuk preset lain dari matriks kecocokan yang tersimpan:
+    satu perkalian matriks-vektor per sampel, tanpa membandingkan ulang profil.
+    """
+    reranked = []
+    with metrics.span("rerank"):
+        for report in all_sample_reports:
+            scoring = report.get("scoring")
+            if not scoring:
+                reranked.append(report)
+                continue
+            results = scoring["matrix"].rank(weights, detail_limit=RERANK_DETAIL_LIMIT)
+            if scoring["strain_matrix"] is not None:
+                attach_strain_drilldown(results, scoring["candidates"], scoring["strain_matrix"],
+                                        weights, scoring["strain_drilldown"])
+            reranked.append(dict(report, results=results))
+    return reranked
+
+def run_identification(session, data, range_min_overlap, species_first, weights=None, probabilistic=False):
+    """Memproses semua sampel tanpa merender hasil per sampel; elemen progres dihapus setelah selesai."""
+    all_sample_reports = []
+    total_samples = len(data)
+    processing_area = st.empty()
+
+    with processing_area.container():
+        sample_progress = st.progress(0, text="Memulai identifikasi sampel...")
+        for index, user_input in enumerate(sample_records(data)):
+            sample_name = user_input.get("Sample_Name", f"Sampel #{index + 1}")
+            if pd.isna(sample_name):
+                sample_name = f"Sampel #{index + 1}"
+            sample_progress.progress(
+                (index + 1) / total_samples,
+                text=f"Memproses sampel {index + 1}/{total_samples}: {sample_name}"
+            )
+
+            log = SampleLog()
+            scoring = {}
+            results = process_sample(session, user_input, log, range_min_overlap, species_first,
+                                     weights=weights, scoring=scoring, probabilistic=probabilistic)
+
+            # Simpan hasil (bahkan jika kosong) untuk laporan akhir
+            all_sample_reports.append({
+                "sample_name": sample_name,
+                "genus": user_input.get("Genus"),
+                "results": results,
+                "log": log.lines,
+                "scoring": scoring,
+                "score_label": "posterior" if probabilistic else "kemiripan",
+            })
+
+    processing_area.empty()
+    return all_sample_reports
+
+def build_results_summary(all_sample_reports):
+    """Tabel ringkas satu baris per sampel: kandidat teratas dan skornya."""
+    rows = []
+    for i, report in enumerate(all_sample_reports):
+        top = report["results"][0] if report["results"] else None
+        rows.append({
+            "No": i + 1,
+            "Sampel": report["sample_name"],
+            "Genus": report.get("genus"),
+            "Kandidat Teratas": top["Nama Bakteri"] if top else "Tidak ditemukan",
+            "Skor (%)": round(top["Persentase"], 2) if top else None,
+            "Jumlah Kandidat": len(report["results"]),
+        })
+    return pd.DataFrame(rows)
+
+def render_sample_detail(report):
+    """Daftar kandidat, drill-down strain, tabel perbandingan, dan log untuk satu sampel."""
+    results = report["results"]
+    sample_name = report["sample_name"]
+    st.subheader(f"▶️ Hasil untuk Sampel: {sample_name}")
+
+    if results:
+        top_result = results[0]
+        st.success(f"**Identifikasi Utama:** `{top_result['Nama Bakteri']}` ({top_result['Persentase']:.2f}% {report.get('score_label', 'kemiripan')})")
+
+        st.subheader("Daftar Kandidat Teratas (Top 10)")
+        results_df = pd.DataFrame(results).head(10)
+        results_df = results_df[[c for c in ["Rank", "Nama Bakteri", "Persentase", "ID", "Jumlah Strain"] if c in results_df.columns]]
+        st.dataframe(results_df)
+
+        if top_result.get("strains"):
+            st.subheader("Strain dalam Spesies Teratas")
+            strains_df = pd.DataFrame(top_result["strains"])[["Rank", "Nama Bakteri", "Persentase", "ID"]]
+            st.dataframe(strains_df)
+
+        st.subheader("Laporan Perbandingan (vs Kandidat Utama)")
+        report_df = pd.DataFrame(top_result['details'])
+        st.dataframe(report_df.style.apply(highlight_comparison, subset=['Cocok']))
+    else:
+        st.warning(f"❌ Tidak ada hasil yang cocok ditemukan untuk sampel {sample_name}.")
+        st.info("Kemungkinan penyebab: Genus tidak ditemukan di database BacDive atau masalah koneksi API.")
+
+    with st.expander(f"Lihat Log Detail Proses Fetch API untuk Sampel: {sample_name}"):
+        st.code("\n".join(report.get("log", [])) or "(log kosong)", language=None)
+
+@fragment
+def render_results_browser(all_sample_reports):
+    """
+    Ringkasan semua sampel dengan filter dan paginasi di server; detail hanya dirender
+    untuk sampel yang dipilih. Dijalankan sebagai fragment sehingga interaksi di sini
+    tidak menjalankan ulang seluruh pipeline.
+    """
+    summary = build_results_summary(all_sample_reports)
+
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        query = st.text_input("Cari sampel / kandidat", key="results-query")
+    with col2:
+        min_score = st.slider("Skor minimum (%)", 0, 100, 0, key="results-min-score")
+    with col3:
+        page_size = st.selectbox("Baris per halaman", RESULTS_PAGE_SIZES, index=1, key="results-page-size")
+
+    filtered = summary
+    if query:
+        mask = (
+            filtered["Sampel"].astype(str).str.contains(query, case=False, regex=False)
+            | filtered["Kandidat Teratas"].astype(str).str.contains(query, case=False, regex=False)
+        )
+        filtered = filtered[mask]
+    if min_score > 0:
+        filtered = filtered[filtered["Skor (%)"].fillna(0) >= min_score]
+
+    if filtered.empty:
+        st.info("Tidak ada sampel yang cocok dengan filter.")
+        return
+
+    total_pages = max(1, -(-len(filtered) // page_size))
+    page = st.number_input(f"Halaman (dari {total_pages})", min_value=1, max_value=total_pages, value=1, key="results-page")
+    page_df = filtered.iloc[(page - 1) * page_size: page * page_size]
+    st.dataframe(page_df, hide_index=True)
+
+    selected = st.selectbox(
+        "Tampilkan detail untuk sampel:",
+        page_df.index.tolist(),
+        format_func=lambda i: f"{summary.at[i, 'No']}. {summary.at[i, 'Sampel']}",
+        key="results-selected"
+    )
+    st.divider()
+    render_sample_detail(all_sample_reports[selected])
+
+def _show_report_download(future, fmt):
+    """Menampilkan tombol unduh untuk laporan yang sudah selesai dibuat."""
+    error = future.exception()
+    if isinstance(error, ImportError):
+        st.error("Paket 'python-docx' tidak terinstal. Fitur unduh DOCX tidak dapat digunakan.")
+        st.code("pip install python-docx")
+        return
+    if error is not None:
+        st.error(f"Gagal membuat laporan: {error}")
+        return
+    file_name, mime = REPORT_FORMATS[fmt]
+    st.download_button(
+        label=f"📥 Download Laporan Lengkap ({REPORT_FORMAT_LABELS[fmt]})",
+        data=future.result(),
+        file_name=file_name,
+        mime=mime,
+        key=f"download-{fmt}-report"
+    )
+
+@poll_fragment
+def _poll_report(all_sample_reports, fmt):
+    """Menunggu laporan selesai dibuat tanpa menahan skrip utama; rerun penuh saat siap."""
+    if submit_report(all_sample_reports, fmt).done():
+        st.rerun()
+    st.info("⏳ Laporan sedang dibuat di latar belakang...")
+    if st.button("🔄 Cek status laporan", key=f"report-poll-{fmt}"):
+        st.rerun()
+
+def render_report_download(all_sample_reports, fmt):
+    future = submit_report(all_sample_reports, fmt)
+    if future.done():
+        _show_report_download(future, fmt)
+    else:
+        _poll_report(all_sample_reports, fmt)
+
 def main():
     st.title("🔬 Identifikasi Bakteri Berbasis Genus")
     st.info("Upload file CSV/Excel dengan kolom **Sample_Name** dan **Genus** untuk memulai identifikasi.")
@@ -260,7 +628,9 @@ def main():
 
     with st.sidebar:
         st.header("Pengaturan & Bantuan")
-        if st.button("🔄 Refresh Sesi & Token", help="Klik jika Anda mengalami error Unauthorized atau ingin memulai sesi baru."):
+        if st.button("🔄 Refresh Sesi & Token", help="Token diperbarui otomatis sebelum kedaluwarsa. Klik jika tetap mengalami error Unauthorized atau ingin memulai sesi baru."):
+            if getattr(session, "token_manager", None):
+                session.token_manager.force_refresh()
             st.cache_resource.clear()
             st.rerun()
 
@@ -284,19 +654,46 @@ def main():
         except Exception as e:
             st.warning(f"Template file tidak tersedia: {e}")
 
+        with st.expander("⏱️ Waktu Startup"):
+            for phase, seconds in get_startup_timer().snapshot().items():
+                st.caption(f"{phase}: {seconds:.2f} s")
+
+        with st.expander("📈 Performa"):
+            render_performance_panel()
+
         st.header("Mode Akuakultur")
+        weight_presets = get_weight_presets()
         mode = st.selectbox(
             "Pilih preset bobot untuk genus target:",
-            ("Default", "Aeromonas Focus", "Streptococcus Focus", "Edwardsiella Focus")
+            tuple(weight_presets.keys())
+        )
+        # Preset hanya berlaku untuk sesi ini; diteruskan eksplisit ke fungsi scoring
+        weights = weight_presets[mode]
+
+        st.header("Filter Rentang Pertumbuhan")
+        range_min_overlap = st.slider(
+            "Overlap minimum suhu/pH/NaCl",
+            min_value=0.0, max_value=1.0, value=0.0, step=0.05,
+            help="0 = nonaktif. Jika diisi, hanya strain dengan rentang pertumbuhan yang overlap minimal "
+                 "sebesar nilai ini dengan input sampel yang dinilai. Strain tanpa data rentang tetap disertakan."
         )
 
-        # Update weights based on mode
-        if mode == "Aeromonas Focus":
-            WEIGHTS.update({'Oxidase': 4, 'Nitrate_reduction': 3, 'Glucose': 2, 'Gram_stain': 4})
-        elif mode == "Streptococcus Focus":
-            WEIGHTS.update({'Gram_stain': 4, 'Catalase': 4, 'Oxidase': 4, 'VP': 3})
-        elif mode == "Edwardsiella Focus":
-            WEIGHTS.update({'H2S_production': 4, 'Indole': 4, 'Motility': 3, 'Citrate': 3})
+        st.header("Mode Skoring")
+        scoring_method = st.radio(
+            "Metode skor:",
+            list(SCORING_METHODS.keys()),
+            format_func=SCORING_METHODS.get,
+            help="Probabilistik: posterior setiap spesies dari tabel P(positive | spesies) yang dihitung "
+                 "dari semua strain (dengan smoothing). Skor antar spesies berjumlah 100%."
+        )
+        probabilistic = scoring_method == "probabilistic"
+        species_first = st.checkbox(
+            "Skoring per spesies (profil konsensus)",
+            value=False,
+            disabled=probabilistic,
+            help="Strain dari spesies yang sama digabung menjadi satu profil konsensus "
+                 "(frekuensi positive/negative/variable). Strain dari spesies teratas tetap ditampilkan."
+        ) and not probabilistic
 
     
 
@@ -310,11 +707,8 @@ def main():
 
     if uploaded_file:
         try:
-            # PERBAIKAN: Better file reading with encoding handling
-            if uploaded_file.name.endswith('.csv'):
-                data = pd.read_csv(uploaded_file, encoding='utf-8')
-            else:
-                data = pd.read_excel(uploaded_file)
+            # Hanya kolom yang dikenali yang dibaca; nilai uji langsung di-encode sebagai kategori
+            data = load_upload(uploaded_file, uploaded_file.name)
             
             # PERBAIKAN: Validate required columns before normalization
             required_cols = ['Sample_Name', 'Genus']
@@ -325,8 +719,6 @@ def main():
                 st.info("File harus berisi minimal kolom: Sample_Name, Genus")
                 st.stop()
             
-            data = normalize_columns(data)
-            
             st.header("2. Preview Data Input (Setelah Normalisasi)")
             st.dataframe(data)
 
@@ -353,143 +745,40 @@ def main():
 
                 st.header("4. Hasil Identifikasi per Sampel")
 
-                # List untuk menyimpan hasil dari setiap sampel untuk laporan akhir
-                all_sample_reports = []
-                
-                total_samples = len(data)
-                sample_progress = st.progress(0, text="Memulai identifikasi sampel...")
-                
-                for index, row in data.iterrows():
-                    st.divider()
-                    sample_name = row.get("Sample_Name", f"Sampel #{index + 1}")
-                    st.subheader(f"▶️ Hasil untuk Sampel: {sample_name}")
-                    
-                    progress_pct = (index + 1) / total_samples
-                    sample_progress.progress(
-                        progress_pct, 
-                        text=f"Memproses sampel {index + 1}/{total_samples}: {sample_name}"
-                    )
-                    
-                    user_input = row.to_dict()
-                    
-                    with st.expander(f"Lihat Log Detail Proses Fetch API untuk Sampel: {sample_name}"):
-                        log_container = st.container()
-                        results = process_sample(session, user_input, log_container)
-
-                    # Simpan hasil (bahkan jika kosong) untuk laporan akhir
-                    all_sample_reports.append({
-                        "sample_name": sample_name,
-                        "results": results
-                    })
-
-                    if results:
-                        top_result = results[0]
-                        st.success(f"**Identifikasi Utama:** `{top_result['Nama Bakteri']}` ({top_result['Persentase']:.2f}% kemiripan)")
-
-                        with st.expander("Lihat Daftar Kandidat & Laporan Detail"):
-                            st.subheader("Daftar Kandidat Teratas (Top 10)")
-                            results_df = pd.DataFrame(results).head(10)[["Rank", "Nama Bakteri", "Persentase", "ID"]]
-                            st.dataframe(results_df)
-
-                            st.subheader("Laporan Perbandingan (vs Kandidat Utama)")
-                            report_df = pd.DataFrame(top_result['details'])
-                            st.dataframe(report_df.style.apply(highlight_comparison, subset=['Cocok']))
-                    else:
-                        st.warning(f"❌ Tidak ada hasil yang cocok ditemukan untuk sampel {sample_name}.")
-                        st.info("Kemungkinan penyebab: Genus tidak ditemukan di database BacDive atau masalah koneksi API.")
+                # Hasil disimpan di session_state agar interaksi UI tidak menjalankan ulang pipeline
+                # Preset bobot tidak termasuk kunci: ganti preset hanya menilai ulang dari matriks tersimpan
+                run_key = (
+                    getattr(uploaded_file, "file_id", uploaded_file.name), uploaded_file.size,
+                    range_min_overlap, species_first, probabilistic
+                )
+                cached_run = st.session_state.get("identification_run")
+                if cached_run and cached_run["key"] == run_key:
+                    if mode not in cached_run["by_preset"]:
+                        cached_run["by_preset"][mode] = rerank_reports(cached_run["reports"], weights)
+                    all_sample_reports = cached_run["by_preset"][mode]
+                else:
+                    all_sample_reports = run_identification(session, data, range_min_overlap, species_first, weights, probabilistic)
+                    st.session_state["identification_run"] = {
+                        "key": run_key, "reports": all_sample_reports, "by_preset": {mode: all_sample_reports}
+                    }
 
-                sample_progress.empty()
-                st.success(f"✅ Selesai memproses {total_samples} sampel!")
+                st.success(f"✅ Selesai memproses {len(all_sample_reports)} sampel!")
+                render_results_browser(all_sample_reports)
 
-                # --- BAGIAN 5: LAPORAN LENGKAP DALAM FORMAT DOCX ---
+                # --- BAGIAN 5: LAPORAN LENGKAP ---
                 st.divider()
-                st.header("5. Laporan Lengkap (.docx)")
-                st.info("Gunakan tombol di bawah ini untuk mengunduh laporan lengkap dalam format DOCX yang berisi ringkasan, daftar kandidat, dan detail perbandingan untuk setiap sampel.")
-
-                try:
-                    from docx import Document
-                    from docx.shared import Pt
-                    
-                    def add_df_to_doc(document, df):
-                        """Helper function to add a pandas DataFrame to a docx table."""
-                        if df.empty:
-                            document.add_paragraph("[Tidak ada data]", style='Italic')
-                            return
-                        table = document.add_table(rows=1, cols=df.shape[1], style='Table Grid')
-                        for j, col_name in enumerate(df.columns):
-                            table.cell(0, j).text = str(col_name)
-                        for i, row in df.iterrows():
-                            row_cells = table.add_row().cells
-                            for j, cell_value in enumerate(row):
-                                row_cells[j].text = str(cell_value)
-
-                    document = Document()
-                    document.add_heading('Laporan Lengkap Identifikasi Bakteri', 0)
-                    document.add_paragraph(f"Laporan dibuat pada: {pd.to_datetime('today').strftime('%d %B %Y, %H:%M')}")
-
-                    document.add_heading('Ringkasan Hasil Identifikasi', level=1)
-                    summary_data = []
-                    for report in all_sample_reports:
-                        if report['results']:
-                            top_res = report['results'][0]
-                            summary_data.append({
-                                'Nama Sampel': report['sample_name'],
-                                'Kandidat Teratas': top_res['Nama Bakteri'],
-                                'Skor Kemiripan': f"{top_res['Persentase']:.2f}%"
-                            })
-                        else:
-                            summary_data.append({
-                                'Nama Sampel': report['sample_name'],
-                                'Kandidat Teratas': 'Tidak ditemukan',
-                                'Skor Kemiripan': 'N/A'
-                            })
-                    summary_df = pd.DataFrame(summary_data)
-                    add_df_to_doc(document, summary_df)
-
-                    document.add_page_break()
-                    document.add_heading('Detail Identifikasi per Sampel', level=1)
-
-                    for report in all_sample_reports:
-                        document.add_heading(f"Sampel: {report['sample_name']}", level=2)
-                        
-                        results = report['results']
-                        if not results:
-                            document.add_paragraph("Tidak ada hasil yang cocok ditemukan untuk sampel ini.")
-                            document.add_paragraph('---')
-                            continue
-
-                        top_result = results[0]
-                        p = document.add_paragraph()
-                        p.add_run('Identifikasi Utama: ').bold = True
-                        p.add_run(f"{top_result['Nama Bakteri']} ({top_result['Persentase']:.2f}%)")
-
-                        document.add_heading('Daftar Kandidat Teratas', level=3)
-                        kandidat_df = pd.DataFrame(results).head(10)[["Rank", "Nama Bakteri", "Persentase", "ID"]]
-                        add_df_to_doc(document, kandidat_df)
-
-                        document.add_heading('Laporan Perbandingan Detail (vs Kandidat Utama)', level=3)
-                        detail_df = pd.DataFrame(top_result['details'])
-                        add_df_to_doc(document, detail_df)
-                        document.add_paragraph('') # Spacer
-
-                    doc_io = io.BytesIO()
-                    document.save(doc_io)
-                    doc_io.seek(0)
-
-                    st.download_button(
-                        label="📥 Download Laporan Lengkap (.docx)",
-                        data=doc_io,
-                        file_name="laporan_identifikasi_lengkap.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        key="download-docx-report"
-                    )
-
-                except ImportError:
-                    st.error("Paket 'python-docx' tidak terinstal. Fitur unduh DOCX tidak dapat digunakan.")
-                    st.code("pip install python-docx")
-                except Exception as e:
-                    st.error(f"Gagal membuat file DOCX: {e}")
-                    st.exception(e)
+                st.header("5. Laporan Lengkap")
+                st.info("Laporan berisi ringkasan, daftar kandidat, dan detail perbandingan untuk setiap sampel. "
+                        "Laporan dibuat di latar belakang; tombol unduh muncul setelah laporan siap.")
+
+                report_format = st.radio(
+                    "Format laporan:",
+                    list(REPORT_FORMAT_LABELS.keys()),
+                    format_func=REPORT_FORMAT_LABELS.get,
+                    horizontal=True,
+                    key="report-format"
+                )
+                render_report_download(all_sample_reports, report_format)
 
         except Exception as e:
             st.error(f"Terjadi kesalahan saat memproses file: {e}")
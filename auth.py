@@ -1,109 +1,218 @@
 import requests
 import streamlit as st
 import time
+import threading
 
-TOKEN_URL = "https://sso.dsmz.de/auth/realms/dsmz/protocol/openid-connect/token"
+import bacdive_client
+import metrics
+from bacdive_client import RequestSpec, api_url, request_many
 
-def get_authenticated_session(email, password, max_retries=3):
+CLIENT_ID = "api.bacdive.public"
+# Token diperbarui sebelum kedaluwarsa jika sisa umurnya kurang dari margin ini (detik)
+TOKEN_REFRESH_MARGIN = 60
+
+class TokenManager:
     """
-    Authenticates with the DSMZ SSO and returns an authenticated requests.Session object.
-    Added retry mechanism and better error handling.
+    Manages the access/refresh token pair for one BacDive account.
+
+    The access token is refreshed proactively (refresh_token grant) shortly before it
+    expires, falling back to the password grant when the refresh token is no longer
+    valid. All methods are thread-safe so one manager can be shared by every session.
     """
-    data = {
-        "grant_type": "password",
-        "client_id": "api.bacdive.public",
-        "username": email,
-        "password": password,
-    }
-    
-    last_error = None
-    
-    for attempt in range(max_retries):
+
+    def __init__(self, email, password, token_url=None, client_id=CLIENT_ID, max_retries=3):
+        self.email = email
+        self._password = password
+        self.token_url = token_url or bacdive_client.TOKEN_URL
+        self.client_id = client_id
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._access_token = None
+        self._refresh_token = None
+        self._refresh_at = 0.0
+        self._refresh_expires_at = 0.0
+
+    def _store(self, token_data):
+        now = time.time()
+        lifetime = float(token_data.get("expires_in", 300))
+        self._access_token = token_data["access_token"]
+        # Refresh saat sisa umur < margin, tetapi tidak lebih awal dari separuh umur token
+        self._refresh_at = now + max(lifetime - TOKEN_REFRESH_MARGIN, lifetime / 2)
+        self._refresh_token = token_data.get("refresh_token")
+        # Tanpa refresh_expires_in (atau 0, mis. offline token) refresh token dianggap berlaku
+        # sampai ditolak server, bukan langsung kedaluwarsa
+        refresh_lifetime = float(token_data.get("refresh_expires_in", 0) or 0)
+        self._refresh_expires_at = now + refresh_lifetime if refresh_lifetime > 0 else None
+
+    def _refresh_grant(self):
+        """
+        Returns True if the refresh token produced a new access token. A refresh token the
+        server rejects (400/401) is dropped, so the next renewal goes straight to the password grant.
+        """
+        if not self._refresh_token:
+            return False
+        if self._refresh_expires_at is not None and time.time() >= self._refresh_expires_at - 10:
+            return False
+        data = {"grant_type": "refresh_token", "client_id": self.client_id, "refresh_token": self._refresh_token}
         try:
-            if attempt > 0:
-                print(f"Mencoba autentikasi ulang... (percobaan {attempt + 1}/{max_retries})")
-                time.sleep(2)  # Wait before retry
-            
-            response = requests.post(TOKEN_URL, data=data, timeout=30)
+            with metrics.span("token_acquisition", grant="refresh_token"):
+                response = requests.post(self.token_url, data=data, timeout=30)
             response.raise_for_status()
-            
             token_data = response.json()
-            access_token = token_data.get("access_token")
-            
-            if not access_token:
-                print("Authentication failed: No access token received from BacDive.")
-                return None
-            
-            # Create authenticated session
-            session = requests.Session()
-            session.headers.update({"Authorization": f"Bearer {access_token}"})
-            
-            # Test the session with a simple API call - PERBAIKAN: endpoint yang benar
-            test_endpoints = [
-                "https://api.bacdive.dsmz.de/",
-                "https://api.bacdive.dsmz.de/fetch",
-                "https://api.bacdive.dsmz.de/taxon"
-            ]
-            
-            session_validated = False
-            for test_endpoint in test_endpoints:
-                try:
-                    test_response = session.get(test_endpoint, timeout=10)
-                    if test_response.status_code in [200, 404]:  # 404 juga OK untuk beberapa endpoint
-                        print(f"✅ Autentikasi BacDive berhasil! (tested with {test_endpoint})")
-                        session_validated = True
-                        break
-                    else:
-                        print(f"Test endpoint {test_endpoint} returned {test_response.status_code}")
-                except Exception as e:
-                    print(f"Test endpoint {test_endpoint} failed: {e}")
-                    continue
-            
-            if session_validated:
-                return session
-            else:
-                print("Token diterima tapi tidak dapat memvalidasi akses API.")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            response = getattr(e, "response", None)
+            if response is not None and response.status_code in (400, 401):
+                self._refresh_token = None
+            print(f"Refresh token gagal, login ulang dengan password: {e}")
+            return False
+        if not token_data.get("access_token"):
+            return False
+        self._store(token_data)
+        return True
+
+    def password_grant_data(self):
+        """Form body for the password grant (also used by the endpoint probe)."""
+        return {
+            "grant_type": "password",
+            "client_id": self.client_id,
+            "username": self.email,
+            "password": self._password,
+        }
+
+    def _password_grant(self):
+        """Password grant with retries. Returns True on success."""
+        data = self.password_grant_data()
+        
+        last_error = None
+        
+        for attempt in range(self.max_retries):
+            try:
+                if attempt > 0:
+                    print(f"Mencoba autentikasi ulang... (percobaan {attempt + 1}/{self.max_retries})")
+                    time.sleep(2)  # Wait before retry
+                
+                with metrics.span("token_acquisition", grant="password"):
+                    response = requests.post(self.token_url, data=data, timeout=30)
+                response.raise_for_status()
                 
-        except requests.exceptions.HTTPError as err:
-            last_error = f"HTTP error during authentication: {err}"
-            if err.response.status_code == 401:
-                print("❌ Kredensial salah. Periksa email dan password Anda.")
-                return None  # Don't retry for auth errors
-            elif err.response.status_code >= 500:
-                print(f"Server error (attempt {attempt + 1}): {err}")
-            else:
-                print(f"HTTP error: {err}")
-                if hasattr(err, 'response') and err.response:
-                    print(f"Response body: {err.response.text}")
+                token_data = response.json()
+                if not token_data.get("access_token"):
+                    print("Authentication failed: No access token received from BacDive.")
+                    return False
+
+                self._store(token_data)
+                print("✅ Autentikasi BacDive berhasil!")
+                return True
                     
-        except requests.exceptions.Timeout:
-            last_error = "Request timeout during authentication"
-            print(f"Request timeout (attempt {attempt + 1}). Mencoba lagi...")
-            
-        except requests.exceptions.ConnectionError:
-            last_error = "Connection error during authentication"
-            print(f"Connection error (attempt {attempt + 1}). Periksa koneksi internet Anda.")
-            
-        except requests.exceptions.RequestException as e:
-            last_error = f"Error during authentication request: {e}"
-            print(f"Request error: {e}")
-            
-        except ValueError as e:
-            last_error = "Failed to decode authentication response from BacDive"
-            print("Failed to decode authentication response from BacDive.")
-            if 'response' in locals():
-                print(f"Response text: {response.text}")
-            
-        except Exception as e:
-            last_error = f"Unexpected error during authentication: {e}"
-            print(f"Unexpected error: {e}")
-    
-    # All retries failed
-    print(f"❌ Autentikasi gagal setelah {max_retries} percobaan.")
-    if last_error:
-        print(f"Error terakhir: {last_error}")
-    
-    return None
+            except requests.exceptions.HTTPError as err:
+                last_error = f"HTTP error during authentication: {err}"
+                if err.response.status_code == 401:
+                    print("❌ Kredensial salah. Periksa email dan password Anda.")
+                    return False  # Don't retry for auth errors
+                elif err.response.status_code >= 500:
+                    print(f"Server error (attempt {attempt + 1}): {err}")
+                else:
+                    print(f"HTTP error: {err}")
+                    if hasattr(err, 'response') and err.response:
+                        print(f"Response body: {err.response.text}")
+                        
+            except requests.exceptions.Timeout:
+                last_error = "Request timeout during authentication"
+                print(f"Request timeout (attempt {attempt + 1}). Mencoba lagi...")
+                
+            except requests.exceptions.ConnectionError:
+                last_error = "Connection error during authentication"
+                print(f"Connection error (attempt {attempt + 1}). Periksa koneksi internet Anda.")
+                
+            except requests.exceptions.RequestException as e:
+                last_error = f"Error during authentication request: {e}"
+                print(f"Request error: {e}")
+                
+            except ValueError:
+                last_error = "Failed to decode authentication response from BacDive"
+                print("Failed to decode authentication response from BacDive.")
+                if 'response' in locals():
+                    print(f"Response text: {response.text}")
+        
+        # All retries failed
+        print(f"❌ Autentikasi gagal setelah {self.max_retries} percobaan.")
+        if last_error:
+            print(f"Error terakhir: {last_error}")
+        return False
+
+    def get_token(self):
+        """Current access token, refreshed first if it is about to expire. None if login fails."""
+        with self._lock:
+            if self._access_token and time.time() < self._refresh_at:
+                return self._access_token
+            if self._refresh_grant() or self._password_grant():
+                return self._access_token
+            return None
+
+    def force_refresh(self, stale_token=None):
+        """
+        Refreshes after a 401. If another thread already replaced `stale_token`,
+        the newer token is returned without another round trip.
+        """
+        with self._lock:
+            if stale_token is not None and self._access_token != stale_token:
+                return self._access_token
+            self._refresh_at = 0.0
+            if self._refresh_grant() or self._password_grant():
+                return self._access_token
+            return None
+
+    def auth_headers(self):
+        token = self.get_token()
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+class BacDiveSession(requests.Session):
+    """requests.Session that takes its bearer token from a TokenManager and retries once on 401."""
+
+    def __init__(self, token_manager):
+        super().__init__()
+        self.token_manager = token_manager
+
+    def request(self, method, url, *args, **kwargs):
+        token = self.token_manager.get_token()
+        headers = dict(kwargs.pop("headers", None) or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        response = super().request(method, url, *args, headers=headers, **kwargs)
+        if response.status_code == 401 and token:
+            new_token = self.token_manager.force_refresh(stale_token=token)
+            if new_token and new_token != token:
+                headers["Authorization"] = f"Bearer {new_token}"
+                response = super().request(method, url, *args, headers=headers, **kwargs)
+        return response
+
+_token_managers = {}
+_token_managers_lock = threading.Lock()
+
+def get_token_manager(email, password, max_retries=3):
+    """Shared TokenManager per account, so concurrent sessions reuse one token pair."""
+    key = (bacdive_client.TOKEN_URL, email, password)
+    with _token_managers_lock:
+        manager = _token_managers.get(key)
+        if manager is None:
+            manager = TokenManager(email, password, token_url=key[0], max_retries=max_retries)
+            _token_managers[key] = manager
+        return manager
+
+def get_authenticated_session(email, password, max_retries=3):
+    """
+    Authenticates with the DSMZ SSO and returns an authenticated session.
+    The session refreshes its token before expiry and retries once on 401, so
+    long-running fetches do not abort when the access token runs out.
+    In offline and replay transport modes no token is needed, so a plain
+    session is returned without contacting the SSO.
+    """
+    if not bacdive_client.needs_credentials():
+        return requests.Session()
+    manager = get_token_manager(email, password, max_retries)
+    if not manager.get_token():
+        return None
+    return BacDiveSession(manager)
 
 def test_api_connection():
     """
@@ -111,44 +220,45 @@ def test_api_connection():
     Returns dict with proper structure for cache_manager.py
     """
     endpoints_to_test = [
-        ("API Base", "https://api.bacdive.dsmz.de/"),
-        ("Token Endpoint", "https://sso.dsmz.de/auth/realms/dsmz/protocol/openid-connect/token"),
-        ("Strain Endpoint", "https://api.bacdive.dsmz.de/fetch"),
-        ("Taxon Endpoint", "https://api.bacdive.dsmz.de/taxon")
+        ("API Base", api_url() + "/"),
+        ("Token Endpoint", bacdive_client.TOKEN_URL),
+        ("Strain Endpoint", api_url("fetch")),
+        ("Taxon Endpoint", api_url("taxon"))
     ]
     
+    # Semua endpoint dicek bersamaan; POST tanpa kredensial ke token endpoint
+    # seharusnya menghasilkan 400/401 (endpoint berfungsi)
+    specs = [
+        RequestSpec("POST", endpoint, {}) if "token" in endpoint.lower() else RequestSpec("GET", endpoint)
+        for _, endpoint in endpoints_to_test
+    ]
+    responses = request_many(specs, concurrency=len(specs), timeout=10)
+
     results = {}
     
-    for name, endpoint in endpoints_to_test:
-        try:
-            # Use GET for most endpoints, POST for token endpoint
-            if "token" in endpoint.lower():
-                # POST request without credentials should return 400/401 (expected)
-                response = requests.post(endpoint, data={}, timeout=10)
-            else:
-                response = requests.get(endpoint, timeout=10)
-            
-            # For token endpoint, 400/401/405 are expected responses (endpoint is working)
-            if "token" in endpoint.lower():
-                accessible = response.status_code in [400, 401, 405]
-            else:
-                # For API endpoints, 200 (success) or 404 (not found but accessible) are good
-                # 401/403 means authentication required but endpoint exists
-                accessible = response.status_code in [200, 401, 403, 404]
-            
-            results[name] = {
-                'endpoint': endpoint,
-                'status': response.status_code,
-                'accessible': accessible
-            }
-            
-        except requests.exceptions.RequestException as e:
+    for (name, endpoint), response in zip(endpoints_to_test, responses):
+        if response.status is None:
             results[name] = {
                 'endpoint': endpoint,
                 'status': 'Error',
                 'accessible': False,
-                'error': str(e)
+                'error': response.error
             }
+            continue
+
+        # For token endpoint, 400/401/405 are expected responses (endpoint is working)
+        if "token" in endpoint.lower():
+            accessible = response.status in [400, 401, 405]
+        else:
+            # For API endpoints, 200 (success) or 404 (not found but accessible) are good
+            # 401/403 means authentication required but endpoint exists
+            accessible = response.status in [200, 401, 403, 404]
+        
+        results[name] = {
+            'endpoint': endpoint,
+            'status': response.status,
+            'accessible': accessible
+        }
     
     return results
 
@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import requests
+
+import metrics
+
+# httpx opsional dan baru di-import saat request pertama (lihat _load_httpx)
+httpx = None
+_httpx_checked = False
+
+# --- 0. Konfigurasi Klien ---
+# Endpoint BacDive; bisa diarahkan ke server lain (mis. mock_bacdive_server.py) lewat
+# environment variable, [bacdive] di secrets.toml, atau configure_endpoints()
+API_BASE_URL = os.environ.get("BACDIVE_API_URL", "https://api.bacdive.dsmz.de")
+TOKEN_URL = os.environ.get("BACDIVE_TOKEN_URL", "https://sso.dsmz.de/auth/realms/dsmz/protocol/openid-connect/token")
+
+# Mode transport: live (default), offline (tanpa jaringan sama sekali), record (live + simpan
+# respons ke arsip fixture), replay (hanya dari arsip fixture)
+TRANSPORT_MODES = ("live", "offline", "record", "replay")
+TRANSPORT_MODE = os.environ.get("BACDIVE_MODE", "live")
+FIXTURE_DIR = os.environ.get("BACDIVE_FIXTURE_DIR", os.path.join("fixtures", "bacdive"))
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+KEEPALIVE_EXPIRY = 60
+# Respons yang diulang dengan backoff (Retry-After dihormati jika ada)
+RETRY_STATUSES = (429, 502, 503, 504)
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+MAX_BACKOFF = 30
+
+RequestSpec = namedtuple("RequestSpec", ["method", "url", "data"], defaults=("GET", None, None))
+
+class FetchResult(namedtuple("FetchResult", ["url", "status", "data", "text", "error", "elapsed"], defaults=(None,))):
+    """
+    Hasil satu request: status HTTP (None jika gagal koneksi), JSON ter-parse, pesan error, dan
+    `elapsed` = total durasi percobaan di jaringan (detik, tanpa antre slot dan jeda backoff).
+    """
+
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and 200 <= self.status < 300
+
+def configure_endpoints(api_base_url=None, token_url=None):
+    """Mengganti base URL API dan/atau URL token untuk semua request berikutnya."""
+    global API_BASE_URL, TOKEN_URL
+    if api_base_url:
+        API_BASE_URL = api_base_url.rstrip("/")
+    if token_url:
+        TOKEN_URL = token_url
+
+def configure_transport(mode=None, fixture_dir=None):
+    """Mengganti mode transport (lihat TRANSPORT_MODES) dan/atau folder arsip fixture."""
+    global TRANSPORT_MODE, FIXTURE_DIR
+    if mode:
+        if mode not in TRANSPORT_MODES:
+            raise ValueError(f"Mode transport tidak dikenal: {mode}")
+        TRANSPORT_MODE = mode
+    if fixture_dir:
+        FIXTURE_DIR = fixture_dir
+
+def is_offline():
+    """True jika mode offline ketat: hanya cache lokal, tanpa request jaringan."""
+    return TRANSPORT_MODE == "offline"
+
+def needs_credentials():
+    """Mode offline dan replay tidak pernah menghubungi server, jadi tidak butuh token."""
+    return TRANSPORT_MODE in ("live", "record")
+
+def api_url(*parts):
+    """URL endpoint API, mis. api_url("taxon", "Aeromonas") -> <base>/taxon/Aeromonas."""
+    return "/".join([API_BASE_URL.rstrip("/")] + [str(p).strip("/") for p in parts])
+
+def retry_delay(attempt, retry_after=None):
+    """Jeda sebelum percobaan ulang: Retry-After (detik) jika ada, selain itu backoff eksponensial + jitter."""
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_BACKOFF)
+        except ValueError:
+            pass
+    return min(BACKOFF_BASE * (2 ** attempt), MAX_BACKOFF) * (0.5 + random.random() / 2)
+
+class RateBudget:
+    """
+    Token bucket bersama untuk membatasi laju request (per detik) dan, opsional, jumlah
+    total request satu proses. Aman dipakai dari banyak thread; acquire() menunggu token.
+    """
+
+    def __init__(self, rate, burst=None, max_requests=None):
+        self.rate = float(rate) if rate else None
+        self.burst = max(1, int(burst or 1))
+        self.max_requests = max_requests
+        self.used = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        """Sisa request dari max_requests (None jika tidak dibatasi)."""
+        if self.max_requests is None:
+            return None
+        return max(0, self.max_requests - self.used)
+
+    def acquire(self, n=1):
+        """
+        Mengambil hingga `n` token dan mengembalikan jumlah yang diberikan: lebih kecil dari
+        `n` (bisa 0) jika max_requests hampir habis. Menunggu sampai laju mengizinkan.
+        """
+        with self._lock:
+            if self.max_requests is not None:
+                n = min(n, self.max_requests - self.used)
+            if n <= 0:
+                return 0
+            self.used += n
+            if self.rate is None:
+                return n
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Token boleh negatif: pemanggil berikutnya menunggu lebih lama (antrean adil)
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return n
+
+def _load_httpx():
+    """Import httpx secara malas; tanpa httpx dipakai thread pool + requests."""
+    global httpx, _httpx_checked
+    if not _httpx_checked:
+        try:
+            import httpx as _httpx
+            httpx = _httpx
+        except ImportError:
+            httpx = None
+        _httpx_checked = True
+    return httpx
+
+def _to_spec(item):
+    if isinstance(item, RequestSpec):
+        return item
+    if isinstance(item, str):
+        return RequestSpec("GET", item)
+    return RequestSpec(*item)
+
+def _endpoint_kind(url):
+    """Label endpoint untuk metrik: taxon, fetch, token, atau other."""
+    if url == TOKEN_URL or url.rstrip("/").endswith("/token"):
+        return "token"
+    for kind in ("taxon", "fetch"):
+        if f"/{kind}" in url:
+            return kind
+    return "other"
+
+def _record(url, status, seconds):
+    kind = _endpoint_kind(url)
+    metrics.observe("http_request", seconds, endpoint=kind)
+    metrics.inc("http_responses", endpoint=kind, status=status if status is not None else "error")
+
+def _make_result(url, status, text):
+    data = None
+    error = None
+    if text:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            if 200 <= status < 300:
+                error = "Gagal mem-parsing respons JSON dari server."
+    return FetchResult(url, status, data, text, error)
+
+def _session_headers(session):
+    if session is None:
+        return {}
+    headers = dict(session.headers)
+    # Sesi dengan TokenManager (auth.BacDiveSession): token selalu diambil yang terbaru
+    manager = getattr(session, "token_manager", None)
+    if manager is not None:
+        headers.update(manager.auth_headers())
+    return headers
+
+# --- 1. Backend Async (httpx) pada Event Loop Bersama ---
+class _LoopThread:
+    """Satu event loop di thread daemon agar pool koneksi (keep-alive) dipakai ulang antar panggilan."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="bacdive-client", daemon=True)
+        self._thread.start()
+
+    def get_client(self):
+        # Hanya dipanggil dari dalam loop, jadi tidak perlu lock
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                headers={"Accept-Encoding": "gzip"},
+                timeout=DEFAULT_TIMEOUT,
+                follow_redirects=True,
+            )
+        return self.client
+
+    def run(self, coro, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # Batalkan semua request yang masih berjalan
+            future.cancel()
+            raise
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+def _get_loop_thread():
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+        return _loop_thread
+
+async def _request_all_async(specs, headers, concurrency, timeout, retries=MAX_RETRIES):
+    client = _get_loop_thread().get_client()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(spec):
+        elapsed = 0.0
+        for attempt in range(retries + 1):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(spec.method, spec.url, data=spec.data, headers=headers, timeout=timeout)
+                except httpx.HTTPError as e:
+                    _record(spec.url, None, time.perf_counter() - start)
+                    return FetchResult(spec.url, None, None, "", f"{type(e).__name__}: {e}", elapsed + time.perf_counter() - start)
+                elapsed += time.perf_counter() - start
+                _record(spec.url, response.status_code, time.perf_counter() - start)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return _make_result(spec.url, response.status_code, response.text)._replace(elapsed=elapsed)
+            metrics.inc("http_retries", status=response.status_code)
+            # Tunggu di luar semaphore agar slot koneksi bisa dipakai request lain
+            await asyncio.sleep(retry_delay(attempt, response.headers.get("Retry-After")))
+
+    return await asyncio.gather(*(one(spec) for spec in specs))
+
+# --- 2. Backend Fallback (requests + thread pool) ---
+def _request_all_threaded(specs, session, concurrency, timeout, retries=MAX_RETRIES):
+    requester = session or requests
+
+    def one(spec):
+        elapsed = 0.0
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = requester.request(spec.method, spec.url, data=spec.data, timeout=timeout)
+            except requests.RequestException as e:
+                _record(spec.url, None, time.perf_counter() - start)
+                return FetchResult(spec.url, None, None, "", str(e), elapsed + time.perf_counter() - start)
+            elapsed += time.perf_counter() - start
+            _record(spec.url, response.status_code, time.perf_counter() - start)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return _make_result(spec.url, response.status_code, response.text)._replace(elapsed=elapsed)
+            metrics.inc("http_retries", status=response.status_code)
+            time.sleep(retry_delay(attempt, response.headers.get("Retry-After")))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, specs))
+
+# --- 3. Offline & Arsip Fixture (record/replay) ---
+def _fixture_path(spec):
+    """File fixture untuk satu request; URL disimpan relatif terhadap API_BASE_URL agar arsip portabel."""
+    relative = spec.url[len(API_BASE_URL):] if spec.url.startswith(API_BASE_URL) else spec.url
+    payload = json.dumps([spec.method, relative.strip("/"), spec.data], sort_keys=True)
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", relative).strip("_")[:80]
+    return os.path.join(FIXTURE_DIR, f"{spec.method.lower()}_{slug}_{digest}.json")
+
+def _save_fixture(spec, result):
+    # Hanya GET yang direkam: POST (endpoint token) bisa berisi kredensial
+    if spec.method != "GET" or result.status is None:
+        return
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = _fixture_path(spec)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"method": spec.method, "url": spec.url, "status": result.status, "text": result.text}, f)
+    os.replace(path + ".tmp", path)
+
+def _replay(spec):
+    try:
+        with open(_fixture_path(spec), encoding="utf-8") as f:
+            fixture = json.load(f)
+    except FileNotFoundError:
+        metrics.inc("http_responses", endpoint=_endpoint_kind(spec.url), status="replay_miss")
+        return FetchResult(spec.url, None, None, "", f"Mode replay: tidak ada fixture untuk {spec.method} {spec.url}")
+    metrics.inc("http_responses", endpoint=_endpoint_kind(spec.url), status=fixture["status"])
+    return _make_result(spec.url, fixture["status"], fixture["text"])
+
+def _offline_result(spec):
+    metrics.inc("http_responses", endpoint=_endpoint_kind(spec.url), status="offline")
+    return FetchResult(spec.url, None, None, "", f"Mode offline: request ke {spec.url} tidak dijalankan")
+
+# --- 4. Wrapper Sinkron ---
+def request_many(items, session=None, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, total_timeout=None,
+                 retries=MAX_RETRIES):
+    """
+    Menjalankan banyak request secara bersamaan dari satu thread pemanggil dan mengembalikan
+    list FetchResult dengan urutan yang sama seperti `items`.
+
+    `items` berisi URL (GET), RequestSpec, atau tuple (method, url, data). Header (mis. token
+    Authorization) diambil dari `session`. Respons 429/5xx sementara diulang hingga `retries`
+    kali dengan backoff. Jika `total_timeout` terlampaui, request yang tersisa dibatalkan dan
+    TimeoutError dinaikkan.
+
+    Pada mode offline tidak ada request yang dijalankan (semua hasil error, langsung kembali);
+    pada mode replay respons dibaca dari arsip fixture, dan mode record menyimpannya ke sana.
+    """
+    specs = [_to_spec(item) for item in items]
+    if not specs:
+        return []
+    if TRANSPORT_MODE == "offline":
+        return [_offline_result(spec) for spec in specs]
+    if TRANSPORT_MODE == "replay":
+        return [_replay(spec) for spec in specs]
+
+    results = _request_all_live(specs, session, concurrency, timeout, total_timeout, retries)
+    if TRANSPORT_MODE == "record":
+        for spec, result in zip(specs, results):
+            _save_fixture(spec, result)
+    return results
+
+def _request_all_live(specs, session, concurrency, timeout, total_timeout, retries=MAX_RETRIES):
+    if _load_httpx() is None:
+        return _request_all_threaded(specs, session, concurrency, timeout, retries)
+    headers = _session_headers(session)
+    coro = _request_all_async(specs, headers, concurrency, timeout, retries)
+    results = _get_loop_thread().run(coro, total_timeout)
+
+    # Token kedaluwarsa di tengah jalan: refresh sekali lalu ulangi request yang 401
+    manager = getattr(session, "token_manager", None)
+    retry = [i for i, result in enumerate(results) if result.status == 401]
+    if manager is not None and retry:
+        stale = headers.get("Authorization", "").replace("Bearer ", "", 1) or None
+        if manager.force_refresh(stale_token=stale):
+            headers = _session_headers(session)
+            coro = _request_all_async([specs[i] for i in retry], headers, concurrency, timeout, retries)
+            for i, result in zip(retry, _get_loop_thread().run(coro, total_timeout)):
+                results[i] = result
+    return results
+
+def request_one(item, session=None, timeout=DEFAULT_TIMEOUT):
+    """Versi satu request dari request_many."""
+    return request_many([item], session=session, concurrency=1, timeout=timeout)[0]
@@ -1,13 +1,27 @@
 import pandas as pd
+import numpy as np
+import hashlib
 import json
 import os
 import time
+import threading
+from collections import namedtuple
+from types import MappingProxyType
 import streamlit as st
-import requests
+
+import metrics
+from cache_backend import get_cache_backend
+from bacdive_client import api_url, is_offline, request_many, request_one
 
 # --- 0. Konfigurasi Cache ---
 CACHE_FILE = "bacdive_cache.json"
 CACHE_DURATION_SECONDS = 24 * 60 * 60  # Cache berlaku selama 24 jam
+# Entri hasil mirror lokal (bacdive_mirror.py) diperbarui oleh sinkronisasi top-up, jadi berlaku lebih lama
+MIRROR_CACHE_DURATION_SECONDS = 7 * 24 * 60 * 60
+# Versi skema entri cache. Versi 2: parameter rentang disimpan sebagai pasangan [min, max] float.
+CACHE_SCHEMA_VERSION = 2
+# Jumlah request /fetch yang berjalan bersamaan saat mengambil profil satu genus
+FETCH_CONCURRENCY = 8
 
 # --- 1. MAPPING & WEIGHTS YANG DIPERBAIKI ---
 COLUMN_ALIASES = {
@@ -19,35 +33,267 @@ COLUMN_ALIASES = {
     "Arabinosa": "Arabinose", "Trehalosa": "Trehalose",
 }
 
-WEIGHTS = {
+# Bobot dasar (read-only). Preset tidak mengubah dict ini; setiap pemanggil memberi
+# WeightVector sendiri ke fungsi scoring (lihat get_weight_presets)
+WEIGHTS = MappingProxyType({
     'Gram_stain': 3, 'Motility': 3, 'Catalase': 3, 'Oxidase': 3, 'Urease': 3, 'DNase': 3, 'Gelatinase': 3,
     'Indole': 2, 'MR': 2, 'VP': 2, 'Citrate': 2, 'Lysine_decarboxylase': 2, 'Ornithine_decarboxylase': 2, 
     'Arginine_dihydrolase': 2, 'Nitrate_reduction': 2, 'H2S_production': 2,
     'Glucose': 1, 'Lactose': 1, 'Sucrose': 1, 'Mannitol': 1, 'Sorbitol': 1, 'Xylose': 1, 'Arabinose': 1, 
     'Trehalose': 1, 'Inositol': 1, 'Maltose': 1, 'Raffinose': 1, 'Fructose': 1,
     'NaCl_tolerance': 1, 'Temperature_range': 1, 'pH_range': 1
+})
+# Urutan parameter untuk semua vektor/matriks skor
+PARAM_KEYS = tuple(WEIGHTS)
+
+# Preset bobot "Mode Akuakultur": perubahan bobot terhadap WEIGHTS untuk genus target
+WEIGHT_PRESETS = {
+    "Default": {},
+    "Aeromonas Focus": {'Oxidase': 4, 'Nitrate_reduction': 3, 'Glucose': 2, 'Gram_stain': 4},
+    "Streptococcus Focus": {'Gram_stain': 4, 'Catalase': 4, 'Oxidase': 4, 'VP': 3},
+    "Edwardsiella Focus": {'H2S_production': 4, 'Indole': 4, 'Motility': 3, 'Citrate': 3},
 }
 
+# Preset tambahan dari file TOML: satu tabel per preset, isinya perubahan bobot
+#   ["Vibrio Focus"]
+#   NaCl_tolerance = 3
+WEIGHT_PRESETS_FILE = os.environ.get("BACDIVE_WEIGHT_PRESETS", "weight_presets.toml")
+
+# Parameter yang dibandingkan sebagai rentang (overlap), bukan nilai kategori
+RANGE_PARAMS = ('pH_range', 'Temperature_range', 'NaCl_tolerance')
+# Nilai uji kategori setelah _normalize_simple_value, dalam urutan kategori tetap (input & tabel detail)
+TEST_CATEGORIES = ('positive', 'negative', 'variable', 'N/A')
+
+# --- 1b. Vektor Bobot (preset terkompilasi) ---
+class WeightVector(namedtuple("WeightVector", ["name", "values", "array", "total"])):
+    """
+    Bobot satu preset, sejajar dengan PARAM_KEYS: `values` (tuple angka, untuk tampilan
+    detail), `array` (numpy read-only, untuk perkalian titik), dan `total` (jumlah bobot).
+    """
+
+    def as_dict(self):
+        return dict(zip(PARAM_KEYS, self.values))
+
+def compile_weights(name, overrides=None):
+    """Menyusun WeightVector dari WEIGHTS ditambah perubahan `overrides` ({param: bobot})."""
+    overrides = dict(overrides or {})
+    unknown = sorted(set(overrides) - set(PARAM_KEYS))
+    if unknown:
+        raise ValueError(f"Preset '{name}': parameter tidak dikenal {unknown}")
+    values = []
+    for param in PARAM_KEYS:
+        weight = overrides.get(param, WEIGHTS[param])
+        if not isinstance(weight, (int, float)) or isinstance(weight, bool) or weight < 0:
+            raise ValueError(f"Preset '{name}': bobot {param} harus angka >= 0, bukan {weight!r}")
+        values.append(weight)
+    array = np.array(values, dtype=float)
+    array.flags.writeable = False
+    return WeightVector(name, tuple(values), array, float(array.sum()))
+
+def _load_preset_file(path):
+    """Membaca preset pengguna dari file TOML; kosong jika file tidak ada atau tomllib tidak tersedia."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            print(f"[WARNING] {path} diabaikan: butuh Python 3.11+ atau paket tomli.")
+            return {}
+    with open(path, "rb") as f:
+        data = tomllib.load(f)
+    return {name: table for name, table in data.items() if isinstance(table, dict)}
+
+_weight_presets = None
+_weight_presets_lock = threading.Lock()
+
+def get_weight_presets():
+    """
+    Semua preset (WEIGHT_PRESETS + preset pengguna dari WEIGHT_PRESETS_FILE) sebagai
+    {nama: WeightVector}, dikompilasi sekali per proses. Preset pengguna yang tidak valid
+    dilewati dengan peringatan.
+    """
+    global _weight_presets
+    with _weight_presets_lock:
+        if _weight_presets is None:
+            presets = {name: compile_weights(name, overrides) for name, overrides in WEIGHT_PRESETS.items()}
+            for name, overrides in _load_preset_file(WEIGHT_PRESETS_FILE).items():
+                try:
+                    presets[name] = compile_weights(name, overrides)
+                except ValueError as e:
+                    print(f"[WARNING] {e}")
+            _weight_presets = MappingProxyType(presets)
+        return _weight_presets
+
+def get_weight_vector(preset="Default"):
+    """WeightVector untuk nama preset; ValueError jika preset tidak dikenal."""
+    presets = get_weight_presets()
+    if preset not in presets:
+        raise ValueError(f"Preset bobot tidak dikenal: {preset}")
+    return presets[preset]
+
 # --- 2. Fungsi Utilitas & Normalisasi ---
 def get_param_keys():
-    return list(WEIGHTS.keys())
+    return list(PARAM_KEYS)
 
 def normalize_columns(df):
     df.columns = [COLUMN_ALIASES.get(col.strip(), col.strip()) for col in df.columns]
     return df
 
+def _decode_cached_range(val, schema_version):
+    """
+    Mengubah nilai rentang dari JSON (list) menjadi tuple float. Nilai yang tidak bisa dibaca
+    sebagai rentang dikembalikan apa adanya, mis. NaCl_tolerance berupa 'positive'/'negative'
+    dari halophily, agar tidak hilang saat cache disimpan ulang.
+    """
+    if val is None or isinstance(val, tuple):
+        return val
+    if schema_version >= CACHE_SCHEMA_VERSION and isinstance(val, list) and len(val) == 2:
+        try:
+            return (float(val[0]), float(val[1]))
+        except (ValueError, TypeError):
+            return val
+    # Entri lama (tanpa versi skema) bisa berisi string rentang atau format lain
+    parsed = _parse_range(val)
+    return parsed if parsed is not None else val
+
+def _decode_cache_entry(entry):
+    """Decode parameter rentang seluruh profil dalam satu entri genus, sekali saat load."""
+    if not isinstance(entry, dict):
+        return entry
+    schema_version = entry.get('schema_version', 1)
+    # 'species' berisi profil konsensus per spesies (lihat species_consensus.py)
+    for section in ('profiles', 'species'):
+        profiles = entry.get(section, {})
+        if not isinstance(profiles, dict):
+            continue
+        for profile in profiles.values():
+            if not isinstance(profile, dict):
+                continue
+            for param in RANGE_PARAMS:
+                if param in profile:
+                    profile[param] = _decode_cached_range(profile[param], schema_version)
+    entry['schema_version'] = CACHE_SCHEMA_VERSION
+    return entry
+
+# Hasil parse terakhir dari backend cache: (backend key, versi, data). Dipakai ulang selama isinya tidak berubah.
+_cache_memo = None
+_cache_memo_lock = threading.Lock()
+
+def _shallow_cache_copy(cache):
+    # Salinan dua tingkat (genus -> entri) agar pemanggil bebas menambah/mengganti entri
+    return {genus: (dict(entry) if isinstance(entry, dict) else entry) for genus, entry in cache.items()}
+
+def _cache_backend():
+    # Backend json mengikuti CACHE_FILE (lihat cache_backend.get_cache_backend)
+    return get_cache_backend(CACHE_FILE)
+
+def _cache_snapshot(backend):
+    """(versi, data ter-decode) isi backend saat ini, dari memo jika versinya masih sama."""
+    global _cache_memo
+    key, version = backend.key(), backend.version()
+    with _cache_memo_lock:
+        if _cache_memo is not None and _cache_memo[:2] == (key, version):
+            metrics.inc("cache_file_loads", result="memo")
+            return version, _cache_memo[2]
+
+    metrics.inc("cache_file_loads", result="disk")
+    with metrics.span("cache_load"):
+        cache = backend.load()
+        for genus in cache:
+            _decode_cache_entry(cache[genus])
+    with _cache_memo_lock:
+        _cache_memo = (key, version, cache)
+    return version, cache
+
 def load_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, 'r') as f:
-            try: 
-                return json.load(f)
-            except json.JSONDecodeError: 
-                return {}
-    return {}
+    return _shallow_cache_copy(_cache_snapshot(_cache_backend())[1])
+
+def cache_version():
+    """Versi isi cache (mis. mtime + ukuran file untuk backend json); berubah setiap kali cache disimpan."""
+    return _cache_backend().version()
 
 def save_cache(cache_data):
-    with open(CACHE_FILE, 'w') as f:
-        json.dump(cache_data, f, indent=4)
+    """
+    Menulis entri yang berbeda dari isi backend saat ini. Entri yang lebih lama dari yang
+    tersimpan (salinan basi, sementara proses/replika lain sudah memperbarui genus itu) dilewati.
+    """
+    global _cache_memo
+    backend = _cache_backend()
+    for entry in cache_data.values():
+        if isinstance(entry, dict):
+            entry.setdefault('schema_version', CACHE_SCHEMA_VERSION)
+    version, stored = _cache_snapshot(backend)
+    changed = {
+        genus: entry for genus, entry in cache_data.items()
+        if stored.get(genus) != entry
+        and (not isinstance(stored.get(genus), dict) or entry.get('timestamp', 0) >= stored[genus].get('timestamp', 0))
+    }
+    if not changed:
+        return
+    with metrics.span("cache_save"):
+        written = backend.put_many(changed, base=(version, stored))
+    if written is not None:
+        for entry in written.values():
+            _decode_cache_entry(entry)
+        data = written
+    else:
+        data = {**stored, **changed}
+    with _cache_memo_lock:
+        _cache_memo = (backend.key(), backend.version(), _shallow_cache_copy(data))
+
+def get_cache_entry(genus):
+    """Entri satu genus langsung dari backend (tanpa memo), mis. untuk cek ulang setelah menunggu kunci."""
+    entry = _cache_backend().get(genus)
+    return _decode_cache_entry(entry) if isinstance(entry, dict) else None
+
+def delete_cache_entries(genera=None):
+    """Menghapus genus tertentu dari cache, atau seluruh cache jika None."""
+    global _cache_memo
+    _cache_backend().delete(genera)
+    with _cache_memo_lock:
+        _cache_memo = None
+
+def cache_lock(genus):
+    """Kunci per genus selama pengambilan dari API; jangkauannya mengikuti backend (proses, mesin, atau fleet)."""
+    return _cache_backend().lock(genus)
+
+# Sidik jari terakhir per dict profil: (versi cache, dict profil, hash)
+_fingerprint_memo = {}
+_fingerprint_memo_lock = threading.Lock()
+
+def profiles_fingerprint(profiles):
+    """
+    Hash isi profil strain (ID + semua nilai) untuk mendeteksi data turunan yang basi (konsensus
+    spesies, tabel likelihood) walaupun jumlah strain tidak berubah. Di-memo per dict profil dan
+    versi cache, karena load_cache memakai ulang dict yang sama selama cache tidak berubah.
+    """
+    version = cache_version()
+    key = id(profiles)
+    with _fingerprint_memo_lock:
+        memo = _fingerprint_memo.get(key)
+        if memo is not None and memo[0] == version and memo[1] is profiles:
+            return memo[2]
+    digest = hashlib.sha1(json.dumps(profiles, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    with _fingerprint_memo_lock:
+        if len(_fingerprint_memo) >= 64:
+            _fingerprint_memo.clear()
+        _fingerprint_memo[key] = (version, profiles, digest)
+    return digest
+
+def cache_entry_lifetime(entry):
+    """Umur maksimum (detik) entri cache genus sebelum diambil ulang dari API."""
+    if isinstance(entry, dict) and entry.get('source') == 'mirror':
+        return MIRROR_CACHE_DURATION_SECONDS
+    return CACHE_DURATION_SECONDS
+
+# Nama hasil ekstraksi yang menandakan dokumen strain tanpa taksonomi yang bisa dipakai
+INVALID_PROFILE_NAMES = ("Unknown Species", "Unknown sp.", "N/A", "Strain count")
+
+def is_named_profile(profile):
+    return profile.get("Nama Bakteri", "N/A") not in INVALID_PROFILE_NAMES
 
 def _normalize_simple_value(x):
     if x is None: 
@@ -311,7 +557,7 @@ def extract_parameter_value(strain_json, param):
             pass
     
     # DEFAULT: Parameter tidak ditemukan
-    if param in ['Temperature_range', 'pH_range', 'NaCl_tolerance']:
+    if param in RANGE_PARAMS:
         return None
     else:
         return 'N/A'
@@ -393,69 +639,106 @@ def extract_bacdive_data(strain_json, param_keys):
             profile[param] = extract_parameter_value(actual_strain_data, param)
         except Exception as e:
             print(f"Error extracting {param}: {e}")
-            profile[param] = 'N/A' if param not in {'pH_range', 'Temperature_range', 'NaCl_tolerance'} else None
+            profile[param] = 'N/A' if param not in RANGE_PARAMS else None
     
     return profile
 
+def _valid_cached_profiles(entry, offline, now):
+    """Profil dari entri cache jika masih berlaku (atau mode offline) dan berisi nama strain yang valid."""
+    if not isinstance(entry, dict):
+        return None
+    if not offline and (now - entry.get('timestamp', 0)) >= cache_entry_lifetime(entry):
+        return None
+    cached_profiles = entry.get('profiles', {})
+    if isinstance(cached_profiles, dict) and cached_profiles:
+        first_profile = next(iter(cached_profiles.values()), None)
+        if isinstance(first_profile, dict) and first_profile.get('Nama Bakteri', 'Unknown') not in ['Unknown sp.', 'Unknown Species', 'Strain count']:
+            return cached_profiles
+    return None
+
+def has_valid_cache(genus):
+    """True jika profil genus ada di cache dan masih berlaku, tanpa request ke API."""
+    return _valid_cached_profiles(load_cache().get(genus), is_offline(), time.time()) is not None
+
 def fetch_and_cache_profiles_by_taxonomy(session, genus, status_placeholder, log_container=None):
     """
     Fetch profiles by taxonomy. The log_container is now optional to allow for silent fetching.
+    Pengambilan dari API dilakukan di bawah kunci per genus (cache_lock), sehingga proses atau
+    replika lain yang meminta genus yang sama menunggu lalu membaca hasilnya dari cache.
     """
     cache = load_cache()
-    now = time.time()
+    # Mode offline ketat: cache lokal dipakai walaupun sudah kedaluwarsa
+    offline = is_offline()
 
     # Check cache validity
-    if genus in cache and (now - cache[genus].get('timestamp', 0)) < CACHE_DURATION_SECONDS:
-        cached_profiles = cache[genus].get('profiles', {})
-        if isinstance(cached_profiles, dict) and cached_profiles:
-            first_profile = next(iter(cached_profiles.values()), None)
-            if isinstance(first_profile, dict) and first_profile.get('Nama Bakteri', 'Unknown') not in ['Unknown sp.', 'Unknown Species', 'Strain count']:
-                status_placeholder.text(f"Cache valid ditemukan untuk genus {genus}.")
-                if log_container:
-                    log_container.info(f"Menggunakan {len(cached_profiles)} profil dari cache.")
-                time.sleep(0.3)
-                return cached_profiles
-        
+    cached_profiles = _valid_cached_profiles(cache.get(genus), offline, time.time())
+    if cached_profiles:
+        metrics.inc("cache_lookups", result="hit")
+        status_placeholder.text(f"Cache valid ditemukan untuk genus {genus}.")
         if log_container:
-            log_container.warning(f"Cache untuk genus {genus} ditemukan tapi tidak valid. Mengambil ulang dari API.")
+            log_container.info(f"Menggunakan {len(cached_profiles)} profil dari cache.")
+        time.sleep(0.3)
+        return cached_profiles
+    if genus in cache and log_container:
+        log_container.warning(f"Cache untuk genus {genus} ditemukan tapi tidak valid. Mengambil ulang dari API.")
+    metrics.inc("cache_lookups", result="stale" if genus in cache else "miss")
+    if offline:
+        # Gagal langsung, tanpa menunggu timeout koneksi
+        status_placeholder.error(f"Mode offline: profil genus {genus} tidak ada di cache lokal.")
+        if log_container:
+            log_container.error(f"Offline cache miss untuk genus {genus}")
+        return {}
 
+    with cache_lock(genus):
+        # Cek ulang langsung ke backend: genus mungkin baru saja diambil oleh pemegang kunci sebelumnya
+        cached_profiles = _valid_cached_profiles(get_cache_entry(genus), offline, time.time())
+        if cached_profiles:
+            metrics.inc("cache_lookups", result="shared")
+            status_placeholder.text(f"Genus {genus} baru saja diambil proses lain, memakai hasilnya.")
+            if log_container:
+                log_container.info(f"Menggunakan {len(cached_profiles)} profil yang baru diambil proses lain.")
+            return cached_profiles
+        return _download_genus_profiles(session, genus, status_placeholder, log_container)
+
+def _download_genus_profiles(session, genus, status_placeholder, log_container=None):
+    """Mencari strain genus di /taxon, mengambil semua profilnya dari /fetch, lalu menyimpannya ke cache."""
+    now = time.time()
     status_placeholder.text(f"Mencari strain untuk genus {genus}...")
-    search_url = f"https://api.bacdive.dsmz.de/taxon/{genus}"
+    search_url = api_url("taxon", genus)
     
-    try:
+    if log_container:
+        log_container.info(f"Menggunakan endpoint: {search_url}")
+    with metrics.span("taxon_search"):
+        search = request_one(search_url, session=session)
+
+    if search.status == 404:
+        status_placeholder.warning(f"Genus '{genus}' tidak ditemukan di BacDive.")
         if log_container:
-            log_container.info(f"Menggunakan endpoint: {search_url}")
-        resp = session.get(search_url, timeout=30)
-        resp.raise_for_status()
-        
-        search_data = resp.json()
+            log_container.warning(f"404 - Genus {genus} not found in BacDive database")
+        return {}
+    if search.status is not None and search.status >= 400:
+        status_placeholder.error(f"HTTP Error {search.status} saat mencari {genus}")
         if log_container:
-            log_container.info(f"Response berhasil dari {search_url}")
-        
-        if 'results' in search_data:
-            strain_ids = search_data['results']
-            total_count = search_data.get('count', len(strain_ids))
-            if log_container:
-                log_container.info(f"Found {len(strain_ids)} strain dalam response (total: {total_count})")
-        else:
-            if log_container:
-                log_container.error(f"Unexpected response structure: {search_data}")
-            return {}
-            
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 404:
-            status_placeholder.warning(f"Genus '{genus}' tidak ditemukan di BacDive.")
-            if log_container:
-                log_container.warning(f"404 - Genus {genus} not found in BacDive database")
-        else:
-            status_placeholder.error(f"HTTP Error {e.response.status_code} saat mencari {genus}")
-            if log_container:
-                log_container.error(f"HTTP {e.response.status_code}: {e}")
+            log_container.error(f"HTTP {search.status}: {search_url}")
         return {}
-    except (requests.RequestException, json.JSONDecodeError) as e:
-        status_placeholder.error(f"Gagal mencari strain untuk {genus}: {e}")
+    if not search.ok:
+        status_placeholder.error(f"Gagal mencari strain untuk {genus}: {search.error}")
+        if log_container:
+            log_container.error(f"Search error for {genus}: {search.error}")
+        return {}
+
+    search_data = search.data
+    if log_container:
+        log_container.info(f"Response berhasil dari {search_url}")
+
+    if isinstance(search_data, dict) and 'results' in search_data:
+        strain_ids = search_data['results']
+        total_count = search_data.get('count', len(strain_ids))
+        if log_container:
+            log_container.info(f"Found {len(strain_ids)} strain dalam response (total: {total_count})")
+    else:
         if log_container:
-            log_container.error(f"Search error for {genus}: {e}")
+            log_container.error(f"Unexpected response structure: {search_data}")
         return {}
 
     if not strain_ids:
@@ -472,44 +755,53 @@ def fetch_and_cache_profiles_by_taxonomy(session, genus, status_placeholder, log
     total_ids = len(strain_ids)
     processed = 0
     # Batasan max_profiles dihapus untuk mengambil semua data
-    
+
+    # Susun daftar URL lebih dulu, lalu ambil secara bersamaan (dibatasi FETCH_CONCURRENCY)
+    fetch_refs = []
     for i, strain_ref in enumerate(strain_ids):
-        global_i = i + 1
-        
-        status_placeholder.text(f"Mengambil profil {global_i}/{total_ids}...")
-        
-        try:
-            if isinstance(strain_ref, dict):
-                strain_id = strain_ref.get('id')
-                strain_url = strain_ref.get('url')
-                
-                if not strain_id:
-                    if log_container:
-                        log_container.warning(f"No ID found in strain reference: {strain_ref}")
-                    continue
-                
-                if strain_url:
-                    fetch_url = strain_url
-                else:
-                    fetch_url = f"https://api.bacdive.dsmz.de/fetch/{strain_id}"
+        if isinstance(strain_ref, dict):
+            strain_id = strain_ref.get('id')
+            if not strain_id:
+                if log_container:
+                    log_container.warning(f"No ID found in strain reference: {strain_ref}")
+                continue
+            fetch_url = strain_ref.get('url') or api_url("fetch", strain_id)
+        else:
+            strain_id = strain_ref
+            fetch_url = api_url("fetch", strain_id)
+        fetch_refs.append((i, strain_id, fetch_url))
 
-            else:
-                strain_id = strain_ref
-                fetch_url = f"https://api.bacdive.dsmz.de/fetch/{strain_id}"
-            
+    status_placeholder.text(f"Mengambil {len(fetch_refs)} profil ({FETCH_CONCURRENCY} koneksi paralel)...")
+    if log_container:
+        log_container.info(f"Fetching {len(fetch_refs)} strain secara paralel (concurrency {FETCH_CONCURRENCY})")
+    with metrics.span("strain_fetch"):
+        fetch_results = request_many([url for _, _, url in fetch_refs], session=session, concurrency=FETCH_CONCURRENCY)
+
+    for n, ((i, strain_id, fetch_url), result) in enumerate(zip(fetch_refs, fetch_results), start=1):
+        status_placeholder.text(f"Memproses profil {n}/{total_ids}...")
+
+        if result.status == 404:
             if log_container:
-                log_container.info(f"Fetching: {fetch_url}")
-            
-            r = session.get(fetch_url, timeout=30)
-            r.raise_for_status()
-            strain_data = r.json()
-            
-            if global_i == 1 and log_container:
+                log_container.warning(f"Strain data not found (404) for reference {i}")
+            continue
+        if result.status is not None and result.status >= 400:
+            if log_container:
+                log_container.error(f"HTTP {result.status} for strain reference {i}: {fetch_url}")
+            continue
+        if not result.ok or not isinstance(result.data, dict):
+            if log_container:
+                log_container.error(f"Error fetching strain reference {i}: {result.error or 'respons kosong'}")
+            continue
+
+        try:
+            strain_data = result.data
+            if n == 1 and log_container:
                 log_container.info(f"Sample strain data keys: {list(strain_data.keys())}")
             
-            clean = extract_bacdive_data(strain_data, param_keys)
+            with metrics.span("extraction"):
+                clean = extract_bacdive_data(strain_data, param_keys)
             
-            if clean.get("Nama Bakteri", "N/A") not in ["Unknown Species", "Unknown sp.", "N/A", "Strain count"]:
+            if is_named_profile(clean):
                 profiles[str(strain_id)] = clean
                 if log_container:
                     log_container.info(f"Extracted: {clean.get('Nama Bakteri', 'Unknown')}")
@@ -517,24 +809,13 @@ def fetch_and_cache_profiles_by_taxonomy(session, genus, status_placeholder, log
             else:
                 if log_container:
                     log_container.warning(f"Could not extract proper species name for strain ID {strain_id}: got '{clean.get('Nama Bakteri', 'N/A')}'")
-                
-        except requests.exceptions.HTTPError as e:
-            if log_container:
-                if e.response.status_code == 404:
-                    log_container.warning(f"Strain data not found (404) for reference {i}")
-                else:
-                    log_container.error(f"HTTP {e.response.status_code} for strain reference {i}: {e}")
-        except (requests.RequestException, json.JSONDecodeError) as e:
-            if log_container:
-                log_container.error(f"Error fetching strain reference {i}: {e}")
         except Exception as e:
             if log_container:
                 log_container.error(f"Unexpected error processing strain reference {i}: {e}")
-        
-        time.sleep(0.3)
     
     # Save to cache
-    cache[genus] = {"timestamp": now, "profiles": profiles}
+    cache = load_cache()
+    cache[genus] = {"timestamp": now, "schema_version": CACHE_SCHEMA_VERSION, "profiles": profiles}
     save_cache(cache)
     
     status_placeholder.text(f"Selesai mengambil data untuk {genus}.")
@@ -547,56 +828,52 @@ def get_single_strain_json(session, genus):
     """
     Mengambil satu contoh JSON - tidak berubah dari versi sebelumnya
     """
-    search_url = f"https://api.bacdive.dsmz.de/taxon/{genus}"
-    
-    try:
-        response = session.get(search_url, timeout=30)
-        response.raise_for_status()
-        search_data = response.json()
-        
-        if 'results' not in search_data or not search_data['results']:
-            return {"error": f"Tidak ada strain yang ditemukan untuk genus '{genus}'."}
-        
-        strain_refs = search_data['results']
-        first_strain_ref = strain_refs[0]
-        
-        if isinstance(first_strain_ref, dict):
-            strain_id = first_strain_ref.get('id')
-            strain_url = first_strain_ref.get('url')
-            
-            if not strain_id:
-                return {"error": "Tidak dapat menemukan ID strain dari response pertama."}
-            
-            if strain_url:
-                retrieve_url = strain_url
-            else:
-                retrieve_url = f"https://api.bacdive.dsmz.de/fetch/{strain_id}"
+    search_url = api_url("taxon", genus)
 
-            retrieve_response = session.get(retrieve_url, timeout=30)
-            retrieve_response.raise_for_status()
-            
-            strain_data = retrieve_response.json()
-            
-            return {
-                "bacdive_id": strain_id, 
-                "data": strain_data,
-                "debug_info": {
-                    "total_strains_found": search_data.get('count', len(strain_refs)),
-                    "json_structure_keys": list(strain_data.keys())
-                }
-            }
-        else:
-            return {"error": f"Format strain reference tidak dikenali: {first_strain_ref}"}
-        
-    except requests.exceptions.HTTPError as http_err:
-        details = http_err.response.text if hasattr(http_err, 'response') and http_err.response else "No details"
-        return {"error": f"Error HTTP: {http_err}", "details": details}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Error Koneksi: {e}"}
-    except json.JSONDecodeError:
+    search = request_one(search_url, session=session)
+    if search.status is None:
+        return {"error": f"Error Koneksi: {search.error}"}
+    if search.status >= 400:
+        return {"error": f"Error HTTP: {search.status} untuk {search_url}", "details": search.text or "No details"}
+    if search.error:
+        return {"error": search.error}
+    search_data = search.data or {}
+
+    if 'results' not in search_data or not search_data['results']:
+        return {"error": f"Tidak ada strain yang ditemukan untuk genus '{genus}'."}
+
+    strain_refs = search_data['results']
+    first_strain_ref = strain_refs[0]
+
+    if not isinstance(first_strain_ref, dict):
+        return {"error": f"Format strain reference tidak dikenali: {first_strain_ref}"}
+
+    strain_id = first_strain_ref.get('id')
+    strain_url = first_strain_ref.get('url')
+
+    if not strain_id:
+        return {"error": "Tidak dapat menemukan ID strain dari response pertama."}
+
+    retrieve_url = strain_url or api_url("fetch", strain_id)
+    retrieve = request_one(retrieve_url, session=session)
+    if retrieve.status is None:
+        return {"error": f"Error Koneksi: {retrieve.error}"}
+    if retrieve.status >= 400:
+        return {"error": f"Error HTTP: {retrieve.status} untuk {retrieve_url}", "details": retrieve.text or "No details"}
+    if retrieve.error or not isinstance(retrieve.data, dict):
         return {"error": "Gagal mem-parsing respons JSON dari server."}
 
-# --- 4. Fungsi Scoring (tidak berubah) ---
+    strain_data = retrieve.data
+    return {
+        "bacdive_id": strain_id, 
+        "data": strain_data,
+        "debug_info": {
+            "total_strains_found": search_data.get('count', len(strain_refs)),
+            "json_structure_keys": list(strain_data.keys())
+        }
+    }
+
+# --- 4. Fungsi Scoring ---
 def _overlap_ratio(a, b):
     if a is None or b is None: 
         return 0.0
@@ -607,22 +884,80 @@ def _overlap_ratio(a, b):
     union = max(max(a1, a2), max(b1, b2)) - min(min(a1, a2), min(b1, b2))
     return inter / union if union > 0 else 0.0
 
-def calculate_weighted_similarity(user_input, bacdive_profile):
-    score, max_possible = 0.0, 0.0
+def _overlap_ratio_many(urange, branges):
+    """
+    Versi vektor dari _overlap_ratio: satu rentang user terhadap semua kandidat sekaligus.
+    branges adalah array (n, 2); baris NaN (tidak ada data) menghasilkan 0.0.
+    """
+    branges = np.asarray(branges, dtype=float).reshape(-1, 2)
+    if urange is None or len(branges) == 0:
+        return np.zeros(len(branges))
+    u_lo, u_hi = min(urange), max(urange)
+    b_lo = np.minimum(branges[:, 0], branges[:, 1])
+    b_hi = np.maximum(branges[:, 0], branges[:, 1])
+    inter = np.clip(np.minimum(u_hi, b_hi) - np.maximum(u_lo, b_lo), 0.0, None)
+    union = np.maximum(u_hi, b_hi) - np.minimum(u_lo, b_lo)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(union > 0, inter / union, 0.0)
+    return np.nan_to_num(ratio, nan=0.0)
+
+def profile_range_matrix(profiles, param):
+    """Menyusun array (n, 2) float dari rentang `param` untuk daftar profil; NaN jika tidak ada."""
+    out = np.full((len(profiles), 2), np.nan)
+    for i, profile in enumerate(profiles):
+        bval = profile.get(param)
+        brange = bval if isinstance(bval, tuple) else _parse_range(bval)
+        if brange is not None:
+            out[i] = brange
+    return out
+
+def parse_user_ranges(user_input):
+    """Parse kolom rentang dari input user sekali per sampel. Nilai kosong/NA menjadi None."""
+    ranges = {}
+    for param in RANGE_PARAMS:
+        uval_raw = user_input.get(param)
+        urange = None
+        if uval_raw and str(uval_raw).strip() not in {'N/A', 'n/a'}:
+            urange = _parse_range(uval_raw)
+            if urange is not None and any(np.isnan(urange)):
+                urange = None
+        ranges[param] = urange
+    return ranges
+
+def range_overlaps_for_profiles(user_ranges, profiles):
+    """Menghitung overlap semua parameter rentang untuk semua kandidat: {param: array (n,)}."""
+    return {
+        param: _overlap_ratio_many(user_ranges.get(param), profile_range_matrix(profiles, param))
+        for param in RANGE_PARAMS
+    }
+
+def calculate_weighted_similarity(user_input, bacdive_profile, user_ranges=None, range_parts=None, weights=None):
+    """
+    Menghitung skor kemiripan berbobot. `user_ranges` (hasil parse_user_ranges) dan
+    `range_parts` ({param: overlap}) opsional, agar pemanggil yang membandingkan banyak
+    kandidat tidak perlu mem-parse ulang rentang untuk setiap kandidat. `weights` adalah
+    WeightVector (default: preset "Default").
+    """
+    if weights is None:
+        weights = get_weight_vector()
+    parts = np.zeros(len(PARAM_KEYS))
     details = []
     normalized_user = {k: _normalize_simple_value(v) for k, v in user_input.items() if str(v).strip() != ''}
+    if user_ranges is None:
+        user_ranges = parse_user_ranges(user_input)
 
-    for param, weight in WEIGHTS.items():
-        max_possible += weight
+    for j, (param, weight) in enumerate(zip(PARAM_KEYS, weights.values)):
         uval_raw = user_input.get(param)
         uval_norm = normalized_user.get(param)
         bval = bacdive_profile.get(param)
 
-        if param in {'pH_range', 'Temperature_range', 'NaCl_tolerance'}:
-            urange = _parse_range(uval_raw) if uval_raw and str(uval_raw).strip() not in {'N/A', 'n/a'} else None
+        if param in RANGE_PARAMS:
             brange = bval if isinstance(bval, tuple) else _parse_range(bval)
-            part = _overlap_ratio(urange, brange)
-            score += weight * part
+            if range_parts is not None and param in range_parts:
+                part = float(range_parts[param])
+            else:
+                part = _overlap_ratio(user_ranges.get(param), brange)
+            parts[j] = part
             det_mark = '✅' if part >= 0.75 else ('➖' if part > 0.1 else '❌')
             bval_disp = f"{brange[0]}-{brange[1]}" if brange else 'N/A'
             details.append({"Parameter": param, "Input": uval_raw or 'N/A', "BacDive Match": bval_disp, "Bobot": weight, "Cocok": det_mark})
@@ -633,15 +968,153 @@ def calculate_weighted_similarity(user_input, bacdive_profile):
             continue
 
         if bval == 'variable' or uval_norm == 'variable':
-            score += weight * 0.5
+            parts[j] = 0.5
             mark = '➖'
         else:
             match = (uval_norm == bval)
             if match: 
-                score += weight
+                parts[j] = 1.0
             mark = '✅' if match else '❌'
 
         details.append({"Parameter": param, "Input": uval_raw or 'N/A', "BacDive Match": bval, "Bobot": weight, "Cocok": mark})
 
-    similarity = (score / max_possible) * 100.0 if max_possible > 0 else 0.0
-    return similarity, details
\ No newline at end of file
+    # Skor = perkalian titik bagian cocok (0 / 0.5 / 1 / overlap) dengan vektor bobot
+    similarity = float(parts @ weights.array) / weights.total * 100.0 if weights.total > 0 else 0.0
+    return similarity, details
+
+def _categorical_part(uval_norm, bval):
+    """Bagian skor satu uji kategori: 1 cocok, 0.5 variable, 0 beda, NaN jika nilai BacDive tidak ada."""
+    if bval is None or bval == 'N/A':
+        return np.nan
+    if bval == 'variable' or uval_norm == 'variable':
+        return 0.5
+    return 1.0 if uval_norm == bval else 0.0
+
+class MatchMatrix:
+    """
+    Kecocokan satu sampel terhadap semua kandidat, tidak bergantung bobot: baris = kandidat,
+    kolom = PARAM_KEYS, nilai 1 / 0.5 / 0 untuk uji kategori (0 juga jika tidak diketahui,
+    lihat `known`) atau fraksi overlap untuk parameter rentang. Skor untuk preset apa pun
+    cukup satu perkalian matriks-vektor (scores), sehingga ganti preset tidak menilai ulang.
+    """
+
+    def __init__(self, user_input, profiles, user_ranges=None):
+        if user_ranges is None:
+            user_ranges = parse_user_ranges(user_input)
+        self.user_input = user_input
+        self.ids = list(profiles.keys())
+        self.profiles = list(profiles.values())
+        self._rows = {bacdive_id: i for i, bacdive_id in enumerate(self.ids)}
+
+        normalized_user = {k: _normalize_simple_value(v) for k, v in user_input.items() if str(v).strip() != ''}
+        range_overlaps = range_overlaps_for_profiles(user_ranges, self.profiles)
+        matches = np.zeros((len(self.profiles), len(PARAM_KEYS)))
+        known = np.ones(matches.shape, dtype=bool)
+        for j, param in enumerate(PARAM_KEYS):
+            if param in RANGE_PARAMS:
+                matches[:, j] = range_overlaps[param]
+                continue
+            uval_norm = normalized_user.get(param)
+            if not uval_norm or uval_norm == 'N/A':
+                known[:, j] = False
+                continue
+            # Satu kolom sekaligus; NaN = nilai BacDive tidak diketahui
+            column = np.array([_categorical_part(uval_norm, p.get(param)) for p in self.profiles], dtype=float)
+            unknown = np.isnan(column)
+            known[unknown, j] = False
+            column[unknown] = 0.0
+            matches[:, j] = column
+        matches.flags.writeable = False
+        known.flags.writeable = False
+        self.matches = matches
+        self.known = known
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, weights=None):
+        """Persentase kemiripan semua kandidat untuk satu WeightVector (array sejajar self.ids)."""
+        if weights is None:
+            weights = get_weight_vector()
+        if weights.total <= 0:
+            return np.zeros(len(self.ids))
+        return self.matches @ weights.array / weights.total * 100.0
+
+    def details(self, row, weights=None):
+        """Tabel perbandingan per parameter untuk satu kandidat (format calculate_weighted_similarity)."""
+        if weights is None:
+            weights = get_weight_vector()
+        profile = self.profiles[row]
+        matches = self.matches[row].tolist()
+        known = self.known[row].tolist()
+        details = []
+        for j, (param, weight) in enumerate(zip(PARAM_KEYS, weights.values)):
+            uval_raw = self.user_input.get(param)
+            bval = profile.get(param)
+            if param in RANGE_PARAMS:
+                brange = bval if isinstance(bval, tuple) else _parse_range(bval)
+                part = matches[j]
+                det_mark = '✅' if part >= 0.75 else ('➖' if part > 0.1 else '❌')
+                bval_disp = f"{brange[0]}-{brange[1]}" if brange else 'N/A'
+                details.append({"Parameter": param, "Input": uval_raw or 'N/A', "BacDive Match": bval_disp, "Bobot": weight, "Cocok": det_mark})
+            elif not known[j]:
+                details.append({"Parameter": param, "Input": uval_raw or 'N/A', "BacDive Match": bval or 'N/A', "Bobot": weight, "Cocok": "❓"})
+            else:
+                part = matches[j]
+                mark = '➖' if part == 0.5 else ('✅' if part == 1.0 else '❌')
+                details.append({"Parameter": param, "Input": uval_raw or 'N/A', "BacDive Match": bval, "Bobot": weight, "Cocok": mark})
+        return details
+
+    def rank(self, weights=None, ids=None, log_container=None, progress_callback=None, detail_limit=None):
+        """
+        Hasil terurut (Rank 1 paling mirip, hanya skor > 0) untuk `weights`. `ids` membatasi
+        kandidat (mis. strain dari satu spesies). Detail perbandingan hanya disusun untuk
+        `detail_limit` hasil teratas (None = semua).
+        """
+        if weights is None:
+            weights = get_weight_vector()
+        rows = range(len(self.ids)) if ids is None else [self._rows[b] for b in ids if b in self._rows]
+        scores = self.scores(weights)
+        total = len(rows)
+
+        results = []
+        for n, i in enumerate(rows, start=1):
+            bacdive_id = self.ids[i]
+            score = float(scores[i])
+            if log_container:
+                log_container.info(f"🧮 Similarity calculated for ID {bacdive_id}: {score:.2f}%")
+            if score > 0:
+                result = {
+                    "Rank": 0,
+                    "Nama Bakteri": self.profiles[i].get("Nama Bakteri", "N/A"),
+                    "Persentase": score,
+                    "ID": bacdive_id,
+                    "_row": i,
+                }
+                if 'strain_ids' in self.profiles[i]:
+                    result["Jumlah Strain"] = len(self.profiles[i]['strain_ids'])
+                results.append(result)
+            if progress_callback:
+                progress_callback(n, total, bacdive_id)
+
+        results.sort(key=lambda x: x["Persentase"], reverse=True)
+        for n, result in enumerate(results):
+            result["Rank"] = n + 1
+            row = result.pop("_row")
+            if detail_limit is None or n < detail_limit:
+                result["details"] = self.details(row, weights)
+        return results
+
+def rank_profiles(user_input, profiles, user_ranges=None, log_container=None, progress_callback=None, weights=None,
+                  detail_limit=None):
+    """
+    Menilai semua kandidat (dict id -> profil) dan mengembalikan hasil terurut, Rank 1 paling mirip.
+    progress_callback(i, total, bacdive_id) dipanggil setelah setiap kandidat dinilai.
+    `weights` adalah WeightVector preset yang dipakai (default: "Default"). Detail perbandingan
+    hanya disusun untuk `detail_limit` hasil teratas (None = semua).
+    """
+    with metrics.span("scoring"):
+        results = MatchMatrix(user_input, profiles, user_ranges).rank(weights, None, log_container, progress_callback,
+                                                                      detail_limit)
+    metrics.inc("scored_profiles", len(profiles))
+    return results
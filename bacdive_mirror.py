@@ -0,0 +1,348 @@
+"""
+Mirror lokal katalog BacDive.
+
+Strain BacDive di-crawl per rentang ID (satu request /fetch berisi hingga 100 ID). Untuk setiap
+rentang disimpan dokumen mentah (raw/<awal>.json.gz) dan profil hasil ekstraksi
+(profiles/<awal>.json). Posisi crawl disimpan di state.json setelah setiap batch, sehingga crawl
+yang terputus dilanjutkan dari rentang terakhir yang belum selesai.
+
+Setelah satu putaran penuh selesai (ujung katalog tercapai, bukan sekadar --end-id), profil
+digabungkan per strain ke cache genus (bacdive_cache.json) sehingga pencarian genus tidak lagi
+membutuhkan API. Pemanggilan berikutnya menjalankan
+sinkronisasi top-up: ID baru di atas ID tertinggi yang sudah dikenal, dan opsional rentang lama
+yang di-refresh.
+
+    python cache_manager.py mirror --rate 2 --max-requests 500   # crawl (bisa dihentikan & dilanjutkan)
+    python cache_manager.py mirror                               # lanjutkan / top-up setelah selesai
+    python cache_manager.py mirror --status
+"""
+import gzip
+import json
+import os
+import time
+
+import metrics
+from bacdive_client import RateBudget, api_url, request_many
+from bacdive_mapper import (
+    CACHE_SCHEMA_VERSION,
+    _decode_cache_entry,
+    extract_bacdive_data,
+    get_param_keys,
+    is_named_profile,
+    load_cache,
+    save_cache,
+)
+
+# --- 0. Konfigurasi Mirror ---
+MIRROR_DIR = os.environ.get("BACDIVE_MIRROR_DIR", "bacdive_mirror")
+# BacDive menerima maksimal 100 ID per request /fetch
+RANGE_SIZE = 100
+MIRROR_CONCURRENCY = 4
+# Laju default (request per detik) agar crawl panjang tetap sopan terhadap server BacDive
+MIRROR_RATE = 2.0
+# Ujung katalog dianggap tercapai setelah sekian rentang berturut-turut tanpa strain
+STOP_AFTER_EMPTY = 50
+STATE_VERSION = 1
+
+def _write_json(path, data, compress=False):
+    """Tulis atomik (file sementara + os.replace) agar state tidak rusak saat proses dihentikan."""
+    tmp = f"{path}.tmp"
+    opener = gzip.open if compress else open
+    with opener(tmp, "wt", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def _read_json(path, compress=False):
+    opener = gzip.open if compress else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+def _strain_genus(document):
+    taxonomy = document.get("Name and taxonomic classification", {})
+    return taxonomy.get("genus") if isinstance(taxonomy, dict) else None
+
+# --- 1. Mirror ---
+class BacDiveMirror:
+    """Penyimpanan mirror di satu folder beserta cursor crawl-nya (state.json)."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or MIRROR_DIR
+        self.raw_dir = os.path.join(self.directory, "raw")
+        self.profiles_dir = os.path.join(self.directory, "profiles")
+        self.state_path = os.path.join(self.directory, "state.json")
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            state = _read_json(self.state_path)
+            if state.get("version") == STATE_VERSION:
+                return state
+            print(f"[WARNING] Versi state mirror {state.get('version')} tidak dikenal, crawl dimulai ulang.")
+        return self._new_state()
+
+    @staticmethod
+    def _new_state(range_size=RANGE_SIZE):
+        return {
+            "version": STATE_VERSION,
+            "range_size": range_size,
+            "phase": "crawl",       # crawl = putaran penuh pertama, sync = top-up
+            "next_id": 1,
+            "high_water": 0,        # ID strain tertinggi yang pernah ditemukan
+            "empty_ranges": 0,
+            "complete": False,      # True setelah putaran penuh pertama selesai
+            "completed_at": None,
+            "last_sync": None,
+            "requests": 0,
+            "strains": 0,
+        }
+
+    def save_state(self):
+        os.makedirs(self.directory, exist_ok=True)
+        _write_json(self.state_path, self.state)
+
+    def reset(self, range_size=RANGE_SIZE):
+        """Mengulang cursor dari ID 1. Data yang sudah tersimpan ditimpa saat rentangnya di-crawl ulang."""
+        self.state = self._new_state(range_size)
+        self.save_state()
+
+    def _range_ids(self, start, end_id=None):
+        stop = start + self.state["range_size"]
+        if end_id is not None:
+            stop = min(stop, end_id + 1)
+        return range(start, stop)
+
+    def _shard_name(self, start):
+        return f"{start:07d}"
+
+    def shard_starts(self):
+        if not os.path.isdir(self.profiles_dir):
+            return []
+        return sorted(int(name.split(".")[0]) for name in os.listdir(self.profiles_dir) if name.endswith(".json"))
+
+    # --- 2. Penyimpanan Rentang ---
+    def _store_range(self, start, data, fetched_at=None):
+        """Menyimpan dokumen mentah + profil satu rentang. Mengembalikan (jumlah strain, ID tertinggi)."""
+        documents = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(documents, dict) or not documents:
+            self._drop_range(start)
+            return 0, 0
+
+        param_keys = get_param_keys()
+        profiles = {}
+        for strain_id, document in documents.items():
+            if not isinstance(document, dict):
+                continue
+            with metrics.span("extraction"):
+                profile = extract_bacdive_data(document, param_keys)
+            genus = _strain_genus(document)
+            if genus and is_named_profile(profile):
+                profiles[str(strain_id)] = {"genus": genus, "profile": profile}
+
+        now = fetched_at or time.time()
+        os.makedirs(self.raw_dir, exist_ok=True)
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        name = self._shard_name(start)
+        _write_json(os.path.join(self.raw_dir, f"{name}.json.gz"),
+                    {"start": start, "fetched_at": now, "documents": documents}, compress=True)
+        _write_json(os.path.join(self.profiles_dir, f"{name}.json"),
+                    {"start": start, "fetched_at": now, "profiles": profiles})
+        return len(documents), max(int(i) for i in documents if str(i).isdigit())
+
+    def _drop_range(self, start):
+        name = self._shard_name(start)
+        for path in (os.path.join(self.raw_dir, f"{name}.json.gz"), os.path.join(self.profiles_dir, f"{name}.json")):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _fetch_ranges(self, session, starts, end_id=None):
+        """
+        Mengambil beberapa rentang sekaligus. Mengembalikan [(start, jumlah strain, ID tertinggi)]
+        untuk prefiks rentang yang berhasil, dan pesan error jika ada rentang yang gagal.
+        """
+        urls = [api_url("fetch", ";".join(str(i) for i in self._range_ids(start, end_id))) for start in starts]
+        with metrics.span("mirror_batch"):
+            results = request_many(urls, session=session, concurrency=len(urls))
+        self.state["requests"] += len(urls)
+
+        done = []
+        for start, result in zip(starts, results):
+            if result.status == 404:
+                self._drop_range(start)
+                done.append((start, 0, 0))
+            elif result.ok:
+                count, top = self._store_range(start, result.data)
+                done.append((start, count, top))
+            else:
+                # Rentang gagal (dan sesudahnya) tidak dicatat; dijalankan ulang pada run berikutnya
+                metrics.inc("mirror_ranges", result="error")
+                return done, f"rentang {start}: {result.error or f'HTTP {result.status}'}"
+            metrics.inc("mirror_ranges", result="stored" if done[-1][1] else "empty")
+        return done, None
+
+    # --- 3. Crawl & Top-up ---
+    def crawl(self, session, budget=None, concurrency=MIRROR_CONCURRENCY, end_id=None,
+              stop_after_empty=STOP_AFTER_EMPTY, progress=None):
+        """
+        Melanjutkan crawl dari cursor. Setelah putaran penuh pertama, setiap pemanggilan menjadi
+        top-up dari ID tertinggi yang dikenal. Berhenti di ujung katalog (atau `end_id`), saat
+        `budget` habis, atau saat ada rentang yang gagal. Hanya ujung katalog yang menandai putaran
+        selesai; berhenti di `end_id` menyisakan cursor untuk dilanjutkan. Mengembalikan ringkasan run.
+        """
+        state = self.state
+        budget = budget or RateBudget(MIRROR_RATE, burst=concurrency)
+        if state["complete"]:
+            state.update(phase="sync", complete=False, next_id=state["high_water"] + 1, empty_ranges=0)
+
+        summary = {"phase": state["phase"], "ranges": 0, "strains": 0, "stopped": None, "error": None}
+        while True:
+            if end_id is not None and state["next_id"] > end_id:
+                summary["stopped"] = "end_id"
+                break
+            if state["empty_ranges"] >= stop_after_empty:
+                summary["stopped"] = "end"
+                break
+            starts = [state["next_id"] + k * state["range_size"] for k in range(concurrency)]
+            if end_id is not None:
+                starts = [s for s in starts if s <= end_id]
+            granted = budget.acquire(len(starts))
+            if not granted:
+                summary["stopped"] = "budget"
+                break
+
+            done, error = self._fetch_ranges(session, starts[:granted], end_id)
+            for start, count, top in done:
+                state["empty_ranges"] = 0 if count else state["empty_ranges"] + 1
+                state["high_water"] = max(state["high_water"], top)
+                state["next_id"] = start + state["range_size"]
+                state["strains"] += count
+                summary["ranges"] += 1
+                summary["strains"] += count
+            self.save_state()
+            if progress:
+                progress(state)
+            if error:
+                summary.update(stopped="error", error=error)
+                break
+
+        if summary["stopped"] == "end":
+            now = time.time()
+            state.update(complete=True, next_id=state["high_water"] + 1, empty_ranges=0, last_sync=now)
+            state["completed_at"] = state["completed_at"] or now
+            self.save_state()
+        return summary
+
+    def refresh_stale(self, session, max_age_days, budget=None, concurrency=MIRROR_CONCURRENCY, progress=None):
+        """Mengambil ulang rentang yang disimpan lebih dari `max_age_days` hari lalu. Mengembalikan jumlah rentang."""
+        budget = budget or RateBudget(MIRROR_RATE, burst=concurrency)
+        cutoff = time.time() - max_age_days * 24 * 60 * 60
+        stale = [
+            start for start in self.shard_starts()
+            if _read_json(os.path.join(self.profiles_dir, f"{self._shard_name(start)}.json")).get("fetched_at", 0) < cutoff
+        ]
+        refreshed = 0
+        for i in range(0, len(stale), concurrency):
+            granted = budget.acquire(len(stale[i:i + concurrency]))
+            if not granted:
+                break
+            done, error = self._fetch_ranges(session, stale[i:i + granted])
+            refreshed += len(done)
+            self.save_state()
+            if progress:
+                progress(self.state)
+            if error:
+                print(f"[WARNING] Refresh berhenti: {error}")
+                break
+        return refreshed
+
+    # --- 4. Publikasi ke Cache Genus ---
+    def genus_profiles(self, with_timestamps=False):
+        """
+        {genus: {strain_id: profil}} dari seluruh rentang yang tersimpan. Dengan `with_timestamps`,
+        nilainya ({strain_id: profil}, {strain_id: fetched_at rentangnya}).
+        """
+        genera, stamps = {}, {}
+        for start in self.shard_starts():
+            shard = _read_json(os.path.join(self.profiles_dir, f"{self._shard_name(start)}.json"))
+            for strain_id, item in shard.get("profiles", {}).items():
+                genera.setdefault(item["genus"], {})[strain_id] = item["profile"]
+                stamps.setdefault(item["genus"], {})[strain_id] = shard.get("fetched_at", 0)
+        if with_timestamps:
+            return {genus: (profiles, stamps[genus]) for genus, profiles in genera.items()}
+        return genera
+
+    def publish(self):
+        """
+        Menggabungkan profil mirror ke cache genus per strain (cache_bundle.merge_genus_entry):
+        strain hanya menimpa yang lokal jika rentangnya diambil lebih baru, dan strain lokal yang
+        tidak ada di mirror tetap ada. Hanya setelah putaran penuh selesai. Mengembalikan jumlah
+        genus yang berubah.
+        """
+        # Import lokal: cache_bundle mengimpor modul ini
+        from cache_bundle import merge_genus_entry
+
+        if not self.state.get("completed_at"):
+            return 0
+        with metrics.span("mirror_publish"):
+            cache = load_cache()
+            changed = 0
+            for genus, (profiles, stamps) in self.genus_profiles(with_timestamps=True).items():
+                incoming = _decode_cache_entry({
+                    "timestamp": max(stamps.values()), "schema_version": CACHE_SCHEMA_VERSION,
+                    "profiles": profiles, "strain_timestamps": stamps, "source": "mirror",
+                })
+                merged, added, updated = merge_genus_entry(cache.get(genus), incoming)
+                if merged != cache.get(genus):
+                    cache[genus] = merged
+                    changed += 1
+            if changed:
+                save_cache(cache)
+        return changed
+
+    # --- 5. Dokumen Mentah untuk Bundle (cache_bundle.py) ---
+    def iter_documents(self, genera=None):
+        """Menghasilkan (genus, strain_id, dokumen, fetched_at) untuk strain mirror, opsional hanya `genera`."""
+        for start in self.shard_starts():
+            name = self._shard_name(start)
+            shard = _read_json(os.path.join(self.profiles_dir, f"{name}.json"))
+            wanted = {
+                strain_id: item["genus"] for strain_id, item in shard.get("profiles", {}).items()
+                if genera is None or item["genus"] in genera
+            }
+            raw_path = os.path.join(self.raw_dir, f"{name}.json.gz")
+            if not wanted or not os.path.exists(raw_path):
+                continue
+            raw = _read_json(raw_path, compress=True)
+            for strain_id, document in raw.get("documents", {}).items():
+                if strain_id in wanted:
+                    yield wanted[strain_id], strain_id, document, raw.get("fetched_at", 0)
+
+    def merge_documents(self, documents):
+        """
+        Menggabungkan dokumen {strain_id: (dokumen, fetched_at)} ke rentang mirror. Dokumen hanya
+        menimpa yang lokal jika lebih baru. Mengembalikan jumlah dokumen yang ditulis.
+        """
+        by_range = {}
+        size = self.state["range_size"]
+        for strain_id, item in documents.items():
+            start = (int(strain_id) - 1) // size * size + 1
+            by_range.setdefault(start, {})[str(strain_id)] = item
+
+        written = 0
+        for start, items in sorted(by_range.items()):
+            raw_path = os.path.join(self.raw_dir, f"{self._shard_name(start)}.json.gz")
+            local = _read_json(raw_path, compress=True) if os.path.exists(raw_path) else {}
+            local_at = local.get("fetched_at", 0)
+            merged = dict(local.get("documents", {}))
+            newer = {sid: doc for sid, (doc, fetched_at) in items.items() if sid not in merged or fetched_at > local_at}
+            if not newer:
+                continue
+            merged.update(newer)
+            # Satu fetched_at per rentang: yang tertua, agar refresh_stale tetap mengambil ulang bagian lama
+            fetched_at = min([items[sid][1] for sid in newer] + ([local_at] if local else []))
+            self._store_range(start, {"results": merged}, fetched_at=fetched_at)
+            written += len(newer)
+        return written
+
+    def status(self):
+        """Ringkasan state untuk ditampilkan (mis. `cache_manager.py mirror --status`)."""
+        return {**self.state, "shards": len(self.shard_starts()), "directory": self.directory}
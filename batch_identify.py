@@ -0,0 +1,203 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from input_loader import excel_engine, read_upload, sample_records
+from report_builder import report_format_for_path, write_report
+from cache_backend import cache_backend_settings, configure_cache_backend
+from bacdive_mapper import (
+    fetch_and_cache_profiles_by_taxonomy,
+    get_weight_vector,
+    load_cache,
+    normalize_columns,
+    parse_user_ranges,
+    rank_profiles,
+)
+from range_index import RangeIndex
+from likelihood_tables import LIKELIHOOD_ALPHA, LikelihoodMatrix, _tables_current, build_likelihood_tables
+
+# --- 0. Konfigurasi Batch ---
+DEFAULT_CHUNKSIZE = 500
+RESULT_COLUMNS = ["Sample_Name", "Genus", "Rank", "Nama Bakteri", "Persentase", "ID"]
+SCORING_METHODS = ("weighted", "probabilistic")
+
+# State per proses worker, diisi sekali oleh _init_worker
+_worker_profiles = {}
+_worker_top_k = 10
+_worker_with_details = False
+_worker_weights = None
+_worker_scoring = "weighted"
+# Tabel likelihood per genus (mode probabilistic): dari cache jika masih cocok, selain itu dibangun sekali per proses
+_worker_tables = {}
+# Prefilter rentang (overlap minimum, 0 = nonaktif) dan index rentang per genus, dibangun sekali per proses
+_worker_range_overlap = 0.0
+_worker_indexes = {}
+
+# --- 1. Worker (dijalankan di process pool) ---
+def _init_worker(preset, top_k, with_details=False, cache_settings=None, scoring="weighted", range_min_overlap=0.0):
+    """Memuat cache dan preset bobot satu kali per proses worker."""
+    global _worker_profiles, _worker_top_k, _worker_with_details, _worker_weights, _worker_scoring, _worker_range_overlap
+    if cache_settings:
+        # Backend cache proses induk (proses spawn tidak mewarisi configure_cache_backend)
+        configure_cache_backend(**cache_settings)
+    _worker_weights = get_weight_vector(preset)
+    _worker_top_k = top_k
+    _worker_with_details = with_details
+    _worker_scoring = scoring
+    _worker_range_overlap = range_min_overlap
+    _worker_tables.clear()
+    _worker_indexes.clear()
+    _worker_profiles = {}
+    for genus, entry in load_cache().items():
+        if not isinstance(entry, dict):
+            continue
+        _worker_profiles[genus] = entry.get('profiles', {})
+        if scoring == "probabilistic" and _tables_current(entry.get('likelihood'), _worker_profiles[genus], LIKELIHOOD_ALPHA):
+            _worker_tables[genus] = entry['likelihood']
+
+def _genus_tables(genus, profiles):
+    tables = _worker_tables.get(genus)
+    if tables is None:
+        tables = _worker_tables[genus] = build_likelihood_tables(profiles)
+    return tables
+
+def _genus_index(genus, profiles):
+    index = _worker_indexes.get(genus)
+    if index is None:
+        index = _worker_indexes[genus] = RangeIndex(profiles)
+    return index
+
+def _identify_record(record):
+    """Menilai satu baris input terhadap profil genusnya. Mengembalikan (record, kandidat top-k)."""
+    genus = record.get("Genus")
+    if genus is None or pd.isna(genus):
+        return record, []
+    genus = str(genus).strip()
+    profiles = _worker_profiles.get(genus)
+    if not profiles:
+        return record, []
+    filtered = False
+    user_ranges = parse_user_ranges(record)
+    if _worker_range_overlap > 0:
+        allowed_ids = _genus_index(genus, profiles).filter_ids(user_ranges, _worker_range_overlap)
+        if allowed_ids is not None:
+            profiles = {bid: p for bid, p in profiles.items() if str(bid) in allowed_ids}
+            filtered = True
+            if not profiles:
+                return record, []
+    detail_limit = 1 if _worker_with_details else 0
+    if _worker_scoring == "probabilistic":
+        # Tabel tersimpan hanya berlaku untuk genus utuh; hasil filter rentang dibangun per sampel
+        tables = build_likelihood_tables(profiles) if filtered else _genus_tables(genus, profiles)
+        matrix = LikelihoodMatrix(record, tables)
+        results = matrix.rank(_worker_weights, detail_limit=detail_limit)[:_worker_top_k]
+    else:
+        results = rank_profiles(record, profiles, user_ranges, weights=_worker_weights, detail_limit=detail_limit)[:_worker_top_k]
+    candidates = [{k: r[k] for k in ("Rank", "Nama Bakteri", "Persentase", "ID")} for r in results]
+    if _worker_with_details and candidates:
+        # Detail perbandingan kandidat utama, hanya dibutuhkan untuk laporan
+        candidates[0]["details"] = results[0]["details"]
+    return record, candidates
+
+# --- 2. Input ---
+def read_input_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Membaca file input (format template_input.csv) per chunk lewat input_loader."""
+    return read_upload(path, path, chunksize)
+
+def list_input_genera(path):
+    """Mengambil daftar genus unik dari file input tanpa memuat kolom lain."""
+    is_genus = lambda col: str(col).strip() == "Genus"
+    if path.lower().endswith(('.xlsx', '.xls')):
+        data = pd.read_excel(path, usecols=is_genus, engine=excel_engine())
+    else:
+        data = pd.read_csv(path, usecols=is_genus, encoding='utf-8')
+    data = normalize_columns(data)
+    if "Genus" not in data.columns:
+        return []
+    return sorted({str(g).strip() for g in data["Genus"].dropna() if str(g).strip()})
+
+def ensure_genera_cached(session, genera, status_placeholder, log_container=None):
+    """Memastikan profil setiap genus tersedia (dan masih valid) di cache sebelum batch dimulai."""
+    missing = []
+    for genus in genera:
+        if not fetch_and_cache_profiles_by_taxonomy(session, genus, status_placeholder, log_container):
+            missing.append(genus)
+    return missing
+
+# --- 3. Output ---
+class ResultWriter:
+    """Menulis hasil per sampel secara streaming ke CSV (satu baris per kandidat) atau JSONL."""
+
+    def __init__(self, path, output_format=None):
+        self.format = output_format or ('jsonl' if path.lower().endswith('.jsonl') else 'csv')
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        if self.format == 'csv':
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(RESULT_COLUMNS)
+
+    def write(self, sample_name, genus, candidates):
+        genus = None if genus is None or pd.isna(genus) else genus
+        if self.format == 'jsonl':
+            candidates = [{k: v for k, v in c.items() if k != "details"} for c in candidates]
+            record = {"Sample_Name": sample_name, "Genus": genus, "candidates": candidates}
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        if not candidates:
+            self._writer.writerow([sample_name, genus, "", "", "", ""])
+        for c in candidates:
+            self._writer.writerow([sample_name, genus, c["Rank"], c["Nama Bakteri"], f"{c['Persentase']:.2f}", c["ID"]])
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+# --- 4. Pipeline Utama ---
+def identify_file(input_path, output_path, top_k=10, preset="Default", workers=None,
+                  chunksize=DEFAULT_CHUNKSIZE, output_format=None, progress=None, report_path=None,
+                  scoring="weighted", range_min_overlap=0.0):
+    """
+    Mengidentifikasi semua sampel dalam file input memakai profil di cache, memakai
+    process pool, dan menulis hasil terurut ke output_path secara streaming.
+    Jika report_path diberikan, laporan lengkap (docx/xlsx/html/zip) juga ditulis di akhir.
+    progress(n) dipanggil setiap selesai satu chunk. Mengembalikan jumlah sampel diproses.
+    scoring "probabilistic" meranking spesies menurut posterior tabel likelihood (ID = nama spesies).
+    range_min_overlap > 0 menyaring kandidat lewat index rentang (suhu/pH/NaCl) seperti di aplikasi.
+    """
+    get_weight_vector(preset)  # ValueError jika preset tidak dikenal
+    if scoring not in SCORING_METHODS:
+        raise ValueError(f"Metode skor tidak dikenal: {scoring}")
+    if not 0 <= range_min_overlap <= 1:
+        raise ValueError(f"Overlap rentang minimum harus di antara 0 dan 1 (diberikan: {range_min_overlap})")
+    # Format laporan dicek sebelum batch berjalan, bukan setelah semua sampel selesai
+    report_format = report_format_for_path(report_path) if report_path else None
+
+    writer = ResultWriter(output_path, output_format)
+    processed = 0
+    sample_reports = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(preset, top_k, bool(report_path), cache_backend_settings(), scoring, range_min_overlap)) as pool:
+            for chunk in read_input_chunks(input_path, chunksize):
+                records = sample_records(chunk)
+                for record, candidates in pool.map(_identify_record, records, chunksize=32):
+                    processed += 1
+                    sample_name = record.get("Sample_Name")
+                    if sample_name is None or pd.isna(sample_name):
+                        sample_name = f"Sampel #{processed}"
+                    writer.write(sample_name, record.get("Genus"), candidates)
+                    if report_path:
+                        sample_reports.append({"sample_name": sample_name, "results": candidates})
+                writer.flush()
+                if progress:
+                    progress(processed)
+    finally:
+        writer.close()
+
+    if report_path:
+        write_report(sample_reports, report_path, report_format)
+    return processed
@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import itertools  # noqa: E402
+import json  # noqa: E402
+
+import bacdive_mapper  # noqa: E402
+import cache_backend  # noqa: E402
+from conftest import STRAIN_SIZES  # noqa: E402
+from bacdive_mapper import load_cache, save_cache  # noqa: E402
+
+def _store_for(synthetic_store, n_strains, timestamp=0):
+    profiles = synthetic_store[n_strains]
+    return {"Synthetic": {"timestamp": timestamp, "schema_version": bacdive_mapper.CACHE_SCHEMA_VERSION,
+                          "profiles": profiles}}
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend_name(request, tmp_path, monkeypatch):
+    """Backend cache lokal yang diukur; sqlite memakai file sementara di samping temp_cache_file."""
+    if request.param == "sqlite":
+        monkeypatch.setattr(cache_backend, "CACHE_BACKEND", "sqlite")
+        monkeypatch.setattr(cache_backend, "CACHE_PATH", str(tmp_path / "bench_cache.db"))
+        monkeypatch.setattr(cache_backend, "_backend", None)
+    return request.param
+
+@pytest.mark.parametrize("n_strains", STRAIN_SIZES)
+def test_save_cache(benchmark, synthetic_store, temp_cache_file, backend_name, n_strains):
+    # Timestamp baru setiap ronde: entri yang tidak berubah tidak ditulis ulang oleh save_cache
+    timestamps = itertools.count(1)
+
+    def fresh_store():
+        return (_store_for(synthetic_store, n_strains, next(timestamps)),), {}
+
+    benchmark.extra_info["strains"] = n_strains
+    benchmark.pedantic(save_cache, setup=fresh_store, rounds=3, iterations=1)
+
+@pytest.mark.parametrize("n_strains", STRAIN_SIZES)
+def test_load_cache_cold(benchmark, synthetic_store, temp_cache_file, backend_name, n_strains):
+    save_cache(_store_for(synthetic_store, n_strains))
+
+    def cold_load():
+        # Buang memo agar file benar-benar di-parse ulang
+        bacdive_mapper._cache_memo = None
+        return load_cache()
+
+    benchmark.extra_info["strains"] = n_strains
+    cache = benchmark.pedantic(cold_load, rounds=3, iterations=1)
+    assert len(cache["Synthetic"]["profiles"]) == n_strains
+
+def test_load_cache_memoised(benchmark, synthetic_store, temp_cache_file):
+    save_cache(_store_for(synthetic_store, STRAIN_SIZES[-1]))
+    load_cache()
+    benchmark(load_cache)
+
+@pytest.mark.parametrize("backend_name", ["json"], indirect=True)
+def test_cache_round_trip(benchmark, cache_snapshot, temp_cache_file, backend_name):
+    """Load/save cache bawaan tidak boleh mengubah atau menghilangkan field profil (mis. NaCl_tolerance kategori)."""
+    def round_trip():
+        bacdive_mapper._cache_memo = None
+        cache = load_cache()
+        for entry in cache.values():
+            entry["timestamp"] += 1
+        save_cache(cache)
+
+    with open(temp_cache_file, "w") as f:
+        json.dump(cache_snapshot, f)
+    benchmark.pedantic(round_trip, rounds=3, iterations=1)
+
+    with open(temp_cache_file) as f:
+        stored = json.load(f)
+    assert set(stored) == set(cache_snapshot)
+    for genus, entry in cache_snapshot.items():
+        assert stored[genus]["profiles"] == entry["profiles"]
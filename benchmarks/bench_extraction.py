@@ -0,0 +1,17 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bacdive_mapper import extract_bacdive_data, get_param_keys  # noqa: E402
+from synthetic import synthetic_strain_json  # noqa: E402
+
+@pytest.fixture(scope="module")
+def strain_docs():
+    import random
+    rng = random.Random(7)
+    return [synthetic_strain_json(rng, i) for i in range(200)]
+
+def test_extract_bacdive_data_200_strains(benchmark, strain_docs):
+    param_keys = get_param_keys()
+    profiles = benchmark(lambda: [extract_bacdive_data(doc, param_keys) for doc in strain_docs])
+    assert len(profiles) == len(strain_docs)
@@ -0,0 +1,25 @@
+import io
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bacdive_mapper import normalize_columns  # noqa: E402
+from input_loader import load_upload  # noqa: E402
+from synthetic import synthetic_user_input  # noqa: E402
+
+@pytest.fixture(scope="module")
+def upload_csv():
+    import random
+    rng = random.Random(11)
+    rows = [synthetic_user_input(rng, genus=rng.choice(("Aeromonas", "Streptococcus"))) for _ in range(5000)]
+    return pd.DataFrame(rows).to_csv(index=False).encode("utf-8")
+
+def test_normalize_columns(benchmark, upload_csv):
+    df = pd.read_csv(io.BytesIO(upload_csv), dtype=str)
+    benchmark(lambda: normalize_columns(df.copy()))
+
+def test_load_upload_5000_rows(benchmark, upload_csv):
+    data = benchmark(lambda: load_upload(io.BytesIO(upload_csv), "sampel.csv"))
+    assert len(data) == 5000
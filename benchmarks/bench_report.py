@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("docx")
+
+from bacdive_mapper import rank_profiles  # noqa: E402
+from report_builder import build_report  # noqa: E402
+from synthetic import synthetic_user_input  # noqa: E402
+
+@pytest.fixture(scope="module")
+def sample_reports(cached_profiles):
+    import random
+    rng = random.Random(3)
+    reports = []
+    for i in range(50):
+        results = rank_profiles(synthetic_user_input(rng), cached_profiles)
+        reports.append({"sample_name": f"Sampel_{i}", "results": results})
+    return reports
+
+@pytest.mark.parametrize("fmt", ["docx", "xlsx", "html", "csv"])
+def test_build_report_50_samples(benchmark, sample_reports, fmt):
+    data = benchmark.pedantic(build_report, args=(sample_reports, fmt), rounds=3, iterations=1)
+    assert data
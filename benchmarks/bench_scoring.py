@@ -0,0 +1,69 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from conftest import STRAIN_SIZES  # noqa: E402
+from bacdive_mapper import (  # noqa: E402
+    MatchMatrix,
+    calculate_weighted_similarity,
+    get_weight_vector,
+    parse_user_ranges,
+    rank_profiles,
+)
+from likelihood_tables import LikelihoodMatrix, build_likelihood_tables, score_samples  # noqa: E402
+from range_index import RangeIndex  # noqa: E402
+from synthetic import synthetic_user_input  # noqa: E402
+
+def test_weighted_similarity_single_profile(benchmark, cached_profiles, rng):
+    user_input = synthetic_user_input(rng)
+    profile = next(iter(cached_profiles.values()))
+    score, _ = benchmark(calculate_weighted_similarity, user_input, profile)
+    assert 0 <= score <= 100
+
+def test_rank_profiles_cached_genus(benchmark, cached_profiles, rng):
+    user_input = synthetic_user_input(rng)
+    results = benchmark(rank_profiles, user_input, cached_profiles)
+    assert results == sorted(results, key=lambda r: -r["Persentase"])
+
+@pytest.mark.parametrize("n_strains", STRAIN_SIZES)
+def test_rank_profiles_synthetic(benchmark, synthetic_store, rng, n_strains):
+    profiles = synthetic_store[n_strains]
+    user_input = synthetic_user_input(rng)
+    benchmark.extra_info["strains"] = n_strains
+    benchmark.pedantic(rank_profiles, args=(user_input, profiles), rounds=3, iterations=1)
+
+@pytest.mark.parametrize("n_strains", STRAIN_SIZES)
+def test_range_index_prefilter(benchmark, synthetic_store, rng, n_strains):
+    index = RangeIndex(synthetic_store[n_strains])
+    user_ranges = parse_user_ranges(synthetic_user_input(rng))
+    benchmark.extra_info["strains"] = n_strains
+    benchmark(index.filter_ids, user_ranges, 0.5)
+
+@pytest.mark.parametrize("n_strains", STRAIN_SIZES)
+def test_rerank_from_match_matrix(benchmark, synthetic_store, rng, n_strains):
+    matrix = MatchMatrix(synthetic_user_input(rng), synthetic_store[n_strains])
+    weights = get_weight_vector("Aeromonas Focus")
+    benchmark.extra_info["strains"] = n_strains
+    benchmark(matrix.rank, weights, detail_limit=10)
+
+@pytest.mark.parametrize("n_strains", STRAIN_SIZES)
+def test_build_likelihood_tables(benchmark, synthetic_store, n_strains):
+    benchmark.extra_info["strains"] = n_strains
+    tables = benchmark.pedantic(build_likelihood_tables, args=(synthetic_store[n_strains],), rounds=3, iterations=1)
+    assert tables["strain_count"] == n_strains
+
+@pytest.mark.parametrize("n_strains", STRAIN_SIZES)
+def test_likelihood_rank(benchmark, synthetic_store, rng, n_strains):
+    tables = build_likelihood_tables(synthetic_store[n_strains])
+    user_input = synthetic_user_input(rng)
+    benchmark.extra_info["strains"] = n_strains
+    results = benchmark(lambda: LikelihoodMatrix(user_input, tables).rank(detail_limit=10))
+    assert abs(sum(r["Persentase"] for r in results) - 100.0) < 1e-6
+
+def test_likelihood_score_batch(benchmark, synthetic_store, rng):
+    # Satu perkalian matriks untuk 1000 sampel sekaligus
+    tables = build_likelihood_tables(synthetic_store[STRAIN_SIZES[-1]])
+    samples = [synthetic_user_input(rng) for _ in range(1000)]
+    benchmark.extra_info["samples"] = len(samples)
+    posterior = benchmark(score_samples, tables, samples)
+    assert posterior.shape == (len(tables["taxa"]), len(samples))
@@ -0,0 +1,50 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+# Benchmark dijalankan dari root repo: python -m pytest benchmarks
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bacdive_mapper  # noqa: E402
+from synthetic import synthetic_profiles  # noqa: E402
+
+# Ukuran terbesar yang dijalankan; set BENCH_MAX_STRAINS=100000 untuk skala penuh
+MAX_STRAINS = int(os.environ.get("BENCH_MAX_STRAINS", "10000"))
+STRAIN_SIZES = [n for n in (1_000, 10_000, 100_000) if n <= MAX_STRAINS]
+
+@pytest.fixture(scope="session")
+def cache_snapshot():
+    """Isi bacdive_cache.json (offline), dibaca sekali per sesi benchmark."""
+    with open(os.path.join(ROOT, "bacdive_cache.json")) as f:
+        return json.load(f)
+
+@pytest.fixture(scope="session")
+def cached_profiles(cache_snapshot):
+    bacdive_mapper.CACHE_FILE = os.path.join(ROOT, "bacdive_cache.json")
+    profiles = {}
+    for entry in bacdive_mapper.load_cache().values():
+        profiles.update(entry.get("profiles", {}))
+    return profiles
+
+@pytest.fixture(scope="session")
+def synthetic_store(cached_profiles):
+    """Profil sintetis per ukuran, dibuat sekali dan dipakai ulang oleh semua benchmark."""
+    seed_profiles = list(cached_profiles.values())
+    return {n: synthetic_profiles(n, seed_profiles, seed=n) for n in STRAIN_SIZES}
+
+@pytest.fixture
+def rng():
+    return random.Random(1234)
+
+@pytest.fixture
+def temp_cache_file(tmp_path, monkeypatch):
+    """Mengarahkan CACHE_FILE ke file sementara agar benchmark tidak menyentuh cache asli."""
+    path = str(tmp_path / "bench_cache.json")
+    monkeypatch.setattr(bacdive_mapper, "CACHE_FILE", path)
+    monkeypatch.setattr(bacdive_mapper, "_cache_memo", None)
+    return path
@@ -0,0 +1,520 @@
+"""
+Backend penyimpanan cache profil genus di belakang load_cache/save_cache (bacdive_mapper.py).
+
+    json    bacdive_cache.json (default, format sama seperti sebelumnya)
+    sqlite  satu baris per genus di file SQLite; aman dipakai banyak proses di satu mesin
+    redis   key-value store jaringan (protokol Redis), dipakai bersama oleh banyak replika
+
+Backend lokal (json/sqlite) bisa digabung dengan backend bersama (redis) sebagai TieredCacheBackend:
+baca lewat lokal lalu bersama (read-through, entri yang lebih baru disalin ke lokal), tulis ke
+keduanya (write-through), dan kunci per genus diambil di backend bersama sehingga satu genus
+hanya diunduh oleh satu replika.
+
+Setiap backend menyimpan entri genus sebagai JSON apa adanya; decode parameter rentang tetap
+dilakukan oleh bacdive_mapper.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import metrics
+
+# redis opsional dan baru di-import saat backend redis dipakai
+redis = None
+
+# --- 0. Konfigurasi Backend ---
+CACHE_BACKENDS = ("json", "sqlite")
+CACHE_BACKEND = os.environ.get("BACDIVE_CACHE_BACKEND", "json")
+CACHE_PATH = os.environ.get("BACDIVE_CACHE_PATH")                  # default: CACHE_FILE / bacdive_cache.db
+CACHE_SHARED_URL = os.environ.get("BACDIVE_CACHE_SHARED_URL")      # mis. redis://cache:6379/0
+DEFAULT_SQLITE_PATH = "bacdive_cache.db"
+REDIS_PREFIX = "bakteri:cache"
+# Kunci genus kedaluwarsa sendiri jika pemegangnya mati; selama pemegangnya masih bekerja, TTL
+# diperpanjang setiap LOCK_RENEW_SECONDS (pengambilan satu genus besar bisa lebih lama dari TTL)
+LOCK_TTL_SECONDS = 600
+LOCK_RENEW_SECONDS = LOCK_TTL_SECONDS / 3
+LOCK_WAIT_SECONDS = 600
+LOCK_POLL_SECONDS = 0.2
+
+def _entry_timestamp(entry):
+    return entry.get('timestamp', 0) if isinstance(entry, dict) else 0
+
+def _dumps(entry):
+    return json.dumps(entry, separators=(",", ":"))
+
+def _lock_owner():
+    """Pemilik kunci: host:pid:acak, supaya kunci proses yang mati di mesin yang sama bisa dikenali."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+
+def _owner_is_dead(owner):
+    """True jika pemilik kunci adalah proses di mesin ini yang sudah tidak berjalan."""
+    host, _, rest = (owner or "").partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+def _wait_for_lock(try_acquire, name, timeout):
+    """Mengulang try_acquire() sampai berhasil atau timeout. Mengembalikan True jika kunci didapat."""
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        if try_acquire():
+            metrics.observe("cache_lock_wait", time.monotonic() - start)
+            return True
+        if time.monotonic() >= deadline:
+            print(f"[WARNING] Kunci cache '{name}' tidak didapat dalam {timeout:g} detik, lanjut tanpa kunci.")
+            metrics.inc("cache_lock_timeouts")
+            return False
+        time.sleep(LOCK_POLL_SECONDS)
+
+@contextmanager
+def _lock_watchdog(renew, name):
+    """
+    Memanggil renew() setiap LOCK_RENEW_SECONDS di thread latar selama blok berjalan, agar kunci
+    tidak kedaluwarsa di tengah pengambilan. renew() mengembalikan False jika kunci sudah bukan milik kita.
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(LOCK_RENEW_SECONDS):
+            try:
+                renewed = renew()
+            except Exception as e:
+                print(f"[WARNING] Gagal memperpanjang kunci cache '{name}': {e}")
+                continue
+            if not renewed:
+                print(f"[WARNING] Kunci cache '{name}' sudah kedaluwarsa dan diambil pemilik lain.")
+                metrics.inc("cache_lock_lost")
+                return
+
+    thread = threading.Thread(target=beat, name=f"cache-lock-{name}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+# --- 1. Antarmuka ---
+class CacheBackend:
+    """
+    Antarmuka backend: entri genus berupa dict JSON ({timestamp, profiles, ...}).
+    version() harus berubah setiap kali isi cache berubah (dipakai untuk memo dan st.cache_data).
+    """
+    name = "base"
+
+    def key(self):
+        """Identitas backend untuk memo di bacdive_mapper."""
+        return self.name
+
+    def load(self):
+        """Seluruh cache {genus: entri}."""
+        raise NotImplementedError
+
+    def get(self, genus):
+        return self.load().get(genus)
+
+    def put_many(self, entries, base=None):
+        """
+        Menulis/mengganti entri {genus: entri}. `base` = (version, data) yang terakhir dibaca
+        pemanggil; backend boleh memakainya untuk menghindari baca ulang jika versinya masih sama.
+        Mengembalikan seluruh isi cache jika backend membacanya ulang, selain itu None.
+        """
+        raise NotImplementedError
+
+    def delete(self, genera=None):
+        """Menghapus genus tertentu, atau seluruh cache jika None."""
+        raise NotImplementedError
+
+    def version(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, genus, timeout=LOCK_WAIT_SECONDS):
+        """Kunci per genus (lintas proses/replika sesuai jangkauan backend)."""
+        yield
+
+# --- 2. Backend File JSON ---
+class JsonFileBackend(CacheBackend):
+    """bacdive_cache.json; kunci lewat file <cache>.locks/<genus>.lock (O_EXCL, portabel)."""
+    name = "json"
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_dir = f"{path}.locks"
+
+    def key(self):
+        return f"json:{os.path.abspath(self.path)}"
+
+    def version(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return "0"
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return {}
+
+    def put_many(self, entries, base=None):
+        # Mengembalikan isi file baru jika file harus dibaca ulang (ditulis proses lain sejak `base`)
+        with self._file_lock("_write"):
+            reread = base is None or base[0] != self.version()
+            data = self.load() if reread else dict(base[1])
+            data.update(entries)
+            self._write(data)
+        return data if reread else None
+
+    def delete(self, genera=None):
+        with self._file_lock("_write"):
+            data = {} if genera is None else {g: e for g, e in self.load().items() if g not in genera}
+            self._write(data)
+
+    def _write(self, data):
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp, self.path)
+
+    @contextmanager
+    def _file_lock(self, name, timeout=LOCK_WAIT_SECONDS):
+        os.makedirs(self.lock_dir, exist_ok=True)
+        path = os.path.join(self.lock_dir, f"{name}.lock")
+
+        def try_acquire():
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                # Kunci milik proses yang mati dibersihkan langsung (mesin yang sama) atau setelah LOCK_TTL_SECONDS
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        holder = f.read()
+                    if _owner_is_dead(holder) or time.time() - os.path.getmtime(path) > LOCK_TTL_SECONDS:
+                        os.remove(path)
+                except OSError:
+                    pass
+                return False
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(owner)
+            return True
+
+        def renew():
+            # mtime file kunci adalah umurnya; diperbarui hanya jika isinya masih pemilik ini
+            with open(path, encoding="utf-8") as f:
+                if f.read() != owner:
+                    return False
+            os.utime(path)
+            return True
+
+        owner = _lock_owner()
+        acquired = _wait_for_lock(try_acquire, name, timeout)
+        if not acquired:
+            yield
+            return
+        try:
+            with _lock_watchdog(renew, name):
+                yield
+        finally:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    mine = f.read() == owner
+                if mine:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def lock(self, genus, timeout=LOCK_WAIT_SECONDS):
+        return self._file_lock(f"genus-{genus}", timeout)
+
+# --- 3. Backend SQLite ---
+class SQLiteBackend(CacheBackend):
+    """Satu baris per genus; versi = penghitung yang naik di setiap tulis, kunci = tabel dengan kedaluwarsa."""
+    name = "sqlite"
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_entries (genus TEXT PRIMARY KEY, entry TEXT NOT NULL, timestamp REAL);
+                CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS cache_locks (genus TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+                INSERT OR IGNORE INTO cache_meta (key, value) VALUES ('version', 0);
+            """)
+
+    def key(self):
+        return f"sqlite:{os.path.abspath(self.path)}"
+
+    def _connect(self):
+        # Satu koneksi per thread (objek sqlite3 tidak boleh dipakai lintas thread)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self):
+        row = self._connect().execute("SELECT value FROM cache_meta WHERE key = 'version'").fetchone()
+        return str(row[0] if row else 0)
+
+    def load(self):
+        rows = self._connect().execute("SELECT genus, entry FROM cache_entries").fetchall()
+        return {genus: json.loads(entry) for genus, entry in rows}
+
+    def get(self, genus):
+        row = self._connect().execute("SELECT entry FROM cache_entries WHERE genus = ?", (genus,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, entries, base=None):
+        if not entries:
+            return None
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (genus, entry, timestamp) VALUES (?, ?, ?)",
+                [(genus, _dumps(entry), _entry_timestamp(entry)) for genus, entry in entries.items()],
+            )
+            conn.execute("UPDATE cache_meta SET value = value + 1 WHERE key = 'version'")
+        return None
+
+    def delete(self, genera=None):
+        with self._connect() as conn:
+            if genera is None:
+                conn.execute("DELETE FROM cache_entries")
+            else:
+                conn.executemany("DELETE FROM cache_entries WHERE genus = ?", [(g,) for g in genera])
+            conn.execute("UPDATE cache_meta SET value = value + 1 WHERE key = 'version'")
+
+    @contextmanager
+    def lock(self, genus, timeout=LOCK_WAIT_SECONDS):
+        owner = _lock_owner()
+        conn = self._connect()
+
+        def try_acquire():
+            with conn:
+                conn.execute("DELETE FROM cache_locks WHERE genus = ? AND expires < ?", (genus, time.time()))
+                row = conn.execute("SELECT owner FROM cache_locks WHERE genus = ?", (genus,)).fetchone()
+                if row and _owner_is_dead(row[0]):
+                    conn.execute("DELETE FROM cache_locks WHERE genus = ? AND owner = ?", (genus, row[0]))
+                cur = conn.execute("INSERT OR IGNORE INTO cache_locks (genus, owner, expires) VALUES (?, ?, ?)",
+                                   (genus, owner, time.time() + LOCK_TTL_SECONDS))
+            return cur.rowcount == 1
+
+        def renew():
+            # Thread watchdog memakai koneksinya sendiri (lihat _connect)
+            with self._connect() as renew_conn:
+                cur = renew_conn.execute("UPDATE cache_locks SET expires = ? WHERE genus = ? AND owner = ?",
+                                         (time.time() + LOCK_TTL_SECONDS, genus, owner))
+            return cur.rowcount == 1
+
+        acquired = _wait_for_lock(try_acquire, genus, timeout)
+        if not acquired:
+            yield
+            return
+        try:
+            with _lock_watchdog(renew, genus):
+                yield
+        finally:
+            with conn:
+                conn.execute("DELETE FROM cache_locks WHERE genus = ? AND owner = ?", (genus, owner))
+
+# --- 4. Backend Redis (bersama) ---
+# KEYS[1] = key kunci, ARGV[1] = token pemilik (, ARGV[2] = TTL baru dalam ms)
+LOCK_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+LOCK_EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+def _load_redis():
+    """Import redis-py secara malas; hanya dibutuhkan jika backend bersama dipakai."""
+    global redis
+    if redis is None:
+        try:
+            import redis as _redis
+        except ImportError as e:
+            raise RuntimeError("Backend cache redis membutuhkan paket 'redis' (pip install redis)") from e
+        redis = _redis
+    return redis
+
+class RedisBackend(CacheBackend):
+    """
+    Entri per genus di key <prefix>:genus:<genus>, daftar genus di set <prefix>:genera, dan
+    penghitung versi di <prefix>:version. Kunci per genus: SET NX PX dengan token pemilik;
+    perpanjang dan lepas lewat skrip Lua (bandingkan token lalu ubah, atomik di server).
+    """
+    name = "redis"
+
+    def __init__(self, url, prefix=REDIS_PREFIX):
+        self.url = url
+        self.prefix = prefix
+        # RESP2 dipahami semua versi Redis (dan mock_redis_server.py); redis-py baru default ke RESP3
+        self.client = _load_redis().Redis.from_url(url, protocol=2)
+
+    def key(self):
+        return f"redis:{self.url}/{self.prefix}"
+
+    def _genus_key(self, genus):
+        return f"{self.prefix}:genus:{genus}"
+
+    def version(self):
+        value = self.client.get(f"{self.prefix}:version")
+        return value.decode() if value else "0"
+
+    def load(self):
+        genera = sorted(g.decode() for g in self.client.smembers(f"{self.prefix}:genera"))
+        if not genera:
+            return {}
+        values = self.client.mget([self._genus_key(g) for g in genera])
+        return {genus: json.loads(value) for genus, value in zip(genera, values) if value is not None}
+
+    def get(self, genus):
+        value = self.client.get(self._genus_key(genus))
+        return json.loads(value) if value is not None else None
+
+    def put_many(self, entries, base=None):
+        if not entries:
+            return None
+        pipe = self.client.pipeline()
+        for genus, entry in entries.items():
+            pipe.set(self._genus_key(genus), _dumps(entry))
+        pipe.sadd(f"{self.prefix}:genera", *entries)
+        pipe.incr(f"{self.prefix}:version")
+        pipe.execute()
+        return None
+
+    def delete(self, genera=None):
+        if genera is None:
+            genera = [g.decode() for g in self.client.smembers(f"{self.prefix}:genera")]
+        if genera:
+            self.client.delete(*[self._genus_key(g) for g in genera])
+            self.client.srem(f"{self.prefix}:genera", *genera)
+        self.client.incr(f"{self.prefix}:version")
+
+    @contextmanager
+    def lock(self, genus, timeout=LOCK_WAIT_SECONDS):
+        key = f"{self.prefix}:lock:{genus}"
+        token = uuid.uuid4().hex
+        ttl_ms = int(LOCK_TTL_SECONDS * 1000)
+        acquired = _wait_for_lock(lambda: bool(self.client.set(key, token, nx=True, px=ttl_ms)), genus, timeout)
+        if not acquired:
+            yield
+            return
+        try:
+            with _lock_watchdog(lambda: bool(self.client.eval(LOCK_EXTEND_SCRIPT, 1, key, token, ttl_ms)), genus):
+                yield
+        finally:
+            # Hanya pemilik yang melepas; kunci yang sudah kedaluwarsa dan diambil replika lain dibiarkan
+            self.client.eval(LOCK_RELEASE_SCRIPT, 1, key, token)
+
+# --- 5. Backend Bertingkat (lokal + bersama) ---
+class TieredCacheBackend(CacheBackend):
+    """Read-through dari backend bersama ke lokal, write-through ke keduanya, kunci di backend bersama."""
+    name = "tiered"
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def key(self):
+        return f"tiered:{self.local.key()}+{self.shared.key()}"
+
+    def version(self):
+        return f"{self.local.version()}|{self.shared.version()}"
+
+    def load(self):
+        data = self.local.load()
+        warm = {}
+        for genus, entry in self.shared.load().items():
+            if _entry_timestamp(entry) > _entry_timestamp(data.get(genus)):
+                data[genus] = warm[genus] = entry
+        if warm:
+            # Entri yang dibuat replika lain disalin ke lokal agar tetap ada saat backend bersama tidak terjangkau
+            metrics.inc("cache_read_through", value=len(warm))
+            self.local.put_many(warm)
+        return data
+
+    def get(self, genus):
+        entry = self.local.get(genus)
+        shared = self.shared.get(genus)
+        if _entry_timestamp(shared) > _entry_timestamp(entry):
+            metrics.inc("cache_read_through")
+            self.local.put_many({genus: shared})
+            return shared
+        return entry
+
+    def put_many(self, entries, base=None):
+        self.local.put_many(entries)
+        self.shared.put_many(entries)
+        return None
+
+    def delete(self, genera=None):
+        self.local.delete(genera)
+        self.shared.delete(genera)
+
+    def lock(self, genus, timeout=LOCK_WAIT_SECONDS):
+        return self.shared.lock(genus, timeout)
+
+# --- 6. Pemilihan Backend ---
+_backend = None
+
+def configure_cache_backend(backend=None, path=None, shared_url=None):
+    """
+    Memilih backend lokal ('json' atau 'sqlite'), path-nya, dan URL backend bersama (redis://...).
+    Argumen None berarti nilai yang ada (environment/default) tidak diubah.
+    """
+    global CACHE_BACKEND, CACHE_PATH, CACHE_SHARED_URL, _backend
+    if backend:
+        if backend not in CACHE_BACKENDS:
+            raise ValueError(f"Backend cache tidak dikenal: {backend}")
+        CACHE_BACKEND = backend
+    if path:
+        CACHE_PATH = path
+    if shared_url:
+        CACHE_SHARED_URL = shared_url
+    _backend = None
+
+def cache_backend_settings():
+    """Pengaturan aktif, mis. untuk diteruskan ke proses worker (batch_identify.py)."""
+    return {"backend": CACHE_BACKEND, "path": CACHE_PATH, "shared_url": CACHE_SHARED_URL}
+
+def get_cache_backend(default_json_path):
+    """
+    Backend aktif. Backend json memakai `default_json_path` (CACHE_FILE di bacdive_mapper) jika
+    CACHE_PATH tidak diatur, sehingga perubahan CACHE_FILE tetap berlaku.
+    """
+    global _backend
+    if CACHE_BACKEND == "json" and not CACHE_SHARED_URL:
+        return JsonFileBackend(CACHE_PATH or default_json_path)
+    if _backend is None:
+        if CACHE_BACKEND == "sqlite":
+            local = SQLiteBackend(CACHE_PATH or DEFAULT_SQLITE_PATH)
+        else:
+            local = JsonFileBackend(CACHE_PATH or default_json_path)
+        _backend = TieredCacheBackend(local, RedisBackend(CACHE_SHARED_URL)) if CACHE_SHARED_URL else local
+    return _backend
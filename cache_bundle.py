@@ -0,0 +1,205 @@
+"""
+Bundle cache profil untuk provisioning mesin tanpa internet.
+
+Bundle adalah arsip zip (deflate) berisi:
+    manifest.json       format, versi, genus beserta jumlah strain, dan sha256 setiap file
+    profiles.json       {genus: {timestamp, source, profiles, strain_timestamps}}
+    raw/<genus>.json    opsional, dokumen mentah dari mirror lokal (bacdive_mirror.py)
+
+Import memverifikasi checksum lebih dulu, lalu menggabungkan per strain: profil strain hanya
+menimpa yang lokal jika timestamp-nya lebih baru. Tidak ada request ke API sama sekali.
+
+    python cache_manager.py export lab.zip --genus Aeromonas --genus Vibrio --raw
+    python cache_manager.py import lab.zip
+"""
+import hashlib
+import json
+import time
+import zipfile
+
+import metrics
+from bacdive_mapper import CACHE_SCHEMA_VERSION, _decode_cache_entry, load_cache, save_cache
+from bacdive_mirror import BacDiveMirror
+
+# --- 0. Format Bundle ---
+BUNDLE_FORMAT = "bacdive-bundle"
+# Versi 1: profiles.json + raw/<genus>.json opsional
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+PROFILES_NAME = "profiles.json"
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def strain_timestamp(entry, strain_id):
+    """Waktu pengambilan satu strain; entri lama hanya punya timestamp per genus."""
+    return entry.get('strain_timestamps', {}).get(strain_id, entry.get('timestamp', 0))
+
+# --- 1. Export ---
+def export_bundle(path, genera=None, include_raw=False, mirror_dir=None):
+    """
+    Menulis bundle dari cache lokal (opsional hanya `genera`). Mengembalikan manifest.
+    Dokumen mentah diambil dari mirror lokal jika `include_raw`.
+    """
+    cache = load_cache()
+    selected = sorted(g for g in cache if isinstance(cache[g], dict) and cache[g].get('profiles')
+                      and (not genera or g in genera))
+    missing = sorted(set(genera or ()) - set(selected))
+    if missing:
+        print(f"[WARNING] Genus tidak ada di cache lokal dan dilewati: {', '.join(missing)}")
+
+    profiles = {}
+    for genus in selected:
+        entry = cache[genus]
+        profiles[genus] = {
+            "timestamp": entry.get('timestamp', 0),
+            "source": entry.get('source'),
+            "profiles": entry['profiles'],
+            "strain_timestamps": {sid: strain_timestamp(entry, sid) for sid in entry['profiles']},
+        }
+    files = {PROFILES_NAME: _dumps(profiles)}
+
+    if include_raw:
+        raw = {}
+        for genus, strain_id, document, fetched_at in BacDiveMirror(mirror_dir).iter_documents(set(selected)):
+            raw.setdefault(genus, {})[strain_id] = {"fetched_at": fetched_at, "document": document}
+        for genus, documents in raw.items():
+            files[f"raw/{genus}.json"] = _dumps({"documents": documents})
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "cache_schema_version": CACHE_SCHEMA_VERSION,
+        "created_at": time.time(),
+        "genera": {g: {"strains": len(profiles[g]["profiles"]), "timestamp": profiles[g]["timestamp"]} for g in selected},
+        "raw": include_raw,
+        "files": {name: {"sha256": _sha256(data), "size": len(data)} for name, data in files.items()},
+    }
+    with metrics.span("bundle_export"), zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as bundle:
+        bundle.writestr(MANIFEST_NAME, _dumps(manifest))
+        for name, data in files.items():
+            bundle.writestr(name, data)
+    return manifest
+
+# --- 2. Import ---
+def read_bundle(path):
+    """
+    Membuka bundle dan memverifikasi format, versi, serta sha256 setiap file. Mengembalikan
+    (manifest, files); ValueError jika bundle tidak dikenal atau rusak.
+    """
+    try:
+        with zipfile.ZipFile(path) as bundle:
+            manifest = json.loads(bundle.read(MANIFEST_NAME))
+            if manifest.get("format") != BUNDLE_FORMAT:
+                raise ValueError(f"{path} bukan bundle cache BacDive")
+            if manifest.get("version", 0) > BUNDLE_VERSION:
+                raise ValueError(f"Versi bundle {manifest.get('version')} lebih baru dari yang didukung ({BUNDLE_VERSION})")
+            files = {}
+            for name, info in manifest.get("files", {}).items():
+                data = bundle.read(name)
+                if _sha256(data) != info.get("sha256"):
+                    raise ValueError(f"Checksum {name} tidak cocok, bundle rusak")
+                files[name] = data
+            if PROFILES_NAME not in files:
+                raise ValueError(f"{PROFILES_NAME} tidak ada di manifest bundle")
+    except (zipfile.BadZipFile, KeyError, json.JSONDecodeError) as e:
+        raise ValueError(f"Bundle {path} tidak bisa dibaca: {e}") from e
+    return manifest, files
+
+def _compact_timestamps(entry):
+    # Hanya strain yang waktunya berbeda dari timestamp genus yang perlu dicatat
+    stamps = {sid: t for sid, t in entry.get('strain_timestamps', {}).items() if t != entry['timestamp']}
+    if stamps:
+        entry['strain_timestamps'] = stamps
+    else:
+        entry.pop('strain_timestamps', None)
+    return entry
+
+def merge_genus_entry(local, incoming):
+    """
+    Menggabungkan dua entri genus per strain (yang lebih baru menang).
+    Mengembalikan (entri gabungan, jumlah strain baru, jumlah strain diperbarui).
+    """
+    if not isinstance(local, dict) or not local.get('profiles'):
+        return _compact_timestamps(dict(incoming)), len(incoming['profiles']), 0
+
+    profiles = dict(local['profiles'])
+    stamps = {sid: strain_timestamp(local, sid) for sid in profiles}
+    added = updated = 0
+    for sid, profile in incoming['profiles'].items():
+        incoming_at = strain_timestamp(incoming, sid)
+        if sid not in profiles:
+            added += 1
+        elif incoming_at <= stamps[sid]:
+            continue
+        elif profile != profiles[sid]:
+            updated += 1
+        profiles[sid] = profile
+        stamps[sid] = incoming_at
+
+    newer = incoming.get('timestamp', 0) > local.get('timestamp', 0)
+    merged = {
+        **local,
+        "timestamp": max(incoming.get('timestamp', 0), local.get('timestamp', 0)),
+        "schema_version": CACHE_SCHEMA_VERSION,
+        "profiles": profiles,
+        "strain_timestamps": stamps,
+    }
+    source = incoming.get('source') if newer else local.get('source')
+    if source:
+        merged['source'] = source
+    else:
+        merged.pop('source', None)
+    if added or updated:
+        # Konsensus spesies dan tabel likelihood dibangun ulang dari profil gabungan
+        # (lihat species_consensus.py dan likelihood_tables.py)
+        merged.pop('species', None)
+        merged.pop('species_strain_count', None)
+        merged.pop('species_fingerprint', None)
+        merged.pop('likelihood', None)
+    return _compact_timestamps(merged), added, updated
+
+def import_bundle(path, genera=None, include_raw=True, mirror_dir=None):
+    """
+    Menggabungkan bundle ke cache lokal (dan dokumen mentah ke mirror lokal jika ada).
+    Mengembalikan ringkasan {genus: (baru, diperbarui)} beserta jumlah dokumen mentah.
+    """
+    manifest, files = read_bundle(path)
+    bundle_profiles = json.loads(files[PROFILES_NAME])
+
+    summary = {"genera": {}, "raw_documents": 0, "manifest": manifest}
+    with metrics.span("bundle_import"):
+        cache = load_cache()
+        changed = False
+        for genus, entry in bundle_profiles.items():
+            if genera and genus not in genera:
+                continue
+            incoming = _decode_cache_entry({
+                "timestamp": entry.get("timestamp", 0),
+                "schema_version": manifest.get("cache_schema_version", CACHE_SCHEMA_VERSION),
+                "profiles": entry.get("profiles", {}),
+                "strain_timestamps": entry.get("strain_timestamps", {}),
+                **({"source": entry["source"]} if entry.get("source") else {}),
+            })
+            merged, added, updated = merge_genus_entry(cache.get(genus), incoming)
+            if merged != cache.get(genus):
+                cache[genus] = merged
+                changed = True
+            summary["genera"][genus] = (added, updated)
+        if changed:
+            save_cache(cache)
+
+        if include_raw:
+            documents = {}
+            for name, data in files.items():
+                genus = name[len("raw/"):-len(".json")] if name.startswith("raw/") else None
+                if genus is None or (genera and genus not in genera):
+                    continue
+                for strain_id, item in json.loads(data)["documents"].items():
+                    documents[strain_id] = (item["document"], item["fetched_at"])
+            if documents:
+                summary["raw_documents"] = BacDiveMirror(mirror_dir).merge_documents(documents)
+    return summary
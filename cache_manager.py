@@ -6,8 +6,17 @@ import json
 # Menambahkan path proyek agar bisa mengimpor dari direktori lain
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import bacdive_client
+import cache_backend
+import metrics
+from bacdive_client import TRANSPORT_MODES, RateBudget, configure_endpoints, configure_transport, needs_credentials
+from cache_backend import CACHE_BACKENDS, configure_cache_backend
 from auth import get_authenticated_session, test_api_connection, validate_credentials
-from bacdive_mapper import fetch_and_cache_profiles_by_taxonomy
+from bacdive_mapper import get_weight_presets
+from bacdive_mirror import MIRROR_CONCURRENCY, BacDiveMirror, MIRROR_RATE, RANGE_SIZE, STOP_AFTER_EMPTY
+from endpoint_probe import PROBE_CONCURRENCY, PROBE_ENDPOINTS, PROBE_GENUS, PROBE_REQUESTS, parse_levels, run_probe, save_report
+from fetch_planner import PLAN_CONCURRENCY, PLAN_RATE, execute_plan, load_genus_manifest, plan_fetch
+from fetch_queue import POLL_SECONDS, WORKER_THREADS, configure_queue, get_fetch_queue, run_worker
 
 # --- Kelas Dummy untuk Meniru Elemen Streamlit di Konsol ---
 class ConsoleLogger:
@@ -75,50 +84,52 @@ class ConsolePlaceholder:
         print()  # New line to clear the current status
 
 # --- Fungsi Utilitas ---
-def get_credentials_from_secrets():
-    """Membaca kredensial dari file secrets.toml secara manual."""
-    secrets_paths = [
-        os.path.join(".streamlit", "secrets.toml"),
-        "secrets.toml",
-        os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml")
-    ]
-    
-    for secrets_path in secrets_paths:
+SECRETS_PATHS = [
+    os.path.join(".streamlit", "secrets.toml"),
+    "secrets.toml",
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml")
+]
+
+def read_secrets_section(section, verbose=True):
+    """Membaca pasangan key = value di bagian [section] dari file secrets.toml pertama yang memilikinya."""
+    for secrets_path in SECRETS_PATHS:
         try:
             if os.path.exists(secrets_path):
-                print(f"Mencoba membaca kredensial dari: {secrets_path}")
+                if verbose:
+                    print(f"Mencoba membaca [{section}] dari: {secrets_path}")
                 with open(secrets_path, "r", encoding="utf-8") as f:
                     content = f.read()
                     
-                    # Simple TOML parsing for bacdive section
-                    lines = content.split('\n')
-                    in_bacdive_section = False
-                    email, password = None, None
+                    # Simple TOML parsing untuk satu section
+                    in_section = False
+                    values = {}
                     
-                    for line in lines:
+                    for line in content.split('\n'):
                         line = line.strip()
-                        if line.startswith('[bacdive]'):
-                            in_bacdive_section = True
+                        if line.startswith(f'[{section}]'):
+                            in_section = True
                             continue
-                        elif line.startswith('[') and in_bacdive_section:
-                            break  # End of bacdive section
-                        elif in_bacdive_section and '=' in line:
+                        elif line.startswith('[') and in_section:
+                            break  # Akhir section
+                        elif in_section and '=' in line:
                             key, value = line.split('=', 1)
-                            key = key.strip()
-                            value = value.strip().strip('"').strip("'")
-                            
-                            if key == 'email':
-                                email = value
-                            elif key == 'password':
-                                password = value
+                            values[key.strip()] = value.strip().strip('"').strip("'")
                     
-                    if email and password:
-                        print("Kredensial berhasil dibaca dari secrets.toml")
-                        return email, password
+                    if values:
+                        return values
         
         except Exception as e:
             print(f"Error membaca {secrets_path}: {e}")
             continue
+    return {}
+
+def get_credentials_from_secrets():
+    """Membaca kredensial dari file secrets.toml secara manual."""
+    values = read_secrets_section("bacdive")
+    email, password = values.get('email'), values.get('password')
+    if email and password:
+        print("Kredensial berhasil dibaca dari secrets.toml")
+        return email, password
     
     print("Error: Tidak dapat membaca kredensial dari secrets.toml")
     print("File secrets.toml harus berisi:")
@@ -127,6 +138,32 @@ def get_credentials_from_secrets():
     print('password = "your_password"')
     return None, None
 
+def configure_client_from_args(args):
+    """
+    Endpoint, mode transport, dan backend cache: flag CLI > [bacdive] / [cache] di secrets.toml
+    > environment/default.
+    """
+    values = read_secrets_section("bacdive", verbose=False)
+    api_base_url = args.api_url or values.get('api_base_url')
+    token_url = args.token_url or values.get('token_url')
+    configure_endpoints(api_base_url, token_url)
+    if api_base_url or token_url:
+        print(f"Memakai endpoint BacDive: {bacdive_client.API_BASE_URL} (token: {bacdive_client.TOKEN_URL})")
+
+    mode = args.mode or values.get('mode')
+    if getattr(args, 'offline', False):
+        mode = 'offline'
+    configure_transport(mode, args.fixtures or values.get('fixture_dir'))
+    if bacdive_client.TRANSPORT_MODE != 'live':
+        print(f"Mode transport: {bacdive_client.TRANSPORT_MODE} (fixture: {bacdive_client.FIXTURE_DIR})")
+
+    cache_values = read_secrets_section("cache", verbose=False)
+    configure_cache_backend(
+        args.cache_backend or cache_values.get('backend'),
+        args.cache_path or cache_values.get('path'),
+        args.cache_shared or cache_values.get('shared_url'),
+    )
+
 def get_credentials_from_input():
     """Meminta kredensial dari input pengguna jika tidak ada di secrets.toml."""
     print("\nKredensial tidak ditemukan di secrets.toml")
@@ -145,19 +182,314 @@ def get_credentials_from_input():
     
     return email, password
 
+def get_authenticated_session_from_credentials():
+    """Membaca kredensial (secrets.toml atau input) dan mengembalikan sesi terautentikasi."""
+    if not needs_credentials():
+        # Offline/replay: tidak ada request ke server, kredensial tidak dibutuhkan
+        return get_authenticated_session(None, None)
+    email, password = get_credentials_from_secrets()
+    if not email or not password:
+        email, password = get_credentials_from_input()
+        if not email or not password:
+            sys.exit(1)
+
+    print("Menginisialisasi sesi BacDive...")
+    session = get_authenticated_session(email, password)
+    if not session:
+        print("Autentikasi BacDive gagal. Periksa kembali kredensial Anda.")
+        sys.exit(1)
+
+    print("Sesi berhasil diautentikasi.")
+    return session
+
+def run_batch_identification(args):
+    """Identifikasi batch file input tanpa Streamlit, hasil ditulis streaming ke file output."""
+    from batch_identify import identify_file, list_input_genera, ensure_genera_cached
+    from bacdive_mapper import load_cache
+    from report_builder import report_format_for_path
+
+    if args.report:
+        try:
+            report_format_for_path(args.report)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    genera = list_input_genera(args.input)
+    print(f"Ditemukan {len(genera)} genus unik di {args.input}: {', '.join(genera)}")
+
+    if args.offline:
+        cached = load_cache()
+        missing = [g for g in genera if not cached.get(g, {}).get('profiles')]
+    else:
+        session = get_authenticated_session_from_credentials()
+        missing = ensure_genera_cached(session, genera, ConsolePlaceholder(), ConsoleLogger())
+
+    if missing:
+        print(f"[WARNING] Tidak ada profil untuk genus: {', '.join(missing)}. Sampel genus ini tidak akan teridentifikasi.")
+
+    def report_progress(n):
+        sys.stdout.write(f"\r\033[K{n} sampel diproses...")
+        sys.stdout.flush()
+
+    try:
+        total = identify_file(
+            args.input, args.output,
+            top_k=args.top_k, preset=args.preset, workers=args.workers,
+            chunksize=args.chunksize, output_format=args.format, progress=report_progress,
+            report_path=args.report, scoring=args.scoring, range_min_overlap=args.min_range_overlap
+        )
+    except ValueError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
+    print(f"\n✅ Selesai: {total} sampel diidentifikasi. Hasil ditulis ke {args.output}")
+    if args.report:
+        print(f"Laporan lengkap ditulis ke {args.report}")
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+def run_planned_fetch(args):
+    """Fetch lintas genus: rencana dari /taxon, genus segar dilewati, strain diambil dengan satu anggaran request."""
+    genera = list(args.genera)
+    if args.manifest:
+        try:
+            genera += load_genus_manifest(args.manifest)
+        except (OSError, ValueError) as e:
+            print(f"❌ Manifest {args.manifest} tidak bisa dibaca: {e}")
+            sys.exit(1)
+    genera = list(dict.fromkeys(genera))
+    if not genera:
+        print("❌ Berikan nama genus atau --manifest.")
+        sys.exit(1)
+
+    session = get_authenticated_session_from_credentials()
+    budget = RateBudget(args.rate, burst=args.concurrency, max_requests=args.max_requests)
+    print(f"Merencanakan fetch untuk {len(genera)} genus...")
+    plan = plan_fetch(session, genera, force=args.force, budget=budget, concurrency=args.concurrency)
+
+    if plan["fresh"]:
+        print(f"Dilewati (cache masih berlaku): {', '.join(plan['fresh'])}")
+    if plan["not_found"]:
+        print(f"[WARNING] Tidak ada di BacDive: {', '.join(plan['not_found'])}")
+    for genus, error in plan["failed"].items():
+        print(f"[ERROR] /taxon {genus} gagal: {error}")
+    for genus, strain_ids in plan["genera"].items():
+        print(f"  - {genus}: {len(strain_ids)} strain")
+    eta = plan["requests"] / args.rate if args.rate else None
+    print(f"Rencana: {plan['strains']} strain dari {len(plan['genera'])} genus dalam {plan['requests']} request /fetch "
+          f"({plan['taxon_requests']} request /taxon), perkiraan minimal {_format_seconds(eta)} pada {args.rate:g} request/detik")
+    if args.plan_only or not plan["genera"]:
+        return
+
+    def report_progress(stats):
+        sys.stdout.write(
+            f"\r\033[K{stats['strains_done']}/{stats['strains_total']} strain, {stats['requests']} request, "
+            f"{stats['rate']:.1f} strain/detik, {len(stats['saved'])} genus tersimpan, ETA {_format_seconds(stats['eta'])}"
+        )
+        sys.stdout.flush()
+
+    try:
+        stats = execute_plan(session, plan, budget=budget, concurrency=args.concurrency, progress=report_progress)
+    except KeyboardInterrupt:
+        print("\n❌ Proses dibatalkan oleh pengguna. Genus yang sudah selesai tetap tersimpan di cache.")
+        return
+    print()
+    for genus, count in stats["saved"].items():
+        print(f"✅ {genus}: {count} profil tersimpan")
+    if stats["skipped"]:
+        print(f"Dilewati (sudah diisi proses lain selama fetch): {', '.join(stats['skipped'])}")
+    for genus, error in stats["failed"].items():
+        print(f"❌ {genus}: tidak disimpan ({error})")
+    if stats["stopped"] == "budget":
+        print("[WARNING] Batas --max-requests habis; jalankan lagi untuk melanjutkan genus yang belum selesai.")
+    print(f"Selesai dalam {_format_seconds(stats['elapsed'])}: {stats['requests']} request, "
+          f"{stats['rate']:.1f} strain/detik rata-rata.")
+
+def run_probe_command(args):
+    """Latensi (p50/p95/p99), error rate, dan throughput per endpoint untuk memilih --concurrency / --rate."""
+    try:
+        levels = parse_levels(args.concurrency)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(PROBE_ENDPOINTS)
+    if unknown:
+        print(f"❌ Endpoint tidak dikenal: {', '.join(sorted(unknown))} (pilihan: {', '.join(PROBE_ENDPOINTS)})")
+        sys.exit(1)
+
+    session = get_authenticated_session_from_credentials()
+    print(f"Probe {', '.join(endpoints)} di {bacdive_client.API_BASE_URL}: {args.requests} request per tingkat "
+          f"konkurensi {', '.join(map(str, levels))}, tanpa retry")
+    print(f"{'endpoint':<8} {'konk.':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'error':>7} {'req/s':>8}  status")
+
+    def fmt(value):
+        return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+    def show(summary):
+        latency = summary["latency_ms"]
+        statuses = ", ".join(f"{k}×{v}" for k, v in sorted(summary["statuses"].items()))
+        print(f"{summary['endpoint']:<8} {summary['concurrency']:>5} {fmt(latency['p50'])} {fmt(latency['p95'])} "
+              f"{fmt(latency['p99'])} {summary['error_rate']:>6.1%} {summary['ok_per_second']:>8.1f}  {statuses}")
+
+    try:
+        report = run_probe(session, endpoints, requests=args.requests, levels=levels, genus=args.genus,
+                           fetch_ids=args.fetch_ids, timeout=args.timeout, progress=show)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"\nRekomendasi (error rate ≤ {report['max_error_rate']:.0%}):")
+    for endpoint, best in report["recommendation"].items():
+        if best is None:
+            print(f"  - {endpoint}: tidak ada tingkat konkurensi yang memenuhi; turunkan konkurensi atau laju")
+        else:
+            print(f"  - {endpoint}: --concurrency {best['concurrency']}, ~{best['requests_per_second']:.1f} request/detik "
+                  f"(p95 {best['p95_ms']:.0f} ms)")
+    if args.json:
+        save_report(report, args.json)
+        print(f"Hasil probe disimpan ke {args.json}")
+
+def run_mirror(args):
+    """Crawl / top-up mirror lokal BacDive, lalu publikasikan profilnya ke cache genus."""
+    mirror = BacDiveMirror(args.dir)
+    if args.status:
+        for key, value in mirror.status().items():
+            print(f"  {key}: {value}")
+        return
+    if args.restart:
+        mirror.reset(args.range_size)
+        print(f"Cursor mirror diulang dari ID 1 (rentang {args.range_size} ID per request).")
+
+    session = get_authenticated_session_from_credentials()
+    budget = RateBudget(args.rate, burst=args.concurrency, max_requests=args.max_requests)
+
+    def report_progress(state):
+        sys.stdout.write(
+            f"\r\033[K[{state['phase']}] cursor ID {state['next_id']}, ID tertinggi {state['high_water']}, "
+            f"{state['strains']} strain, {state['requests']} request"
+        )
+        sys.stdout.flush()
+
+    state = mirror.state
+    print(f"{'Top-up' if state['complete'] else 'Crawl'} mirror di {mirror.directory} mulai dari ID "
+          f"{state['high_water'] + 1 if state['complete'] else state['next_id']} ({args.rate:g} request/detik)")
+    try:
+        summary = mirror.crawl(
+            session, budget, concurrency=args.concurrency, end_id=args.end_id,
+            stop_after_empty=args.stop_after_empty, progress=report_progress
+        )
+        if args.refresh_days is not None and mirror.state["complete"]:
+            refreshed = mirror.refresh_stale(session, args.refresh_days, budget, args.concurrency, report_progress)
+            print(f"\n{refreshed} rentang yang lebih tua dari {args.refresh_days:g} hari diambil ulang.")
+    except KeyboardInterrupt:
+        print("\n❌ Dihentikan. Jalankan perintah yang sama untuk melanjutkan dari cursor terakhir.")
+        return
+
+    reasons = {
+        "end": "ujung katalog tercapai",
+        "end_id": f"ID {args.end_id} tercapai (putaran belum dianggap selesai)",
+        "budget": "batas --max-requests habis, jalankan lagi untuk melanjutkan",
+        "error": f"error ({summary['error']}), jalankan lagi untuk mengulang rentang ini",
+    }
+    print(f"\n{summary['strains']} strain dari {summary['ranges']} rentang disimpan; berhenti: {reasons[summary['stopped']]}.")
+
+    if args.no_publish:
+        return
+    if not mirror.state.get("completed_at"):
+        print("Putaran penuh pertama belum selesai; profil belum dipublikasikan ke cache genus.")
+        return
+    genera = mirror.publish()
+    print(f"✅ {genera} genus dari mirror digabungkan ke cache lokal.")
+
+def run_export(args):
+    """Menulis bundle cache (zip terkompresi + checksum) untuk mesin lain."""
+    from cache_bundle import export_bundle
+
+    manifest = export_bundle(args.bundle, genera=args.genus, include_raw=args.raw, mirror_dir=args.mirror_dir)
+    strains = sum(g["strains"] for g in manifest["genera"].values())
+    print(f"✅ {len(manifest['genera'])} genus ({strains} strain) ditulis ke {args.bundle} "
+          f"({os.path.getsize(args.bundle) / 1024:.0f} KB)")
+    if args.raw:
+        raw_files = [name for name in manifest["files"] if name.startswith("raw/")]
+        print(f"   Dokumen mentah dari mirror: {len(raw_files)} genus")
+
+def run_import(args):
+    """Menggabungkan bundle ke cache lokal tanpa request ke API."""
+    from cache_bundle import import_bundle
+
+    try:
+        summary = import_bundle(args.bundle, genera=args.genus, include_raw=not args.no_raw, mirror_dir=args.mirror_dir)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    for genus, (added, updated) in sorted(summary["genera"].items()):
+        print(f"  - {genus}: {added} strain baru, {updated} diperbarui")
+    print(f"✅ Bundle {args.bundle} (versi {summary['manifest']['version']}) diimpor ke cache lokal.")
+    if summary["raw_documents"]:
+        print(f"   {summary['raw_documents']} dokumen mentah digabung ke mirror lokal.")
+
+def _fetch_queue(args):
+    """Antrian job: --queue > [queue] path di secrets.toml > BACDIVE_QUEUE_PATH / fetch_queue.db."""
+    configure_queue(args.queue or read_secrets_section("queue", verbose=False).get('path'))
+    return get_fetch_queue()
+
+def show_queue_status(queue):
+    import datetime
+
+    workers = queue.active_workers()
+    print(f"Antrian: {queue.path} ({len(workers)} worker aktif)")
+    for worker in workers:
+        print(f"  worker {worker['id']} ({worker['threads']} thread)")
+    jobs = queue.jobs() if queue.exists() else {}
+    if not jobs:
+        print("Tidak ada job.")
+        return
+    for genus, job in jobs.items():
+        created = datetime.datetime.fromtimestamp(job['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"  - {genus}: {job['status']} (dibuat {created}, diminta {job['requests']}x, "
+              f"percobaan {job['attempts']}) {job['message'] or ''}")
+
+def run_worker_command(args):
+    """Worker latar belakang: mengambil genus dari antrian job sampai dihentikan (Ctrl+C)."""
+    queue = _fetch_queue(args)
+    if args.status:
+        show_queue_status(queue)
+        return
+    session = get_authenticated_session_from_credentials()
+    print(f"Worker membaca antrian {queue.path} dengan {args.threads} thread"
+          f"{' sampai antrian kosong' if args.once else ' (Ctrl+C untuk berhenti)'}")
+    try:
+        processed = run_worker(session, queue, threads=args.threads, poll=args.poll, once=args.once)
+    except KeyboardInterrupt:
+        print("\nWorker dihentikan; job yang belum selesai dikembalikan ke antrian.")
+        return
+    print(f"✅ {processed} job diproses.")
+
+def run_enqueue(args):
+    """Memasukkan genus ke antrian job worker (digabung dengan job yang sama yang masih aktif)."""
+    queue = _fetch_queue(args)
+    for genus, job in queue.enqueue(args.genera).items():
+        print(f"  - {genus}: {job['status']} ({job['message'] or ''})")
+    if not queue.active_workers():
+        print("[WARNING] Belum ada worker aktif. Jalankan: python cache_manager.py worker")
+
 def display_cache_stats():
     """Menampilkan statistik cache saat ini."""
-    cache_file = "bacdive_cache.json"
-    
-    if not os.path.exists(cache_file):
-        print("Cache file tidak ditemukan.")
-        return
-    
+    from bacdive_mapper import load_cache
+    import datetime
+
     try:
-        with open(cache_file, 'r') as f:
-            cache_data = json.load(f)
+        cache_data = load_cache()
+        if not cache_data:
+            print("Cache kosong atau tidak ditemukan.")
+            return
         
-        print(f"\n=== STATISTIK CACHE ===")
+        print(f"\n=== STATISTIK CACHE ({cache_backend.CACHE_BACKEND}{' + ' + cache_backend.CACHE_SHARED_URL if cache_backend.CACHE_SHARED_URL else ''}) ===")
         print(f"Total genus dalam cache: {len(cache_data)}")
         
         total_profiles = 0
@@ -167,7 +499,6 @@ def display_cache_stats():
             timestamp = data.get('timestamp', 0)
             
             # Convert timestamp to readable format
-            import datetime
             readable_time = datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
             
             print(f"  - {genus}: {profiles_count} profiles (terakhir update: {readable_time})")
@@ -179,32 +510,68 @@ def display_cache_stats():
 
 def clear_cache(genus=None):
     """Membersihkan cache untuk genus tertentu atau seluruh cache."""
-    cache_file = "bacdive_cache.json"
-    
-    if not os.path.exists(cache_file):
-        print("Cache file tidak ditemukan.")
-        return
-    
+    from bacdive_mapper import delete_cache_entries, load_cache
+
     try:
-        with open(cache_file, 'r') as f:
-            cache_data = json.load(f)
-        
         if genus:
-            if genus in cache_data:
-                del cache_data[genus]
+            if genus in load_cache():
+                delete_cache_entries([genus])
                 print(f"Cache untuk genus '{genus}' berhasil dihapus.")
             else:
                 print(f"Genus '{genus}' tidak ditemukan dalam cache.")
         else:
-            cache_data.clear()
+            delete_cache_entries()
             print("Seluruh cache berhasil dihapus.")
-        
-        with open(cache_file, 'w') as f:
-            json.dump(cache_data, f, indent=4)
             
     except Exception as e:
         print(f"Error menghapus cache: {e}")
 
+def run_evaluation(args):
+    """Evaluasi leave-one-out preset x metode skor: akurasi top-1/top-5 dan query per detik."""
+    from evaluation import evaluate
+
+    def report_progress(done, total):
+        sys.stdout.write(f"\r\033[K{done}/{total} query dievaluasi...")
+        sys.stdout.flush()
+
+    scorers = [s.strip() for s in args.scorers.split(",") if s.strip()]
+    try:
+        report = evaluate(args.genera or None, args.presets, scorers, mask_rate=args.mask, samples=args.samples,
+                          workers=args.workers, seed=args.seed, progress=report_progress)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if not report["queries"]:
+        print("Tidak ada strain yang bisa dijadikan query (butuh spesies dengan minimal 2 strain di cache).")
+        return
+
+    print(f"\n{report['queries']} query dari {', '.join(report['genera'])} "
+          f"(uji dihapus acak {report['mask_rate']:.0%}, {report['skipped_singletons']} strain spesies tunggal dilewati)")
+    print(f"{'metode':<14} {'preset':<22} {'top-1':>7} {'top-5':>7} {'query/s':>9}")
+    for result in sorted(report["results"], key=lambda r: (-r["top1"], -r["top5"])):
+        print(f"{result['scorer']:<14} {result['preset']:<22} {result['top1']:>7.1%} {result['top5']:>7.1%} "
+              f"{result['queries_per_second']:>9.0f}")
+    print(f"query/s = satu core, hanya waktu skoring; total {report['wall_seconds']:.1f} detik "
+          f"dengan {report['workers']} proses")
+    if args.json:
+        save_report(report, args.json)
+        print(f"Hasil evaluasi disimpan ke {args.json}")
+
+def run_likelihood(args):
+    """Precompute tabel likelihood (mode skor probabilistic) untuk genus di cache."""
+    from likelihood_tables import precompute_likelihood_tables
+
+    summary = precompute_likelihood_tables(args.genera or None, args.alpha, args.force)
+    if not summary:
+        print("Tidak ada genus dengan profil di cache.")
+        return
+    for genus, (taxa, rebuilt) in summary.items():
+        status = "dibangun" if rebuilt else "sudah terbaru"
+        print(f"{genus}: {taxa} spesies ({status})")
+    missing = [g for g in args.genera if g not in summary]
+    if missing:
+        print(f"[WARNING] Genus tidak ada di cache: {', '.join(missing)}")
+
 # --- Fungsi Utama Skrip ---
 def main():
     parser = argparse.ArgumentParser(
@@ -212,12 +579,28 @@ def main():
         formatter_class=argparse.RawTextHelpFormatter
     )
     
+    parser.add_argument("--api-url", default=None, help="Base URL API BacDive (mis. server mock_bacdive_server.py)")
+    parser.add_argument("--token-url", default=None, help="URL endpoint token OAuth")
+    parser.add_argument("--mode", choices=TRANSPORT_MODES, default=None,
+                        help="live (default), offline (hanya cache lokal), record (simpan respons ke fixture), replay (hanya dari fixture)")
+    parser.add_argument("--fixtures", default=None, help="Folder arsip fixture untuk mode record/replay (default: fixtures/bacdive)")
+    parser.add_argument("--cache-backend", choices=CACHE_BACKENDS, default=None, help="Penyimpanan cache lokal: json (default) atau sqlite")
+    parser.add_argument("--cache-path", default=None, help="File cache lokal (default: bacdive_cache.json / bacdive_cache.db)")
+    parser.add_argument("--cache-shared", default=None, help="Cache bersama antar replika, mis. redis://host:6379/0")
+    parser.add_argument("--metrics-log", default=None, help="Tulis event metrik (span & counter) ke file JSON-lines")
+    parser.add_argument("--metrics-out", default=None, help="Tulis metrik format Prometheus ke file ini setelah perintah selesai ('-' = layar)")
+    
     subparsers = parser.add_subparsers(dest='command', help='Perintah yang tersedia')
     
     # Subcommand: fetch
-    fetch_parser = subparsers.add_parser('fetch', help='Mengambil data dari BacDive')
-    fetch_parser.add_argument("genera", nargs='+', help="Nama genus yang ingin diambil")
+    fetch_parser = subparsers.add_parser('fetch', help='Mengambil data dari BacDive (direncanakan lintas genus)')
+    fetch_parser.add_argument("genera", nargs='*', help="Nama genus yang ingin diambil")
+    fetch_parser.add_argument("--manifest", default=None, help="File daftar genus (.txt satu per baris, .json, atau .toml dengan genera = [...])")
     fetch_parser.add_argument("--force", action="store_true", help="Paksa update meskipun cache masih valid")
+    fetch_parser.add_argument("--rate", type=float, default=PLAN_RATE, help=f"Batas request per detik untuk seluruh run (default: {PLAN_RATE:g})")
+    fetch_parser.add_argument("--concurrency", type=int, default=PLAN_CONCURRENCY, help=f"Request paralel untuk seluruh run (default: {PLAN_CONCURRENCY})")
+    fetch_parser.add_argument("--max-requests", type=int, default=None, help="Batas jumlah request untuk run ini")
+    fetch_parser.add_argument("--plan-only", action="store_true", help="Tampilkan rencana (jumlah strain & request) tanpa mengambil strain")
     
     # Subcommand: stats
     subparsers.add_parser('stats', help='Menampilkan statistik cache')
@@ -228,6 +611,96 @@ def main():
     
     # Subcommand: test
     subparsers.add_parser('test', help='Test koneksi ke BacDive API')
+
+    # Subcommand: probe
+    probe_parser = subparsers.add_parser('probe', help='Ukur latensi (p50/p95/p99), error rate, dan throughput endpoint BacDive')
+    probe_parser.add_argument("--endpoints", default=",".join(PROBE_ENDPOINTS), help=f"Endpoint yang diuji (default: {','.join(PROBE_ENDPOINTS)})")
+    probe_parser.add_argument("--requests", type=int, default=PROBE_REQUESTS, help=f"Request per endpoint per tingkat konkurensi (default: {PROBE_REQUESTS})")
+    probe_parser.add_argument("--concurrency", default=",".join(map(str, PROBE_CONCURRENCY)),
+                              help=f"Tingkat konkurensi, dipisah koma (default: {','.join(map(str, PROBE_CONCURRENCY))})")
+    probe_parser.add_argument("--genus", default=PROBE_GENUS, help=f"Genus untuk /taxon dan sumber ID /fetch (default: {PROBE_GENUS})")
+    probe_parser.add_argument("--fetch-ids", type=int, default=1, help="ID strain per request /fetch (maks. 100, seperti fetch terencana)")
+    probe_parser.add_argument("--timeout", type=float, default=bacdive_client.DEFAULT_TIMEOUT, help="Timeout per request, detik")
+    probe_parser.add_argument("--json", default=None, help="Simpan hasil sebagai JSON (.jsonl = tambahkan satu baris untuk riwayat tren)")
+
+    # Subcommand: metrics
+    metrics_parser = subparsers.add_parser('metrics', help='Menampilkan metrik dari log JSON-lines (format Prometheus atau JSON)')
+    metrics_parser.add_argument("log", help="File log metrik (mis. [metrics] log_file milik aplikasi)")
+    metrics_parser.add_argument("--format", choices=["prometheus", "json"], default="prometheus", help="Format keluaran")
+
+    # Subcommand: mirror
+    mirror_parser = subparsers.add_parser('mirror', help='Crawl seluruh BacDive per rentang ID ke mirror lokal (bisa dilanjutkan), lalu top-up')
+    mirror_parser.add_argument("--dir", default=None, help="Folder mirror (default: bacdive_mirror atau BACDIVE_MIRROR_DIR)")
+    mirror_parser.add_argument("--rate", type=float, default=MIRROR_RATE, help=f"Batas request per detik (default: {MIRROR_RATE:g})")
+    mirror_parser.add_argument("--concurrency", type=int, default=MIRROR_CONCURRENCY, help=f"Request paralel (default: {MIRROR_CONCURRENCY})")
+    mirror_parser.add_argument("--max-requests", type=int, default=None, help="Batas jumlah request untuk run ini")
+    mirror_parser.add_argument("--end-id", type=int, default=None, help="Berhenti setelah ID strain ini")
+    mirror_parser.add_argument("--stop-after-empty", type=int, default=STOP_AFTER_EMPTY,
+                               help=f"Rentang kosong berturut-turut sebelum dianggap ujung katalog (default: {STOP_AFTER_EMPTY})")
+    mirror_parser.add_argument("--refresh-days", type=float, default=None, help="Saat top-up, ambil ulang rentang yang lebih tua dari N hari")
+    mirror_parser.add_argument("--restart", action="store_true", help="Ulang cursor dari ID 1")
+    mirror_parser.add_argument("--range-size", type=int, default=RANGE_SIZE, help=f"ID per request /fetch saat --restart (maks. {RANGE_SIZE})")
+    mirror_parser.add_argument("--no-publish", action="store_true", help="Jangan tulis profil mirror ke cache genus")
+    mirror_parser.add_argument("--status", action="store_true", help="Tampilkan state mirror tanpa crawl")
+
+    # Subcommand: export / import
+    export_parser = subparsers.add_parser('export', help='Tulis bundle cache terkompresi & ber-checksum untuk mesin offline')
+    export_parser.add_argument("bundle", help="File bundle keluaran (mis. bacdive_bundle.zip)")
+    export_parser.add_argument("--genus", action="append", default=None, help="Hanya genus ini (boleh diulang)")
+    export_parser.add_argument("--raw", action="store_true", help="Sertakan dokumen mentah dari mirror lokal")
+    export_parser.add_argument("--mirror-dir", default=None, help="Folder mirror (default: bacdive_mirror)")
+
+    import_parser = subparsers.add_parser('import', help='Gabungkan bundle ke cache lokal (per strain, yang lebih baru menang)')
+    import_parser.add_argument("bundle", help="File bundle hasil 'export'")
+    import_parser.add_argument("--genus", action="append", default=None, help="Hanya genus ini (boleh diulang)")
+    import_parser.add_argument("--no-raw", action="store_true", help="Jangan impor dokumen mentah ke mirror lokal")
+    import_parser.add_argument("--mirror-dir", default=None, help="Folder mirror (default: bacdive_mirror)")
+
+    # Subcommand: worker / enqueue
+    worker_parser = subparsers.add_parser('worker', help='Worker latar belakang yang mengambil genus dari antrian job (SQLite)')
+    worker_parser.add_argument("--queue", default=None, help="Database antrian (default: fetch_queue.db atau BACDIVE_QUEUE_PATH)")
+    worker_parser.add_argument("--threads", type=int, default=WORKER_THREADS, help=f"Genus yang diambil bersamaan (default: {WORKER_THREADS})")
+    worker_parser.add_argument("--poll", type=float, default=POLL_SECONDS, help=f"Jeda cek antrian saat kosong, detik (default: {POLL_SECONDS:g})")
+    worker_parser.add_argument("--once", action="store_true", help="Berhenti setelah antrian kosong")
+    worker_parser.add_argument("--status", action="store_true", help="Tampilkan job dan worker aktif tanpa menjalankan worker")
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Masukkan genus ke antrian job worker')
+    enqueue_parser.add_argument("genera", nargs='+', help="Nama genus")
+    enqueue_parser.add_argument("--queue", default=None, help="Database antrian (default: fetch_queue.db atau BACDIVE_QUEUE_PATH)")
+
+    # Subcommand: evaluate
+    evaluate_parser = subparsers.add_parser('evaluate', help='Evaluasi leave-one-out preset bobot dan metode skor memakai profil di cache')
+    evaluate_parser.add_argument("genera", nargs="*", help="Genus yang dievaluasi (default: semua genus di cache)")
+    evaluate_parser.add_argument("--presets", nargs="+", default=None, choices=list(get_weight_presets().keys()),
+                                 help="Preset yang dibandingkan (default: semua)")
+    evaluate_parser.add_argument("--scorers", default="weighted,probabilistic", help="Metode skor, dipisah koma (default: weighted,probabilistic)")
+    evaluate_parser.add_argument("--mask", type=float, default=0.0, help="Peluang setiap uji dihapus dari query, meniru panel lab tidak lengkap (0-1)")
+    evaluate_parser.add_argument("--samples", type=int, default=None, help="Maksimal query per genus (dipilih acak; default: semua strain)")
+    evaluate_parser.add_argument("--workers", type=int, default=None, help="Jumlah proses worker (default: semua core)")
+    evaluate_parser.add_argument("--seed", type=int, default=42, help="Seed pemilihan query dan mask")
+    evaluate_parser.add_argument("--json", default=None, help="Simpan laporan ke file JSON (.jsonl = tambah satu baris per run)")
+
+    # Subcommand: likelihood
+    likelihood_parser = subparsers.add_parser('likelihood', help='Precompute tabel P(positive | spesies) untuk skor probabilistic')
+    likelihood_parser.add_argument("genera", nargs="*", help="Genus yang diproses (default: semua genus di cache)")
+    likelihood_parser.add_argument("--alpha", type=float, default=1.0, help="Pseudo-count smoothing Laplace (default: 1.0)")
+    likelihood_parser.add_argument("--force", action="store_true", help="Bangun ulang walaupun tabel tersimpan masih terbaru")
+
+    # Subcommand: identify
+    identify_parser = subparsers.add_parser('identify', help='Identifikasi batch file CSV/Excel tanpa UI')
+    identify_parser.add_argument("input", help="File input (format seperti template_input.csv)")
+    identify_parser.add_argument("-o", "--output", required=True, help="File hasil (.csv atau .jsonl)")
+    identify_parser.add_argument("--top-k", type=int, default=10, help="Jumlah kandidat teratas per sampel (default: 10)")
+    identify_parser.add_argument("--preset", default="Default", choices=list(get_weight_presets().keys()), help="Preset bobot (Mode Akuakultur, termasuk weight_presets.toml)")
+    identify_parser.add_argument("--offline", action="store_true", help="Hanya memakai cache lokal, tanpa akses API")
+    identify_parser.add_argument("--workers", type=int, default=None, help="Jumlah proses worker (default: semua core)")
+    identify_parser.add_argument("--chunksize", type=int, default=500, help="Jumlah baris input yang dibaca per chunk")
+    identify_parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="Format output (default: dari ekstensi file)")
+    identify_parser.add_argument("--report", default=None, help="Tulis juga laporan lengkap (.docx, .xlsx, .html, atau .zip berisi CSV)")
+    identify_parser.add_argument("--scoring", choices=["weighted", "probabilistic"], default="weighted",
+                                 help="weighted = kemiripan berbobot per strain; probabilistic = posterior per spesies dari tabel likelihood")
+    identify_parser.add_argument("--min-range-overlap", type=float, default=0.0,
+                                 help="Hanya nilai strain yang rentang suhu/pH/NaCl-nya overlap minimal sebesar ini (0-1, 0 = nonaktif)")
     
     args = parser.parse_args()
     
@@ -235,6 +708,36 @@ def main():
         parser.print_help()
         return
     
+    configure_client_from_args(args)
+    if args.metrics_log:
+        metrics.METRICS.configure_log(args.metrics_log)
+    try:
+        run_command(args)
+    finally:
+        if args.metrics_out:
+            write_metrics(args.metrics_out)
+
+def write_metrics(path):
+    """Menulis metrik proses ini dalam format teks Prometheus ('-' = stdout)."""
+    text = metrics.prometheus_text()
+    if path == '-':
+        print(text, end='')
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    print(f"Metrik ditulis ke {path}")
+
+def show_metrics_from_log(args):
+    registry = metrics.MetricsRegistry()
+    registry.load_log(args.log)
+    snap = registry.snapshot()
+    if args.format == 'json':
+        print(json.dumps(snap, indent=2))
+    else:
+        print(metrics.prometheus_text(snap), end='')
+
+def run_command(args):
+    """Menjalankan subcommand yang dipilih."""
     # Handle different commands
     if args.command == 'stats':
         display_cache_stats()
@@ -268,49 +771,48 @@ def main():
         print(f"• Use 'python cache_manager.py fetch <genus>' to test full authentication")
         return
     
+    if args.command == 'identify':
+        run_batch_identification(args)
+        return
+    
+    if args.command == 'likelihood':
+        run_likelihood(args)
+        return
+    
+    if args.command == 'evaluate':
+        run_evaluation(args)
+        return
+    
+    if args.command == 'metrics':
+        show_metrics_from_log(args)
+        return
+    
+    if args.command == 'probe':
+        run_probe_command(args)
+        return
+    
+    if args.command == 'mirror':
+        run_mirror(args)
+        return
+    
+    if args.command == 'worker':
+        run_worker_command(args)
+        return
+    
+    if args.command == 'enqueue':
+        run_enqueue(args)
+        return
+    
+    if args.command == 'export':
+        run_export(args)
+        return
+    
+    if args.command == 'import':
+        run_import(args)
+        return
+    
     if args.command == 'fetch':
-        # Get credentials
-        email, password = get_credentials_from_secrets()
-        if not email or not password:
-            email, password = get_credentials_from_input()
-            if not email or not password:
-                sys.exit(1)
-
-        print("Menginisialisasi sesi BacDive...")
-        session = get_authenticated_session(email, password)
-        if not session:
-            print("Autentikasi BacDive gagal. Periksa kembali kredensial Anda.")
-            sys.exit(1)
-        
-        print("Sesi berhasil diautentikasi.")
-        
-        # Siapkan objek dummy pengganti elemen Streamlit
-        status_placeholder = ConsolePlaceholder()
-        log_container = ConsoleLogger()
-
-        for genus in args.genera:
-            print(f"\n{'='*50}")
-            print(f"Memulai proses untuk genus: {genus}")
-            print(f"{'='*50}")
-            
-            try:
-                profiles = fetch_and_cache_profiles_by_taxonomy(
-                    session, genus, status_placeholder, log_container
-                )
-                
-                if profiles:
-                    print(f"\n✅ Berhasil mengambil {len(profiles)} profil untuk genus {genus}")
-                else:
-                    print(f"\n⚠️  Tidak ada profil ditemukan untuk genus {genus}")
-                    
-            except KeyboardInterrupt:
-                print(f"\n❌ Proses dibatalkan oleh pengguna.")
-                break
-            except Exception as e:
-                print(f"\n❌ Error memproses genus {genus}: {e}")
-                continue
-
-        print(f"\nProses selesai. File 'bacdive_cache.json' telah diperbarui.")
+        run_planned_fetch(args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
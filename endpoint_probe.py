@@ -0,0 +1,149 @@
+"""
+Probe latensi dan throughput endpoint BacDive (token, /taxon, /fetch).
+
+Untuk setiap endpoint dan setiap tingkat konkurensi, N request dijalankan bersamaan tanpa retry
+(429/5xx dihitung sebagai error, bukan diulang). Hasilnya p50/p95/p99 latensi, error rate, dan
+request per detik; tingkat konkurensi dengan throughput tertinggi yang error rate-nya masih di bawah
+batas menjadi rekomendasi --concurrency / --rate untuk fetcher.
+
+    python cache_manager.py probe --requests 50 --concurrency 1,4,8,16
+    python cache_manager.py probe --endpoints taxon,fetch --fetch-ids 100 --json probe_history.jsonl
+"""
+import json
+import time
+
+import numpy as np
+
+import bacdive_client
+from bacdive_client import RequestSpec, api_url, request_many
+
+# --- 0. Konfigurasi Probe ---
+PROBE_ENDPOINTS = ("token", "taxon", "fetch")
+PROBE_REQUESTS = 20
+PROBE_CONCURRENCY = (1, 4, 8)
+PROBE_GENUS = "Aeromonas"
+# Tingkat konkurensi dianggap berkelanjutan jika error rate-nya tidak lebih dari ini
+MAX_ERROR_RATE = 0.01
+PERCENTILES = (50, 95, 99)
+
+def parse_levels(text):
+    """'1,4,8' -> (1, 4, 8); ValueError jika ada nilai yang bukan bilangan bulat positif."""
+    levels = tuple(int(part) for part in str(text).split(",") if part.strip())
+    if not levels or min(levels) < 1:
+        raise ValueError(f"Tingkat konkurensi tidak valid: {text}")
+    return levels
+
+def _targets(session, endpoints, genus, fetch_ids):
+    """
+    Request contoh per endpoint. ID strain untuk /fetch diambil dari halaman pertama /taxon genus
+    (request ini sekaligus menjadi pemanasan koneksi dan tidak ikut diukur).
+    """
+    targets = {}
+    if "token" in endpoints:
+        manager = getattr(session, "token_manager", None)
+        if manager is None:
+            raise ValueError("Probe endpoint token butuh sesi dengan kredensial BacDive")
+        targets["token"] = RequestSpec("POST", bacdive_client.TOKEN_URL, manager.password_grant_data())
+    taxon_url = api_url("taxon", genus)
+    if "taxon" in endpoints:
+        targets["taxon"] = RequestSpec("GET", taxon_url)
+    if "fetch" in endpoints:
+        search = request_many([taxon_url], session=session, concurrency=1)[0]
+        refs = search.data.get("results", []) if search.ok and isinstance(search.data, dict) else []
+        ids = [str(ref.get("id") if isinstance(ref, dict) else ref) for ref in refs][:fetch_ids]
+        if not ids:
+            raise ValueError(f"Tidak bisa mengambil ID strain genus {genus} dari /taxon "
+                             f"({search.error or f'HTTP {search.status}'})")
+        targets["fetch"] = RequestSpec("GET", api_url("fetch", ";".join(ids)))
+    return targets
+
+def summarize(endpoint, concurrency, results, wall):
+    """Ringkasan satu putaran: latensi (ms), jumlah per status, error rate, dan request/detik."""
+    latencies = np.array([r.elapsed for r in results if r.elapsed is not None], dtype=float) * 1000
+    statuses = {}
+    for r in results:
+        key = str(r.status) if r.status is not None else "error"
+        statuses[key] = statuses.get(key, 0) + 1
+    errors = sum(1 for r in results if not r.ok)
+    summary = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "statuses": statuses,
+        "wall_seconds": wall,
+        "requests_per_second": len(results) / wall if wall > 0 else 0.0,
+        "ok_per_second": (len(results) - errors) / wall if wall > 0 else 0.0,
+        "latency_ms": {"mean": float(latencies.mean()) if latencies.size else None,
+                       "max": float(latencies.max()) if latencies.size else None},
+    }
+    for q in PERCENTILES:
+        summary["latency_ms"][f"p{q}"] = float(np.percentile(latencies, q)) if latencies.size else None
+    return summary
+
+def recommend(summaries, max_error_rate=MAX_ERROR_RATE):
+    """
+    Per endpoint: tingkat konkurensi dengan request sukses/detik tertinggi yang error rate-nya
+    masih <= max_error_rate. None jika tidak ada tingkat yang memenuhi.
+    """
+    best = {}
+    for s in summaries:
+        if s["error_rate"] > max_error_rate:
+            continue
+        current = best.get(s["endpoint"])
+        if current is None or s["ok_per_second"] > current["ok_per_second"]:
+            best[s["endpoint"]] = s
+    recommendation = {}
+    for endpoint in dict.fromkeys(s["endpoint"] for s in summaries):
+        s = best.get(endpoint)
+        recommendation[endpoint] = {
+            "concurrency": s["concurrency"],
+            "requests_per_second": round(s["ok_per_second"], 2),
+            "p95_ms": s["latency_ms"]["p95"],
+        } if s else None
+    return recommendation
+
+def run_probe(session, endpoints=PROBE_ENDPOINTS, requests=PROBE_REQUESTS, levels=PROBE_CONCURRENCY,
+              genus=PROBE_GENUS, fetch_ids=1, timeout=bacdive_client.DEFAULT_TIMEOUT, progress=None):
+    """
+    Menjalankan probe untuk setiap endpoint x tingkat konkurensi. Mengembalikan laporan (dict siap
+    JSON) berisi konfigurasi, `results` per putaran, dan `recommendation` per endpoint.
+    `progress(summary)` dipanggil setelah setiap putaran.
+    """
+    if bacdive_client.TRANSPORT_MODE != "live":
+        raise ValueError(f"Probe hanya berjalan pada mode live (mode saat ini: {bacdive_client.TRANSPORT_MODE})")
+    targets = _targets(session, endpoints, genus, fetch_ids)
+    summaries = []
+    for endpoint, spec in targets.items():
+        # Endpoint token tidak memakai header sesi (Authorization)
+        probe_session = None if endpoint == "token" else session
+        for concurrency in levels:
+            start = time.perf_counter()
+            results = request_many([spec] * requests, session=probe_session, concurrency=concurrency,
+                                   timeout=timeout, retries=0)
+            summary = summarize(endpoint, concurrency, results, time.perf_counter() - start)
+            summaries.append(summary)
+            if progress:
+                progress(summary)
+    return {
+        "created_at": time.time(),
+        "api_base_url": bacdive_client.API_BASE_URL,
+        "token_url": bacdive_client.TOKEN_URL,
+        "client": "httpx" if bacdive_client._load_httpx() is not None else "requests",
+        "requests_per_level": requests,
+        "genus": genus,
+        "fetch_ids": fetch_ids,
+        "max_error_rate": MAX_ERROR_RATE,
+        "results": summaries,
+        "recommendation": recommend(summaries),
+    }
+
+def save_report(report, path):
+    """Menyimpan laporan: .jsonl ditambahkan satu baris (riwayat tren), selain itu ditimpa sebagai JSON."""
+    if path.endswith(".jsonl"):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report) + "\n")
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
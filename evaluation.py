@@ -0,0 +1,252 @@
+"""
+Evaluasi leave-one-out untuk preset bobot dan metode skor.
+
+Setiap strain di cache dipakai sebagai sampel uji: profilnya dijadikan input (opsional dengan
+sebagian uji dihapus acak, meniru panel lab yang tidak lengkap), lalu diidentifikasi terhadap
+strain lain di genusnya. Identifikasi benar jika spesies strain tersebut muncul di antara k
+spesies teratas (urutan spesies = urutan pertama kali muncul di ranking). Strain yang spesiesnya
+tidak punya strain lain di genus itu dilewati, karena jawabannya mustahil ditemukan.
+
+Query dibagi per genus ke process pool; setiap worker mengukur waktu skoring per query untuk
+setiap kombinasi metode skor x preset, sehingga akurasi dan query/detik bisa dibandingkan.
+
+    python cache_manager.py evaluate --mask 0.3 --samples 200
+    python cache_manager.py evaluate Aeromonas --presets Default "Aeromonas Focus" --json eval.json
+"""
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bacdive_mapper import PARAM_KEYS, MatchMatrix, get_weight_presets, load_cache
+from cache_backend import cache_backend_settings, configure_cache_backend
+from likelihood_tables import (
+    LIKELIHOOD_ALPHA,
+    LIKELIHOOD_TESTS,
+    log_tables,
+    profile_counts,
+    score_samples,
+    species_counts,
+)
+from species_consensus import species_key
+
+# --- 0. Konfigurasi Evaluasi ---
+EVAL_SCORERS = ("weighted", "probabilistic")
+EVAL_TOP_K = (1, 5)
+EVAL_SEED = 42
+# Jumlah query per task process pool
+EVAL_CHUNKSIZE = 50
+
+# State per proses worker, diisi sekali oleh _init_worker
+_worker_cache = {}
+_worker_genera = {}
+_worker_settings = {}
+
+# --- 1. Query ---
+def mask_query(profile, mask_rate, rng):
+    """
+    Input sampel dari profil strain: nilai yang diketahui disalin, masing-masing dihapus dengan
+    peluang mask_rate. Rentang tetap berupa tuple (dibaca parse_user_ranges apa adanya).
+    """
+    query = {}
+    for param in PARAM_KEYS:
+        value = profile.get(param)
+        if value is None or value == 'N/A':
+            continue
+        if mask_rate > 0 and rng.random() < mask_rate:
+            continue
+        query[param] = value
+    return query
+
+def list_queries(cache, genera=None, samples=None, seed=EVAL_SEED):
+    """
+    (genus, ID strain) yang dijadikan query: strain dari spesies dengan >= 2 strain di genusnya.
+    `samples` membatasi jumlah query per genus (dipilih acak). Mengembalikan (queries, skipped).
+    """
+    rng = random.Random(seed)
+    queries, skipped = [], 0
+    for genus in (genera if genera is not None else sorted(cache)):
+        entry = cache.get(genus)
+        profiles = entry.get('profiles') if isinstance(entry, dict) else None
+        if not profiles:
+            continue
+        sizes = {}
+        for profile in profiles.values():
+            key = species_key(profile.get('Nama Bakteri'))
+            sizes[key] = sizes.get(key, 0) + 1
+        ids = [bid for bid, p in profiles.items() if sizes[species_key(p.get('Nama Bakteri'))] > 1]
+        skipped += len(profiles) - len(ids)
+        if samples is not None and len(ids) > samples:
+            ids = rng.sample(ids, samples)
+        queries.extend((genus, str(bid)) for bid in ids)
+    return queries, skipped
+
+# --- 2. Worker (dijalankan di process pool) ---
+def _init_worker(presets, scorers, mask_rate, seed, alpha, cache_settings=None):
+    """Memuat cache dan konfigurasi evaluasi satu kali per proses worker."""
+    if cache_settings:
+        configure_cache_backend(**cache_settings)
+    _worker_settings.update(presets=presets, scorers=scorers, mask_rate=mask_rate, seed=seed, alpha=alpha)
+    all_presets = get_weight_presets()
+    _worker_settings['weights'] = {name: all_presets[name] for name in presets}
+    _worker_cache.clear()
+    _worker_cache.update(load_cache())
+    _worker_genera.clear()
+
+def _genus_state(genus):
+    """Profil, spesies per baris strain, dan jumlah likelihood genus; dihitung sekali per proses."""
+    state = _worker_genera.get(genus)
+    if state is None:
+        profiles = _worker_cache[genus]['profiles']
+        taxa, _, positive, known = species_counts(profiles)
+        rows = {taxon: i for i, taxon in enumerate(taxa)}
+        log_pos, log_neg = log_tables(positive, known, _worker_settings['alpha'])
+        state = _worker_genera[genus] = {
+            'profiles': profiles,
+            'rows': {str(bid): i for i, bid in enumerate(profiles)},
+            'species': np.array([rows[species_key(p.get('Nama Bakteri'))] for p in profiles.values()]),
+            'taxa': taxa,
+            'positive': positive,
+            'known': known,
+            'log_pos': log_pos,
+            'log_neg': log_neg,
+        }
+    return state
+
+def _species_rank(order, row_species, true_species, limit):
+    """Posisi (1-based) spesies benar di antara `limit` spesies pertama pada urutan baris, atau None."""
+    seen = []
+    for row in order:
+        species = row_species[row]
+        if species in seen:
+            continue
+        seen.append(species)
+        if species == true_species:
+            return len(seen)
+        if len(seen) >= limit:
+            break
+    return None
+
+def _loo_tables(state, row, profile):
+    """Tabel likelihood genus tanpa strain query: hanya baris spesiesnya yang dihitung ulang."""
+    pos, kn = profile_counts(profile)
+    species = state['species'][row]
+    log_pos, log_neg = state['log_pos'].copy(), state['log_neg'].copy()
+    row_pos, row_neg = log_tables(state['positive'][species] - pos, state['known'][species] - kn,
+                                  _worker_settings['alpha'])
+    log_pos[species], log_neg[species] = row_pos, row_neg
+    return {'taxa': state['taxa'], 'tests': list(LIKELIHOOD_TESTS), 'log_pos': log_pos, 'log_neg': log_neg}
+
+def _evaluate_chunk(chunk):
+    """
+    Menilai satu daftar query (genus, ID). Mengembalikan {(genus, scorer, preset): [n, hits per k...,
+    detik skoring]} agar proses induk cukup menjumlahkan.
+    """
+    limit = max(EVAL_TOP_K)
+    stats = {}
+    for genus, bacdive_id in chunk:
+        state = _genus_state(genus)
+        row = state['rows'][bacdive_id]
+        profile = state['profiles'][bacdive_id]
+        true_species = state['species'][row]
+        # Mask yang sama untuk semua metode/preset agar perbandingannya adil
+        rng = random.Random(f"{_worker_settings['seed']}:{genus}:{bacdive_id}")
+        query = mask_query(profile, _worker_settings['mask_rate'], rng)
+
+        for scorer in _worker_settings['scorers']:
+            # Persiapan per query: tabel leave-one-out (tidak diukur, hanya ada saat evaluasi) atau
+            # matriks kecocokan yang dipakai bersama semua preset (waktunya dihitung ke setiap preset)
+            setup_seconds = 0.0
+            if scorer == 'probabilistic':
+                tables = _loo_tables(state, row, profile)
+                row_species = np.arange(len(state['taxa']))
+            else:
+                setup_start = time.perf_counter()
+                matrix = MatchMatrix(query, state['profiles'])
+                setup_seconds = time.perf_counter() - setup_start
+                row_species = state['species']
+            for preset, weights in _worker_settings['weights'].items():
+                start = time.perf_counter()
+                if scorer == 'probabilistic':
+                    scores = score_samples(tables, [query], weights)[:, 0]
+                else:
+                    scores = matrix.scores(weights).copy()
+                    scores[row] = 0.0
+                candidates = np.flatnonzero(scores > 0)
+                order = candidates[np.argsort(-scores[candidates], kind='stable')]
+                rank = _species_rank(order, row_species, true_species, limit)
+                elapsed = time.perf_counter() - start + setup_seconds
+
+                record = stats.setdefault((genus, scorer, preset), [0] * (len(EVAL_TOP_K) + 1) + [0.0])
+                record[0] += 1
+                for i, k in enumerate(EVAL_TOP_K, start=1):
+                    if rank is not None and rank <= k:
+                        record[i] += 1
+                record[-1] += elapsed
+    return stats
+
+# --- 3. Pipeline Utama ---
+def _chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _summary(key, record):
+    n, hits, seconds = record[0], record[1:-1], record[-1]
+    summary = dict(key, queries=n, scoring_seconds=seconds,
+                   queries_per_second=n / seconds if seconds > 0 else 0.0)
+    for k, hit in zip(EVAL_TOP_K, hits):
+        summary[f"top{k}"] = hit / n if n else 0.0
+    return summary
+
+def evaluate(genera=None, presets=None, scorers=EVAL_SCORERS, mask_rate=0.0, samples=None,
+             workers=None, seed=EVAL_SEED, alpha=LIKELIHOOD_ALPHA, progress=None):
+    """
+    Menjalankan evaluasi leave-one-out dan mengembalikan laporan (dict siap JSON): `results`
+    per metode x preset (akurasi top-k dan query/detik satu core), `by_genus`, dan waktu total.
+    `progress(done, total)` dipanggil setiap satu chunk query selesai.
+    """
+    if not 0 <= mask_rate < 1:
+        raise ValueError(f"mask_rate harus di antara 0 dan 1 (diberikan: {mask_rate})")
+    all_presets = get_weight_presets()
+    presets = list(presets or all_presets)
+    unknown = [p for p in presets if p not in all_presets] + [s for s in scorers if s not in EVAL_SCORERS]
+    if unknown:
+        raise ValueError(f"Preset/metode skor tidak dikenal: {', '.join(unknown)}")
+
+    queries, skipped = list_queries(load_cache(), genera, samples, seed)
+    totals, by_genus = {}, {}
+    start = time.perf_counter()
+    done = 0
+    if queries:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(presets, tuple(scorers), mask_rate, seed, alpha, cache_backend_settings())) as pool:
+            chunks = list(_chunked(queries, EVAL_CHUNKSIZE))
+            for (chunk, stats) in zip(chunks, pool.map(_evaluate_chunk, chunks)):
+                done += len(chunk)
+                for (genus, scorer, preset), record in stats.items():
+                    for target, key in ((by_genus, (genus, scorer, preset)), (totals, (scorer, preset))):
+                        current = target.setdefault(key, [0] * len(record))
+                        target[key] = [a + b for a, b in zip(current, record)]
+                if progress:
+                    progress(done, len(queries))
+    wall = time.perf_counter() - start
+
+    results = [_summary({"scorer": scorer, "preset": preset}, totals[(scorer, preset)])
+               for scorer in scorers for preset in presets if (scorer, preset) in totals]
+    return {
+        "created_at": time.time(),
+        "genera": sorted({genus for genus, _ in queries}),
+        "queries": len(queries),
+        "skipped_singletons": skipped,
+        "mask_rate": mask_rate,
+        "seed": seed,
+        "alpha": alpha,
+        "workers": workers or os.cpu_count(),
+        "wall_seconds": wall,
+        "wall_queries_per_second": len(queries) * len(results) / wall if wall > 0 and results else 0.0,
+        "results": results,
+        "by_genus": [_summary({"genus": genus, "scorer": scorer, "preset": preset}, record)
+                     for (genus, scorer, preset), record in sorted(by_genus.items())],
+    }
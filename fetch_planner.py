@@ -0,0 +1,241 @@
+"""
+Perencana fetch lintas genus untuk `cache_manager.py fetch`.
+
+Alih-alih mengambil genus satu per satu:
+    1. genus yang cache-nya masih berlaku dilewati (kecuali force),
+    2. /taxon semua genus ditanyakan lebih dulu untuk mendapatkan jumlah strain dan ID-nya,
+    3. ID strain dari semua genus dikelompokkan per request /fetch (hingga 100 ID) dan diambil
+       di bawah satu anggaran konkurensi dan laju (RateBudget) bersama, dengan ETA dan throughput,
+    4. setiap genus disimpan ke cache begitu seluruh strain-nya selesai, di bawah kunci per genus;
+       genus yang sementara itu sudah diisi proses/replika lain tidak ditimpa.
+
+    python cache_manager.py fetch --manifest genus_akuakultur.txt --rate 5
+    python cache_manager.py fetch Aeromonas Vibrio --plan-only
+"""
+import json
+import os
+import time
+from collections import deque
+
+import metrics
+from bacdive_client import api_url, is_offline, request_many
+from bacdive_mapper import (
+    CACHE_SCHEMA_VERSION,
+    _valid_cached_profiles,
+    cache_lock,
+    extract_bacdive_data,
+    get_cache_entry,
+    get_param_keys,
+    has_valid_cache,
+    is_named_profile,
+    load_cache,
+    save_cache,
+)
+
+# --- 0. Konfigurasi Planner ---
+# BacDive menerima maksimal 100 ID per request /fetch
+IDS_PER_REQUEST = 100
+PLAN_CONCURRENCY = 4
+# Request per detik; satu request bisa berisi 100 strain
+PLAN_RATE = 5.0
+
+# --- 1. Manifest Genus ---
+def load_genus_manifest(path):
+    """
+    Daftar genus dari file manifest: .json (list atau {"genera": [...]}), .toml (genera = [...]),
+    atau teks biasa satu genus per baris (baris kosong dan komentar # diabaikan).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        genera = data.get("genera", []) if isinstance(data, dict) else data
+    elif ext == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError(f"{path}: manifest TOML butuh Python 3.11+ atau paket tomli") from None
+        with open(path, "rb") as f:
+            genera = tomllib.load(f).get("genera", [])
+    else:
+        with open(path, encoding="utf-8") as f:
+            genera = [line.split("#", 1)[0].strip() for line in f]
+    if not isinstance(genera, list):
+        raise ValueError(f"{path}: 'genera' harus berupa daftar nama genus")
+    return list(dict.fromkeys(str(g).strip() for g in genera if str(g).strip()))
+
+# --- 2. Perencanaan ---
+def _acquire(budget, n):
+    return budget.acquire(n) if budget is not None else n
+
+def plan_fetch(session, genera, force=False, budget=None, concurrency=PLAN_CONCURRENCY):
+    """
+    Menentukan pekerjaan: genus yang masih segar dilewati, sisanya ditanyakan ke /taxon (semua
+    halaman). Mengembalikan dict berisi `genera` ({genus: [ID strain]}), `fresh`, `not_found`,
+    `failed` ({genus: error}), `strains`, `requests` (jumlah request /fetch yang dibutuhkan),
+    `taxon_requests`, serta `created_at` dan `force` untuk cek ulang cache saat eksekusi.
+    """
+    genera = list(dict.fromkeys(genera))
+    created_at = time.time()
+    fresh = [] if force else [g for g in genera if has_valid_cache(g)]
+    plan = {"genera": {}, "fresh": fresh, "not_found": [], "failed": {}, "strains": 0,
+            "requests": 0, "taxon_requests": 0, "stopped": None, "created_at": created_at, "force": force}
+
+    # Halaman /taxon berikutnya (`next`) diikuti sampai habis; semua genus ditanyakan bersamaan
+    pending = [(g, api_url("taxon", g)) for g in genera if g not in fresh]
+    ids = {g: [] for g, _ in pending}
+    with metrics.span("taxon_search"):
+        while pending:
+            batch, pending = pending[:concurrency], pending[concurrency:]
+            granted = _acquire(budget, len(batch))
+            if not granted:
+                plan["stopped"] = "budget"
+                for genus, _ in batch + pending:
+                    plan["failed"][genus] = "batas request habis saat perencanaan"
+                break
+            pending = batch[granted:] + pending
+            batch = batch[:granted]
+            results = request_many([url for _, url in batch], session=session, concurrency=len(batch))
+            plan["taxon_requests"] += len(batch)
+            for (genus, url), result in zip(batch, results):
+                if result.status == 404:
+                    plan["not_found"].append(genus)
+                    continue
+                data = result.data if result.ok else None
+                if not isinstance(data, dict) or not isinstance(data.get("results"), list):
+                    plan["failed"][genus] = result.error or f"HTTP {result.status} dari /taxon"
+                    continue
+                for ref in data["results"]:
+                    strain_id = ref.get("id") if isinstance(ref, dict) else ref
+                    if strain_id:
+                        ids[genus].append(str(strain_id))
+                if data.get("next"):
+                    pending.append((genus, data["next"]))
+
+    for genus, strain_ids in ids.items():
+        if genus in plan["failed"] or genus in plan["not_found"]:
+            continue
+        if not strain_ids:
+            plan["not_found"].append(genus)
+            continue
+        plan["genera"][genus] = list(dict.fromkeys(strain_ids))
+        plan["strains"] += len(plan["genera"][genus])
+        plan["requests"] += -(-len(plan["genera"][genus]) // IDS_PER_REQUEST)
+    return plan
+
+# --- 3. Eksekusi ---
+def _chunks(plan):
+    """(genus, [ID]) per request /fetch, genus demi genus sehingga genus pertama cepat selesai."""
+    for genus, strain_ids in plan["genera"].items():
+        for i in range(0, len(strain_ids), IDS_PER_REQUEST):
+            yield genus, strain_ids[i:i + IDS_PER_REQUEST]
+
+def _filled_meanwhile(genus, plan, offline):
+    """
+    True jika cache genus sudah berlaku lagi dari backend (bukan memo), mis. diisi proses atau
+    replika lain setelah rencana dibuat. Dengan force, hanya entri yang ditulis setelah rencana
+    dibuat yang dihitung, karena entri lama memang hendak diganti.
+    """
+    entry = get_cache_entry(genus)
+    if _valid_cached_profiles(entry, offline, time.time()) is None:
+        return False
+    return not plan.get("force") or entry.get("timestamp", 0) >= plan.get("created_at", 0)
+
+def _extract_documents(data, param_keys):
+    documents = data.get("results") if isinstance(data, dict) else None
+    profiles = {}
+    if not isinstance(documents, dict):
+        return profiles
+    for strain_id, document in documents.items():
+        if not isinstance(document, dict):
+            continue
+        with metrics.span("extraction"):
+            profile = extract_bacdive_data(document, param_keys)
+        if is_named_profile(profile):
+            profiles[str(strain_id)] = profile
+    return profiles
+
+def execute_plan(session, plan, budget=None, concurrency=PLAN_CONCURRENCY, progress=None):
+    """
+    Mengambil semua strain dari rencana dengan satu antrean request bersama (hingga `concurrency`
+    request /fetch berjalan bersamaan, laju dibatasi `budget`). Genus disimpan ke cache setelah
+    semua request-nya berhasil, di bawah cache_lock(genus); genus yang salah satu request-nya
+    gagal tidak disimpan dan dicoba lagi pada run berikutnya. Genus yang sementara itu sudah
+    diisi proses lain dilewati (`skipped`), baik sebelum request pertamanya maupun saat disimpan.
+    `progress(stats)` dipanggil setelah setiap batch.
+    Mengembalikan stats: strains_done, strains_total, requests, elapsed, rate, eta, saved, skipped, failed.
+    """
+    now = time.time()
+    offline = is_offline()
+    start = time.monotonic()
+    remaining = {g: -(-len(ids) // IDS_PER_REQUEST) for g, ids in plan["genera"].items()}
+    collected = {g: {} for g in plan["genera"]}
+    param_keys = get_param_keys()
+    stats = {"strains_done": 0, "strains_total": plan["strains"], "requests": 0, "elapsed": 0.0,
+             "rate": 0.0, "eta": None, "saved": {}, "skipped": [], "failed": dict(plan["failed"]), "stopped": None}
+    started = set()
+
+    queue = deque(_chunks(plan))
+    while queue:
+        batch = []
+        while queue and len(batch) < concurrency:
+            genus, ids = queue.popleft()
+            if genus not in started:
+                started.add(genus)
+                if _filled_meanwhile(genus, plan, offline):
+                    stats["skipped"].append(genus)
+                    metrics.inc("planner_genera", result="skipped")
+            if genus in stats["failed"] or genus in stats["skipped"]:
+                # Genus yang gagal atau sudah diisi proses lain tidak disimpan, sisa request-nya tidak perlu dijalankan
+                stats["strains_done"] += len(ids)
+                continue
+            batch.append((genus, ids))
+        if not batch:
+            break
+        granted = _acquire(budget, len(batch))
+        if granted < len(batch):
+            stats["stopped"] = "budget"
+            batch = batch[:granted]
+            if not batch:
+                break
+        urls = [api_url("fetch", ";".join(ids)) for _, ids in batch]
+        with metrics.span("strain_fetch"):
+            results = request_many(urls, session=session, concurrency=len(urls))
+        stats["requests"] += len(urls)
+
+        for (genus, ids), result in zip(batch, results):
+            stats["strains_done"] += len(ids)
+            if result.ok:
+                collected[genus].update(_extract_documents(result.data, param_keys))
+            elif result.status != 404:
+                stats["failed"][genus] = result.error or f"HTTP {result.status}"
+            remaining[genus] -= 1
+            if remaining[genus] == 0 and genus not in stats["failed"]:
+                profiles = collected.pop(genus)
+                with cache_lock(genus):
+                    # Cek ulang di bawah kunci: proses lain mungkin menyimpan genus ini selama fetch
+                    if _filled_meanwhile(genus, plan, offline):
+                        stats["skipped"].append(genus)
+                        metrics.inc("planner_genera", result="skipped")
+                        continue
+                    cache = load_cache()
+                    cache[genus] = {"timestamp": now, "schema_version": CACHE_SCHEMA_VERSION, "profiles": profiles}
+                    save_cache(cache)
+                stats["saved"][genus] = len(profiles)
+                metrics.inc("planner_genera", result="saved")
+
+        stats["elapsed"] = time.monotonic() - start
+        stats["rate"] = stats["strains_done"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+        left = stats["strains_total"] - stats["strains_done"]
+        stats["eta"] = left / stats["rate"] if stats["rate"] > 0 else None
+        if progress:
+            progress(stats)
+        if stats["stopped"]:
+            break
+
+    for genus in stats["failed"]:
+        metrics.inc("planner_genera", result="failed")
+    return stats
@@ -0,0 +1,287 @@
+"""
+Antrian job fetch genus yang persisten (SQLite) dan worker latar belakang yang mengonsumsinya.
+
+Aplikasi Streamlit hanya memasukkan genus ke antrian lalu memantau status job; pengunduhan
+dilakukan proses terpisah sehingga tetap berjalan walaupun browser ditutup atau websocket putus.
+Satu baris per genus: permintaan genus yang sama dari banyak pengguna digabung ke job yang sama.
+Hasil fetch ditulis lewat save_cache, jadi masuk ke backend cache yang dikonfigurasi
+(termasuk cache bersama, lihat cache_backend.py).
+
+    python cache_manager.py worker --threads 2
+    python cache_manager.py enqueue Aeromonas Vibrio
+    python cache_manager.py worker --status
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import metrics
+from bacdive_mapper import fetch_and_cache_profiles_by_taxonomy
+from cache_backend import _owner_is_dead
+
+# --- 0. Konfigurasi Antrian ---
+QUEUE_PATH = os.environ.get("BACDIVE_QUEUE_PATH", "fetch_queue.db")
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed")
+# Job yang sudah selesai dipakai ulang selama ini, supaya genus yang tidak ada di BacDive
+# (atau yang gagal) tidak di-antre ulang di setiap rerun halaman
+JOB_RESULT_SECONDS = 600
+HEARTBEAT_SECONDS = 5
+# Job 'running' tanpa heartbeat selama ini dianggap ditinggal worker yang mati dan diambil ulang
+JOB_STALE_SECONDS = 60
+MAX_ATTEMPTS = 3
+WORKER_THREADS = 2
+POLL_SECONDS = 1.0
+# Pesan progres ditulis ke database paling sering sekali per interval ini
+PROGRESS_WRITE_SECONDS = 0.5
+
+JOB_COLUMNS = ("genus", "status", "message", "profiles", "requests", "attempts", "worker",
+               "created_at", "started_at", "finished_at", "heartbeat")
+
+def configure_queue(path=None):
+    """Lokasi database antrian (mis. dari [queue] path di secrets.toml); None = tidak berubah."""
+    global QUEUE_PATH
+    if path:
+        QUEUE_PATH = path
+
+# --- 1. Antrian ---
+class FetchQueue:
+    """Job fetch per genus di SQLite; aman dipakai banyak thread dan proses di satu mesin."""
+
+    def __init__(self, path=None):
+        self.path = path or QUEUE_PATH
+        self._local = threading.local()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        # Satu koneksi per thread; isolation_level=None agar transaksi dibuka eksplisit (BEGIN IMMEDIATE)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    genus TEXT PRIMARY KEY, status TEXT NOT NULL, message TEXT, profiles INTEGER,
+                    requests INTEGER NOT NULL DEFAULT 1, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT,
+                    created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+                CREATE TABLE IF NOT EXISTS workers (
+                    id TEXT PRIMARY KEY, host TEXT, pid INTEGER, threads INTEGER, started_at REAL, heartbeat REAL
+                );
+            """)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE: kunci tulis diambil di awal, jadi dua worker tidak mengklaim job yang sama
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def enqueue(self, genera):
+        """
+        Memasukkan genus ke antrian. Job yang masih aktif, atau selesai kurang dari
+        JOB_RESULT_SECONDS yang lalu, dipakai bersama (hanya penghitung `requests` yang naik).
+        Mengembalikan {genus: job}.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            for genus in dict.fromkeys(genera):
+                row = conn.execute("SELECT status, finished_at FROM jobs WHERE genus = ?", (genus,)).fetchone()
+                if row and (row[0] in ACTIVE_STATUSES or now - (row[1] or 0) < JOB_RESULT_SECONDS):
+                    conn.execute("UPDATE jobs SET requests = requests + 1 WHERE genus = ?", (genus,))
+                    metrics.inc("fetch_jobs", result="deduplicated")
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (genus, status, message, requests, attempts, created_at) "
+                    "VALUES (?, 'queued', 'Menunggu worker', 1, 0, ?)", (genus, now))
+                metrics.inc("fetch_jobs", result="enqueued")
+        return self.jobs(genera)
+
+    def jobs(self, genera=None):
+        """Status job sebagai dict per genus (semua job jika `genera` None)."""
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"
+        if genera is None:
+            rows = self._connect().execute(query + " ORDER BY created_at").fetchall()
+        else:
+            genera = list(dict.fromkeys(genera))
+            rows = self._connect().execute(
+                query + f" WHERE genus IN ({', '.join('?' * len(genera))})", genera).fetchall() if genera else []
+        return {row[0]: dict(zip(JOB_COLUMNS, row)) for row in rows}
+
+    def claim(self, worker_id):
+        """Mengambil job tertua (termasuk job worker mati); mengembalikan genus atau None."""
+        now = time.time()
+        stale = now - JOB_STALE_SECONDS
+        with self._transaction() as conn:
+            # Job milik worker di mesin ini yang prosesnya sudah mati tidak perlu menunggu JOB_STALE_SECONDS
+            for genus, worker in conn.execute("SELECT genus, worker FROM jobs WHERE status = 'running'").fetchall():
+                if _owner_is_dead(worker):
+                    conn.execute("UPDATE jobs SET heartbeat = 0 WHERE genus = ?", (genus,))
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, message = 'Worker berhenti berulang kali saat mengambil genus ini' "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?", (now, stale, MAX_ATTEMPTS))
+            row = conn.execute(
+                "SELECT genus FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?) "
+                "ORDER BY created_at LIMIT 1", (stale,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, started_at = ?, "
+                "heartbeat = ?, message = 'Dimulai' WHERE genus = ?", (worker_id, now, now, row[0]))
+        return row[0]
+
+    def update(self, genus, worker_id, message):
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET message = ?, heartbeat = ? WHERE genus = ? AND worker = ? AND status = 'running'",
+                         (message, time.time(), genus, worker_id))
+
+    def finish(self, genus, worker_id, status, message, profiles=None):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, profiles = ?, finished_at = ?, heartbeat = ? "
+                "WHERE genus = ? AND worker = ? AND status = 'running'",
+                (status, message, profiles, now, now, genus, worker_id))
+
+    def heartbeat(self, worker_id, threads=None):
+        """Menandai worker (dan job yang sedang dikerjakannya) masih hidup."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, host, pid, threads, started_at, heartbeat) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (worker_id, socket.gethostname(), os.getpid(), threads, now, now))
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE worker = ? AND status = 'running'", (now, worker_id))
+
+    def release(self, worker_id):
+        """Worker berhenti: job yang belum selesai dikembalikan ke antrian."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, message = 'Menunggu worker' "
+                         "WHERE worker = ? AND status = 'running'", (worker_id,))
+            conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def active_workers(self, max_age=JOB_STALE_SECONDS):
+        """Worker dengan heartbeat terbaru; kosong (tanpa membuat file) jika antrian belum pernah dipakai."""
+        if not self.exists():
+            return []
+        rows = self._connect().execute(
+            "SELECT id, host, pid, threads, heartbeat FROM workers WHERE heartbeat >= ?", (time.time() - max_age,)).fetchall()
+        # Worker di mesin ini yang prosesnya sudah mati tidak dihitung walaupun heartbeat-nya masih baru
+        return [dict(zip(("id", "host", "pid", "threads", "heartbeat"), row)) for row in rows if not _owner_is_dead(row[0])]
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+def get_fetch_queue(path=None):
+    """FetchQueue bersama per lokasi database (koneksi per thread dipakai ulang)."""
+    path = path or QUEUE_PATH
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = FetchQueue(path)
+        return _queues[path]
+
+# --- 2. Worker ---
+class JobPlaceholder:
+    """Meniru st.empty(): pesan status fetch ditulis ke baris job sebagai progres."""
+
+    def __init__(self, queue, genus, worker_id):
+        self.queue = queue
+        self.genus = genus
+        self.worker_id = worker_id
+        self.problem = None
+        self.failed = False
+        self._written = 0.0
+
+    def _write(self, message, force=False):
+        now = time.monotonic()
+        if force or now - self._written >= PROGRESS_WRITE_SECONDS:
+            self._written = now
+            self.queue.update(self.genus, self.worker_id, message)
+
+    def text(self, message):
+        self._write(message)
+
+    def success(self, message):
+        self._write(message, force=True)
+
+    def warning(self, message):
+        self.problem = message
+        self._write(message, force=True)
+
+    def error(self, message):
+        self.problem = message
+        self.failed = True
+        self._write(message, force=True)
+
+    def empty(self):
+        pass
+
+def _run_job(session, queue, genus, worker_id):
+    placeholder = JobPlaceholder(queue, genus, worker_id)
+    try:
+        with metrics.span("fetch_job"):
+            profiles = fetch_and_cache_profiles_by_taxonomy(session, genus, placeholder)
+    except Exception as e:
+        status, message, count = "failed", f"Error: {e}", None
+    else:
+        count = len(profiles) if profiles else 0
+        status = "failed" if placeholder.failed and not count else "done"
+        message = placeholder.problem if not count and placeholder.problem else f"{count} profil tersimpan"
+    queue.finish(genus, worker_id, status, message, count)
+    metrics.inc("fetch_jobs", result=status)
+    print(f"[WORKER] {genus}: {status} ({message})")
+    return status
+
+def run_worker(session, queue=None, threads=WORKER_THREADS, poll=POLL_SECONDS, once=False, stop=None):
+    """
+    Mengonsumsi job dari antrian dengan `threads` thread sampai `stop` di-set (atau, jika `once`,
+    sampai antrian kosong). Job yang belum selesai saat berhenti dikembalikan ke antrian.
+    Mengembalikan jumlah job yang diproses.
+    """
+    queue = queue or get_fetch_queue()
+    stop = stop or threading.Event()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    processed = []
+    queue.heartbeat(worker_id, threads)
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            queue.heartbeat(worker_id, threads)
+
+    def consume():
+        while not stop.is_set():
+            genus = queue.claim(worker_id)
+            if genus is None:
+                if once:
+                    return
+                stop.wait(poll)
+                continue
+            processed.append(_run_job(session, queue, genus, worker_id))
+
+    threading.Thread(target=beat, name="fetch-worker-heartbeat", daemon=True).start()
+    consumers = [threading.Thread(target=consume, name=f"fetch-worker-{i}", daemon=True) for i in range(max(1, threads))]
+    for thread in consumers:
+        thread.start()
+    try:
+        # join dengan timeout agar Ctrl+C tetap diterima di thread utama
+        while any(thread.is_alive() for thread in consumers):
+            for thread in consumers:
+                thread.join(timeout=0.5)
+    finally:
+        stop.set()
+        queue.release(worker_id)
+    return len(processed)
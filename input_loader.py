@@ -0,0 +1,90 @@
+import pandas as pd
+
+from bacdive_mapper import (
+    COLUMN_ALIASES,
+    RANGE_PARAMS,
+    TEST_CATEGORIES,
+    WEIGHTS,
+    _normalize_simple_value,
+    normalize_columns,
+)
+
+# --- 0. Konfigurasi Input ---
+DEFAULT_CHUNKSIZE = 5000
+ID_COLUMNS = ('Sample_Name', 'Genus')
+
+def is_recognised_column(col):
+    """Kolom yang dipakai identifikasi: parameter WEIGHTS (atau aliasnya), Sample_Name, Genus."""
+    name = str(col).strip()
+    name = COLUMN_ALIASES.get(name, name)
+    return name in WEIGHTS or name in ID_COLUMNS
+
+def excel_engine():
+    """Engine Excel tercepat yang tersedia: calamine jika terinstal, selain itu default pandas."""
+    try:
+        import python_calamine  # noqa: F401
+        return 'calamine'
+    except ImportError:
+        return None
+
+# --- 1. Encoding Nilai Uji ---
+def _encode_test_column(series):
+    """Normalisasi nilai unik sekali (semantik _normalize_simple_value), lalu simpan sebagai kategori."""
+    uniques = series.dropna().unique()
+    mapping = {v: _normalize_simple_value(v) for v in uniques}
+    return _as_test_categorical(series.map(mapping).fillna('N/A'))
+
+def _as_test_categorical(normalized):
+    # Urutan kategori tetap (TEST_CATEGORIES) di semua chunk; nilai lain ditambahkan di belakang
+    extras = sorted(set(normalized.unique()) - set(TEST_CATEGORIES))
+    return pd.Categorical(normalized, categories=list(TEST_CATEGORIES) + extras)
+
+def encode_test_columns(df):
+    """Mengubah kolom uji kategori (bukan rentang) menjadi dtype category, in place."""
+    for col in df.columns:
+        if col in WEIGHTS and col not in RANGE_PARAMS:
+            df[col] = _encode_test_column(df[col])
+    if 'Genus' in df.columns:
+        df['Genus'] = df['Genus'].str.strip()
+    return df
+
+def sample_records(df):
+    """Baris input sebagai dict untuk rank_profiles (nilai kategori sudah ter-normalisasi)."""
+    return df.to_dict('records')
+
+# --- 2. Pembacaan File ---
+def read_upload(source, name, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Membaca file CSV/Excel per chunk: hanya kolom yang dikenali, kolom dinormalisasi
+    (COLUMN_ALIASES), dan nilai uji di-encode sebagai kategori. `source` boleh path atau file-like.
+    CSV dibaca bertahap (memori dibatasi ukuran chunk, dipakai batch identify); Excel dibaca
+    utuh lalu dipotong, karena pandas tidak bisa membaca Excel per chunk.
+    """
+    if str(name).lower().endswith(('.xlsx', '.xls')):
+        data = pd.read_excel(source, usecols=is_recognised_column, dtype=str, engine=excel_engine())
+        data = encode_test_columns(normalize_columns(data))
+        for start in range(0, max(len(data), 1), chunksize):
+            yield data.iloc[start:start + chunksize]
+        return
+
+    reader = pd.read_csv(source, usecols=is_recognised_column, dtype=str,
+                         encoding='utf-8', chunksize=chunksize)
+    for chunk in reader:
+        yield encode_test_columns(normalize_columns(chunk))
+
+def load_upload(source, name, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Membaca seluruh file lewat read_upload dan menggabungkan chunk menjadi satu DataFrame
+    (dipakai aplikasi, yang menampilkan seluruh tabel input).
+    """
+    chunks = list(read_upload(source, name, chunksize))
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    data = pd.concat(chunks, ignore_index=True)
+    # Kategori tiap chunk bisa berbeda (nilai tambahan); satukan kembali
+    for col in data.columns:
+        if col in WEIGHTS and col not in RANGE_PARAMS:
+            data[col] = _as_test_categorical(data[col].astype(object))
+    return data
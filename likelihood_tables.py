@@ -0,0 +1,289 @@
+"""
+Tabel likelihood per spesies untuk identifikasi probabilistik.
+
+Setiap spesies (lihat species_consensus.species_key) diringkas menjadi P(positive | spesies)
+untuk setiap uji kategori di WEIGHTS, dengan smoothing Laplace:
+
+    P(+) = (positive + 0.5 * variable + alpha) / (n + 2 * alpha)
+
+Strain 'variable' dihitung setengah positif, setengah negatif; uji tanpa data sama sekali
+bernilai 0.5 (tidak memengaruhi ranking). Tabel disimpan di cache di samping profil strain
+(kunci 'likelihood') sebagai matriks log P(+) dan log P(-) (baris = spesies, kolom = uji).
+
+Skor sampel adalah posterior dengan prior seragam: log-likelihood semua spesies dihitung
+dengan dua perkalian matriks-vektor, lalu dinormalisasi (softmax) menjadi persentase yang
+jumlahnya 100%. Parameter rentang (suhu/pH/NaCl) tidak dimodelkan; gunakan filter rentang.
+"""
+import numpy as np
+
+from bacdive_mapper import (
+    PARAM_KEYS,
+    RANGE_PARAMS,
+    _normalize_simple_value,
+    get_weight_vector,
+    load_cache,
+    profiles_fingerprint,
+    save_cache,
+)
+from species_consensus import species_key
+
+# Pseudo-count smoothing Laplace per sisi (positive/negative)
+LIKELIHOOD_ALPHA = 1.0
+# Uji yang dimodelkan: semua parameter kategori, urutan mengikuti PARAM_KEYS
+LIKELIHOOD_TESTS = tuple(p for p in PARAM_KEYS if p not in RANGE_PARAMS)
+
+# --- 1. Precompute Tabel ---
+def profile_counts(profile):
+    """Kontribusi satu strain: (positive, known) per uji; 'variable' = 0.5 positive."""
+    positive = np.zeros(len(LIKELIHOOD_TESTS))
+    known = np.zeros(len(LIKELIHOOD_TESTS))
+    for j, test in enumerate(LIKELIHOOD_TESTS):
+        value = profile.get(test)
+        if value in ('positive', 'negative', 'variable'):
+            positive[j] = {'positive': 1.0, 'variable': 0.5}.get(value, 0.0)
+            known[j] = 1.0
+    return positive, known
+
+def species_counts(profiles):
+    """
+    Jumlah per spesies x uji dari profil strain: (taxa, strain_ids per spesies, positive, known).
+    Dasar build_likelihood_tables; evaluasi leave-one-out mengurangkan profile_counts dari sini.
+    """
+    groups = {}
+    for bacdive_id, profile in profiles.items():
+        if not isinstance(profile, dict):
+            continue
+        groups.setdefault(species_key(profile.get('Nama Bakteri')), []).append((str(bacdive_id), profile))
+
+    taxa = list(groups)
+    positive = np.zeros((len(taxa), len(LIKELIHOOD_TESTS)))
+    known = np.zeros(positive.shape)
+    for i, taxon in enumerate(taxa):
+        for _, profile in groups[taxon]:
+            pos, kn = profile_counts(profile)
+            positive[i] += pos
+            known[i] += kn
+    return taxa, [[bid for bid, _ in groups[taxon]] for taxon in taxa], positive, known
+
+def log_tables(positive, known, alpha=LIKELIHOOD_ALPHA):
+    """Smoothing Laplace: (log P(+), log P(-)) dari matriks jumlah."""
+    if alpha <= 0:
+        # Tanpa smoothing, satu hasil yang belum pernah teramati membuat posterior spesies nol
+        raise ValueError(f"alpha smoothing harus > 0 (diberikan: {alpha})")
+    p_pos = (positive + alpha) / (known + 2 * alpha)
+    return np.log(p_pos), np.log1p(-p_pos)
+
+def build_likelihood_tables(profiles, alpha=LIKELIHOOD_ALPHA):
+    """
+    Membangun tabel likelihood dari profil strain (dict id -> profil). Hasilnya dict siap JSON:
+      - 'taxa': nama spesies (urutan baris), 'strain_ids': ID strain per spesies
+      - 'tests': LIKELIHOOD_TESTS (urutan kolom), 'alpha', 'strain_count'
+      - 'n': jumlah strain berdata per spesies x uji
+      - 'log_pos' / 'log_neg': log P(+ | spesies) dan log P(- | spesies)
+    """
+    taxa, strain_ids, positive, known = species_counts(profiles)
+    log_pos, log_neg = log_tables(positive, known, alpha)
+    return {
+        'taxa': taxa,
+        'strain_ids': strain_ids,
+        'tests': list(LIKELIHOOD_TESTS),
+        'alpha': alpha,
+        'strain_count': len(profiles),
+        'n': known.astype(int).tolist(),
+        'log_pos': log_pos.tolist(),
+        'log_neg': log_neg.tolist(),
+    }
+
+def _cacheable_tables(profiles, alpha):
+    """Tabel untuk disimpan di cache: ditandai sidik jari profil sumbernya (lihat _tables_current)."""
+    tables = build_likelihood_tables(profiles, alpha)
+    tables['fingerprint'] = profiles_fingerprint(profiles)
+    return tables
+
+def _tables_current(tables, profiles, alpha):
+    # Sidik jari isi profil, bukan hanya jumlah strain: nilai uji yang berubah juga membuat tabel basi
+    return (
+        isinstance(tables, dict)
+        and tables.get('tests') == list(LIKELIHOOD_TESTS)
+        and tables.get('alpha') == alpha
+        and tables.get('fingerprint') == profiles_fingerprint(profiles)
+    )
+
+def get_likelihood_tables(genus, profiles, alpha=LIKELIHOOD_ALPHA):
+    """
+    Tabel likelihood genus dari cache (kunci 'likelihood' di entri genus). Dibangun ulang dan
+    disimpan jika belum ada, isi profil strain berubah (dibandingkan lewat profiles_fingerprint),
+    atau daftar uji / alpha berbeda.
+    """
+    cache = load_cache()
+    entry = cache.get(genus)
+    if isinstance(entry, dict) and _tables_current(entry.get('likelihood'), profiles, alpha):
+        return entry['likelihood']
+
+    tables = _cacheable_tables(profiles, alpha)
+    if isinstance(entry, dict) and entry.get('profiles'):
+        entry['likelihood'] = tables
+        save_cache(cache)
+    return tables
+
+def precompute_likelihood_tables(genera=None, alpha=LIKELIHOOD_ALPHA, force=False):
+    """
+    Membangun tabel likelihood untuk genus di cache (semua jika genera None) dan menyimpannya
+    dalam satu penulisan. Mengembalikan {genus: (jumlah spesies, dibangun ulang?)}.
+    """
+    cache = load_cache()
+    summary = {}
+    for genus in (genera if genera is not None else list(cache)):
+        entry = cache.get(genus)
+        if not isinstance(entry, dict) or not entry.get('profiles'):
+            continue
+        profiles = entry['profiles']
+        rebuilt = force or not _tables_current(entry.get('likelihood'), profiles, alpha)
+        if rebuilt:
+            entry['likelihood'] = _cacheable_tables(profiles, alpha)
+        summary[genus] = (len(entry['likelihood']['taxa']), rebuilt)
+    if any(rebuilt for _, rebuilt in summary.values()):
+        save_cache(cache)
+    return summary
+
+# --- 2. Skoring Vektoral ---
+def encode_evidence(user_inputs, tests=LIKELIHOOD_TESTS):
+    """
+    Mengubah daftar input sampel menjadi dua matriks indikator (sampel x uji): hasil positive
+    dan hasil negative. Nilai kosong, 'variable', atau tidak dikenal tidak menjadi bukti.
+    """
+    pos = np.zeros((len(user_inputs), len(tests)))
+    neg = np.zeros(pos.shape)
+    for i, user_input in enumerate(user_inputs):
+        for j, test in enumerate(tests):
+            raw = user_input.get(test)
+            if raw is None or str(raw).strip() == '':
+                continue
+            value = _normalize_simple_value(raw)
+            if value == 'positive':
+                pos[i, j] = 1.0
+            elif value == 'negative':
+                neg[i, j] = 1.0
+    return pos, neg
+
+def _test_mask(weights, tests):
+    """1 untuk uji yang bobotnya > 0 pada preset, 0 untuk uji yang dimatikan preset."""
+    by_param = dict(zip(PARAM_KEYS, weights.values))
+    return np.array([1.0 if by_param.get(test, 0) > 0 else 0.0 for test in tests])
+
+def posterior_percentages(log_likelihood):
+    """Softmax per kolom (prior seragam): log-likelihood (taksa x sampel) -> persentase posterior."""
+    shifted = log_likelihood - log_likelihood.max(axis=0, keepdims=True)
+    probs = np.exp(shifted)
+    return probs / probs.sum(axis=0, keepdims=True) * 100.0
+
+def score_samples(tables, user_inputs, weights=None):
+    """
+    Posterior semua spesies untuk banyak sampel sekaligus: array (spesies x sampel) dalam persen.
+    Log-likelihood = log_pos @ bukti_positive.T + log_neg @ bukti_negative.T.
+    """
+    if weights is None:
+        weights = get_weight_vector()
+    tests = tables['tests']
+    shape = (len(tables['taxa']), len(tests))
+    if not shape[0]:
+        return np.zeros((0, len(user_inputs)))
+    pos, neg = encode_evidence(user_inputs, tests)
+    mask = _test_mask(weights, tests)
+    log_likelihood = (np.asarray(tables['log_pos'], dtype=float).reshape(shape) @ (pos * mask).T
+                      + np.asarray(tables['log_neg'], dtype=float).reshape(shape) @ (neg * mask).T)
+    return posterior_percentages(log_likelihood)
+
+class LikelihoodMatrix:
+    """
+    Padanan MatchMatrix untuk mode probabilistik: satu sampel terhadap tabel likelihood genus.
+    Antarmukanya sama (ids, profiles, scores, details, rank) sehingga rerank_reports dan
+    drill-down strain bekerja tanpa perubahan. Preset bobot hanya menentukan uji mana yang
+    dipakai (bobot 0 = diabaikan); besar bobot tidak mengubah likelihood.
+    """
+
+    def __init__(self, user_input, tables):
+        self.user_input = user_input
+        self.tests = list(tables['tests'])
+        self.ids = list(tables['taxa'])
+        self.profiles = [
+            {'Nama Bakteri': taxon, 'strain_ids': strain_ids}
+            for taxon, strain_ids in zip(self.ids, tables['strain_ids'])
+        ]
+        self._rows = {taxon: i for i, taxon in enumerate(self.ids)}
+        self.log_pos = np.asarray(tables['log_pos'], dtype=float).reshape(len(self.ids), len(self.tests))
+        self.log_neg = np.asarray(tables['log_neg'], dtype=float).reshape(self.log_pos.shape)
+        self.n = np.asarray(tables['n'], dtype=int).reshape(self.log_pos.shape)
+        pos, neg = encode_evidence([user_input], self.tests)
+        self.evidence_pos, self.evidence_neg = pos[0], neg[0]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def log_likelihood(self, weights=None):
+        """Log-likelihood sampel untuk semua spesies (array sejajar self.ids)."""
+        if weights is None:
+            weights = get_weight_vector()
+        mask = _test_mask(weights, self.tests)
+        return self.log_pos @ (self.evidence_pos * mask) + self.log_neg @ (self.evidence_neg * mask)
+
+    def scores(self, weights=None):
+        """Persentase posterior semua spesies (jumlahnya 100)."""
+        if not self.ids:
+            return np.zeros(0)
+        return posterior_percentages(self.log_likelihood(weights)[:, None])[:, 0]
+
+    def details(self, row, weights=None):
+        """Tabel per uji untuk satu spesies: P(+) hasil smoothing dan kecocokannya dengan input."""
+        if weights is None:
+            weights = get_weight_vector()
+        by_param = dict(zip(PARAM_KEYS, weights.values))
+        p_pos = np.exp(self.log_pos[row]).tolist()
+        details = []
+        for j, test in enumerate(self.tests):
+            uval_raw = self.user_input.get(test)
+            weight = by_param.get(test, 0)
+            n = int(self.n[row, j])
+            observed = self.evidence_pos[j] or self.evidence_neg[j]
+            match = f"P(+) = {p_pos[j]:.2f} (n={n})"
+            if not observed or n == 0 or weight <= 0:
+                mark = "❓"
+            else:
+                p_obs = p_pos[j] if self.evidence_pos[j] else 1.0 - p_pos[j]
+                mark = '✅' if p_obs >= 0.75 else ('➖' if p_obs > 0.25 else '❌')
+            details.append({"Parameter": test, "Input": uval_raw or 'N/A', "BacDive Match": match, "Bobot": weight, "Cocok": mark})
+        return details
+
+    def rank(self, weights=None, ids=None, log_container=None, progress_callback=None, detail_limit=None):
+        """Hasil terurut menurut posterior (format MatchMatrix.rank); 'Persentase' = posterior %."""
+        if weights is None:
+            weights = get_weight_vector()
+        rows = range(len(self.ids)) if ids is None else [self._rows[t] for t in ids if t in self._rows]
+        scores = self.scores(weights)
+        total = len(rows)
+
+        results = []
+        for n, i in enumerate(rows, start=1):
+            taxon = self.ids[i]
+            score = float(scores[i])
+            if log_container:
+                log_container.info(f"🧮 Posterior calculated for {taxon}: {score:.2f}%")
+            if score > 0:
+                results.append({
+                    "Rank": 0,
+                    "Nama Bakteri": taxon,
+                    "Persentase": score,
+                    "ID": taxon,
+                    "Jumlah Strain": len(self.profiles[i]['strain_ids']),
+                    "_row": i,
+                })
+            if progress_callback:
+                progress_callback(n, total, taxon)
+
+        results.sort(key=lambda x: x["Persentase"], reverse=True)
+        for n, result in enumerate(results):
+            result["Rank"] = n + 1
+            row = result.pop("_row")
+            if detail_limit is None or n < detail_limit:
+                result["details"] = self.details(row, weights)
+        return results
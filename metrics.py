@@ -0,0 +1,175 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- 0. Konfigurasi Metrik ---
+METRIC_PREFIX = "bakteri"
+# Batas atas bucket histogram durasi (detik) untuk eksposisi Prometheus
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, math.inf)
+
+# --- 1. Registry ---
+class _Timing:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+class MetricsRegistry:
+    """
+    Counter dan timing span per proses, aman dipakai dari banyak thread. Setiap metrik
+    diidentifikasi oleh nama + label (mis. ("http_responses", {"status": "200"})).
+    Jika log JSONL dikonfigurasi, setiap span dan counter juga ditulis sebagai satu baris.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+        self._log_file = None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def _log(self, record):
+        if self._log_file is not None:
+            self._log_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._log_file.flush()
+
+    def configure_log(self, path):
+        """Mulai (atau berhenti jika path None) menulis event metrik ke file JSON-lines."""
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+            self._log_file = open(path, "a", encoding="utf-8") if path else None
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._log({"ts": time.time(), "type": "counter", "name": name, "labels": dict(key[1]), "value": value})
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            timing = self._timings.get(key)
+            if timing is None:
+                timing = self._timings[key] = _Timing()
+            timing.observe(seconds)
+            self._log({"ts": time.time(), "type": "span", "name": name, "labels": dict(key[1]), "seconds": seconds})
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Mengukur durasi blok `with` sebagai timing `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+    def snapshot(self):
+        """Salinan seluruh metrik: {"counters": [...], "timings": [...]} (untuk UI / JSON)."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            timings = [
+                {"name": name, "labels": dict(labels), "count": t.count, "total": t.total,
+                 "mean": t.total / t.count if t.count else 0.0, "max": t.max, "buckets": list(t.buckets)}
+                for (name, labels), t in sorted(self._timings.items())
+            ]
+        return {"counters": counters, "timings": timings}
+
+    def load_log(self, path):
+        """Menjumlahkan ulang event dari log JSON-lines (mis. milik proses Streamlit) ke registry ini."""
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if event.get("type") == "counter":
+                    self.inc(event["name"], event.get("value", 1), **event.get("labels", {}))
+                elif event.get("type") == "span":
+                    self.observe(event["name"], event["seconds"], **event.get("labels", {}))
+
+# Registry bersama untuk seluruh proses
+METRICS = MetricsRegistry()
+inc = METRICS.inc
+observe = METRICS.observe
+span = METRICS.span
+snapshot = METRICS.snapshot
+
+if os.environ.get("BACDIVE_METRICS_LOG"):
+    METRICS.configure_log(os.environ["BACDIVE_METRICS_LOG"])
+
+# --- 2. Ringkasan & Eksposisi ---
+def hit_ratio(result_counts, hit="hit"):
+    """Rasio hit dari counter berlabel result=..., None jika belum ada lookup."""
+    total = sum(result_counts.values())
+    return result_counts.get(hit, 0) / total if total else None
+
+def counter_values(snap, name, label):
+    """{nilai label: jumlah} untuk satu counter, mis. counter_values(snap, "cache_lookups", "result")."""
+    values = {}
+    for c in snap["counters"]:
+        if c["name"] == name:
+            key = c["labels"].get(label, "")
+            values[key] = values.get(key, 0) + c["value"]
+    return values
+
+def _label_text(labels, extra=None):
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def prometheus_text(snap=None):
+    """Eksposisi format teks Prometheus: counter sebagai *_total, timing sebagai histogram *_seconds."""
+    snap = snap or snapshot()
+    lines = []
+    seen = set()
+    for c in snap["counters"]:
+        metric = f"{METRIC_PREFIX}_{c['name']}_total"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_label_text(c['labels'])} {c['value']}")
+    for t in snap["timings"]:
+        metric = f"{METRIC_PREFIX}_{t['name']}_seconds"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} histogram")
+            seen.add(metric)
+        cumulative = 0
+        for bound, n in zip(DURATION_BUCKETS, t["buckets"]):
+            cumulative += n
+            le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+            lines.append(f"{metric}_bucket{_label_text(t['labels'], {'le': le})} {cumulative}")
+        lines.append(f"{metric}_sum{_label_text(t['labels'])} {t['total']:.6f}")
+        lines.append(f"{metric}_count{_label_text(t['labels'])} {t['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,330 @@
+"""
+Server pengganti BacDive untuk uji beban lokal (tanpa jaringan).
+
+Menyajikan /taxon/<genus>, /fetch/<id[;id...]> dan endpoint token dari dokumen strain
+rekaman (folder berisi <id>.json) atau, jika tidak ada, dari profil di bacdive_cache.json
+yang diubah kembali menjadi dokumen berbentuk respons BacDive. Latensi, 429 (dengan
+Retry-After), 5xx, dan timeout bisa disuntikkan untuk mengukur throughput dan backoff.
+
+Contoh:
+    python mock_bacdive_server.py --port 8765 --latency 0.05 --rate-429 0.05
+    python cache_manager.py --api-url http://127.0.0.1:8765 --token-url http://127.0.0.1:8765/token fetch Aeromonas
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# --- 0. Konfigurasi Server ---
+DEFAULT_PORT = 8765
+TAXON_PAGE_SIZE = 100
+
+@dataclass
+class FaultConfig:
+    """Fault injection untuk endpoint data (/taxon dan /fetch). Rate berupa peluang 0..1."""
+    latency: float = 0.0
+    jitter: float = 0.0
+    rate_429: float = 0.0
+    retry_after: float = 1.0
+    rate_5xx: float = 0.0
+    rate_timeout: float = 0.0
+    timeout_seconds: float = 60.0
+    token_lifetime: int = 300
+    seed: int = None
+
+# --- 1. Sumber Dokumen Strain ---
+# Kebalikan dari extract_parameter_value: nama metabolit/enzim yang dibaca ulang oleh mapper
+_ENZYME_NAMES = {'Catalase': 'catalase', 'Oxidase': 'cytochrome oxidase', 'Urease': 'urease', 'DNase': 'DNase'}
+_METABOLITE_NAMES = {
+    'Glucose': 'D-glucose', 'Lactose': 'lactose', 'Sucrose': 'sucrose', 'Mannitol': 'D-mannitol',
+    'Sorbitol': 'D-sorbitol', 'Xylose': 'D-xylose', 'Arabinose': 'L-arabinose', 'Trehalose': 'trehalose',
+    'Maltose': 'maltose', 'Raffinose': 'raffinose', 'Nitrate_reduction': 'nitrate',
+}
+_SIGN = {'positive': '+', 'negative': '-', 'variable': '+/-'}
+
+def profile_to_document(strain_id, genus, profile):
+    """Menyusun dokumen /fetch minimal dari profil cache, sehingga extract_bacdive_data menghasilkan profil yang sama."""
+    name = str(profile.get('Nama Bakteri', f"{genus} sp.")).split()
+    species = name[1] if len(name) > 1 else "sp."
+    designation = " ".join(name[2:])
+
+    cell_morphology = {}
+    if profile.get('Gram_stain') in ('positive', 'negative'):
+        cell_morphology['gram stain'] = profile['Gram_stain']
+    if profile.get('Motility') in ('positive', 'negative'):
+        cell_morphology['motility'] = 'yes' if profile['Motility'] == 'positive' else 'no'
+
+    enzymes = [
+        {"value": enzyme, "activity": _SIGN[profile[param]]}
+        for param, enzyme in _ENZYME_NAMES.items() if profile.get(param) in _SIGN
+    ]
+    utilization = [
+        {"metabolite": metabolite, "utilization activity": _SIGN[profile[param]],
+         "kind of utilization tested": "builds acid from"}
+        for param, metabolite in _METABOLITE_NAMES.items() if profile.get(param) in _SIGN
+    ]
+    physiology = {"enzymes": enzymes, "metabolite utilization": utilization}
+    if profile.get('VP') in _SIGN:
+        physiology["metabolite tests"] = [{"metabolite": "acetoin", "voges-proskauer-test": _SIGN[profile['VP']]}]
+
+    document = {
+        "General": {"BacDive-ID": int(strain_id)},
+        "Name and taxonomic classification": {
+            "genus": genus,
+            "species": f"{genus} {species}",
+            "strain designation": designation,
+        },
+        "Morphology": {"cell morphology": cell_morphology},
+        "Physiology and metabolism": physiology,
+    }
+    temperature = profile.get('Temperature_range')
+    if isinstance(temperature, (list, tuple)) and len(temperature) == 2:
+        low, high = temperature
+        value = f"{low:g}" if low == high else f"{low:g}-{high:g}"
+        document["Culture and growth conditions"] = {
+            "culture temp": [{"growth": "positive", "type": "growth", "temperature": value}]
+        }
+    return document
+
+class DocumentStore:
+    """Dokumen strain per ID dan daftar ID per genus."""
+
+    def __init__(self):
+        self.documents = {}
+        self.genera = {}
+
+    def add(self, strain_id, genus, document):
+        strain_id = int(strain_id)
+        self.documents[strain_id] = document
+        ids = self.genera.setdefault(genus.lower(), [])
+        if strain_id not in ids:
+            ids.append(strain_id)
+
+    def load_cache_file(self, path):
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+        for genus, entry in cache.items():
+            if not isinstance(entry, dict):
+                continue
+            for strain_id, profile in entry.get('profiles', {}).items():
+                if str(strain_id).isdigit():
+                    self.add(strain_id, genus, profile_to_document(strain_id, genus, profile))
+
+    def load_recordings(self, directory):
+        """
+        Memuat dokumen rekaman: <id>.json (respons /fetch asli, boleh dibungkus {"results": {...}})
+        atau fixture hasil mode record (bacdive_client) untuk request /fetch.
+        """
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            strain_id = os.path.splitext(os.path.basename(path))[0]
+            with open(path, encoding="utf-8") as f:
+                document = json.load(f)
+            if {"url", "status", "text"} <= set(document):
+                match = re.search(r"/fetch/(\d+)/?$", document["url"])
+                if not match or document["status"] != 200:
+                    continue
+                strain_id, document = match.group(1), json.loads(document["text"])
+            elif not strain_id.isdigit():
+                continue
+            if isinstance(document.get("results"), dict) and document["results"]:
+                document = next(iter(document["results"].values()))
+            genus = document.get("Name and taxonomic classification", {}).get("genus")
+            if genus:
+                self.add(strain_id, genus, document)
+
+# --- 2. Server HTTP ---
+class MockBacDiveServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store, faults=None):
+        super().__init__(address, _Handler)
+        self.store = store
+        self.faults = faults or FaultConfig()
+        self.rng = random.Random(self.faults.seed)
+        self.tokens = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def draw_fault(self):
+        """Memilih fault untuk satu request: 'timeout', 429, 503, atau None."""
+        f = self.faults
+        with self.lock:
+            roll = self.rng.random()
+            delay = f.latency + (self.rng.uniform(-f.jitter, f.jitter) if f.jitter else 0.0)
+        if roll < f.rate_timeout:
+            return "timeout", delay
+        if roll < f.rate_timeout + f.rate_429:
+            return 429, delay
+        if roll < f.rate_timeout + f.rate_429 + f.rate_5xx:
+            return 503, delay
+        return None, delay
+
+    def issue_token(self):
+        access, refresh = secrets.token_hex(16), secrets.token_hex(16)
+        now = time.time()
+        with self.lock:
+            self.tokens[access] = now + self.faults.token_lifetime
+            self.tokens[refresh] = now + 10 * self.faults.token_lifetime
+        return {
+            "access_token": access, "expires_in": self.faults.token_lifetime,
+            "refresh_token": refresh, "refresh_expires_in": 10 * self.faults.token_lifetime,
+            "token_type": "Bearer",
+        }
+
+    def token_valid(self, token):
+        with self.lock:
+            return self.tokens.get(token, 0) > time.time()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(status)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        if not urlsplit(self.path).path.rstrip("/").endswith("/token"):
+            return self._send_json(404, {"message": "Not found"})
+        grant = form.get("grant_type")
+        if grant == "password" and form.get("username") and form.get("password"):
+            return self._send_json(200, self.server.issue_token())
+        if grant == "refresh_token" and self.server.token_valid(form.get("refresh_token")):
+            return self._send_json(200, self.server.issue_token())
+        if grant in ("password", "refresh_token"):
+            return self._send_json(401, {"error": "invalid_grant"})
+        return self._send_json(400, {"error": "unsupported_grant_type"})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if not parts:
+            return self._send_json(200, {"message": "Mock BacDive API"})
+        if parts == ["_stats"]:
+            with self.server.lock:
+                return self._send_json(200, {str(k): v for k, v in self.server.stats.items()})
+        if parts[0] not in ("taxon", "fetch"):
+            return self._send_json(404, {"message": "Not found"})
+
+        token = self.headers.get("Authorization", "").replace("Bearer ", "", 1)
+        if not self.server.token_valid(token):
+            return self._send_json(401, {"message": "Token tidak valid atau kedaluwarsa"})
+
+        fault, delay = self.server.draw_fault()
+        if delay > 0:
+            time.sleep(delay)
+        if fault == "timeout":
+            # Tidak ada respons: klien harus berhenti sendiri lewat timeout-nya
+            self.server.count("timeout")
+            time.sleep(self.server.faults.timeout_seconds)
+            self.close_connection = True
+            return
+        if fault == 429:
+            return self._send_json(429, {"message": "Too many requests"},
+                                   {"Retry-After": f"{self.server.faults.retry_after:g}"})
+        if fault == 503:
+            return self._send_json(503, {"message": "Service unavailable"})
+
+        if parts[0] == "taxon":
+            return self._taxon(parts[1:], parse_qs(url.query))
+        return self._fetch(parts[1:])
+
+    def _taxon(self, names, query):
+        if not names:
+            return self._send_json(404, {"message": "Genus tidak diberikan"})
+        ids = self.server.store.genera.get(names[0].lower())
+        if not ids:
+            return self._send_json(404, {"message": f"Taxon {names[0]} tidak ditemukan"})
+        page = int(query.get("page", ["0"])[0])
+        start = page * TAXON_PAGE_SIZE
+        next_url = None
+        if start + TAXON_PAGE_SIZE < len(ids):
+            next_url = f"{self.server.base_url}/taxon/{names[0]}?page={page + 1}"
+        return self._send_json(200, {
+            "count": len(ids), "next": next_url, "previous": None,
+            "results": [{"id": i} for i in ids[start:start + TAXON_PAGE_SIZE]],
+        })
+
+    def _fetch(self, ids):
+        if not ids:
+            return self._send_json(404, {"message": "ID tidak diberikan"})
+        wanted = [i for i in re.split(r"[;,]", ids[0]) if i.isdigit()]
+        results = {i: self.server.store.documents[int(i)] for i in wanted if int(i) in self.server.store.documents}
+        if not results:
+            return self._send_json(404, {"message": "Strain tidak ditemukan"})
+        return self._send_json(200, {"count": len(results), "next": None, "previous": None, "results": results})
+
+def start_mock_server(store, faults=None, host="127.0.0.1", port=0):
+    """Menjalankan server di thread daemon; port=0 memilih port bebas. Mengembalikan server (lihat .base_url)."""
+    server = MockBacDiveServer((host, port), store, faults)
+    threading.Thread(target=server.serve_forever, name="mock-bacdive", daemon=True).start()
+    return server
+
+# --- 3. CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Server BacDive tiruan dengan latensi dan fault injection.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache", default="bacdive_cache.json", help="Cache profil yang disajikan ulang sebagai dokumen strain")
+    parser.add_argument("--recordings", default=None, help="Folder dokumen /fetch rekaman (<id>.json), diutamakan daripada cache")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latensi per request (detik)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variasi latensi +/- (detik)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Peluang respons 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Nilai header Retry-After untuk 429 (detik)")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Peluang respons 503")
+    parser.add_argument("--rate-timeout", type=float, default=0.0, help="Peluang request tidak dijawab")
+    parser.add_argument("--timeout-seconds", type=float, default=60.0, help="Lama request 'timeout' ditahan")
+    parser.add_argument("--token-lifetime", type=int, default=300, help="Umur access token (detik)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed acak agar fault dapat diulang")
+    args = parser.parse_args()
+
+    store = DocumentStore()
+    if os.path.exists(args.cache):
+        store.load_cache_file(args.cache)
+    if args.recordings:
+        store.load_recordings(args.recordings)
+    faults = FaultConfig(
+        latency=args.latency, jitter=args.jitter, rate_429=args.rate_429, retry_after=args.retry_after,
+        rate_5xx=args.rate_5xx, rate_timeout=args.rate_timeout, timeout_seconds=args.timeout_seconds,
+        token_lifetime=args.token_lifetime, seed=args.seed,
+    )
+    server = MockBacDiveServer((args.host, args.port), store, faults)
+    print(f"Mock BacDive: {len(store.documents)} strain dari {len(store.genera)} genus di {server.base_url}")
+    print(f"  BACDIVE_API_URL={server.base_url} BACDIVE_TOKEN_URL={server.base_url}/token")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Pengganti Redis minimal (protokol RESP2, in-memory) untuk menguji cache bersama antar replika
+tanpa memasang server Redis.
+
+Hanya perintah yang dipakai cache_backend.RedisBackend yang didukung: PING, GET, SET (NX, PX, EX),
+MGET, DEL, PEXPIRE, INCR/INCRBY, SADD, SREM, SMEMBERS, EXISTS, FLUSHDB, MULTI/EXEC, plus CLIENT/SELECT
+sebagai no-op. EVAL hanya menerima skrip kunci milik RedisBackend (lepas/perpanjang kunci).
+
+    python mock_redis_server.py --port 6390
+    python cache_manager.py --cache-shared redis://127.0.0.1:6390/0 stats
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from cache_backend import LOCK_EXTEND_SCRIPT, LOCK_RELEASE_SCRIPT
+
+DEFAULT_PORT = 6390
+
+class _Error(Exception):
+    pass
+
+# --- 1. Penyimpanan ---
+class MemoryStore:
+    """Key-value + set dengan kedaluwarsa per key; semua operasi di bawah satu lock."""
+
+    def __init__(self):
+        # RLock: EXEC memegang lock selama seluruh transaksi, perintah di dalamnya mengambilnya lagi
+        self.lock = threading.RLock()
+        self.values = {}
+        self.expires = {}
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    def _string(self, key):
+        if not self._alive(key):
+            return None
+        value = self.values[key]
+        if not isinstance(value, bytes):
+            raise _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _set(self, key):
+        if not self._alive(key):
+            return set()
+        value = self.values[key]
+        if not isinstance(value, set):
+            raise _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def execute(self, command, args):
+        with self.lock:
+            handler = getattr(self, f"cmd_{command}", None)
+            if handler is None:
+                raise _Error(f"ERR unknown command '{command}'")
+            return handler(*args)
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_client(self, *args):
+        return "OK"
+
+    def cmd_select(self, *args):
+        return "OK"
+
+    def cmd_get(self, key):
+        return self._string(key)
+
+    def cmd_mget(self, *keys):
+        return [self._string(key) if self._alive(key) and isinstance(self.values[key], bytes) else None for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        ttl = None
+        if b"PX" in options:
+            ttl = int(options[options.index(b"PX") + 1]) / 1000
+        elif b"EX" in options:
+            ttl = int(options[options.index(b"EX") + 1])
+        if b"NX" in options and self._alive(key):
+            return None
+        self.values[key] = value
+        self.expires.pop(key, None)
+        if ttl is not None:
+            self.expires[key] = time.monotonic() + ttl
+        return "OK"
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self.values[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_pexpire(self, key, ms):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(ms) / 1000
+        return 1
+
+    def cmd_eval(self, script, numkeys, *args):
+        # Tanpa interpreter Lua: skrip RedisBackend dijalankan sebagai padanan Python-nya
+        keys, argv = args[:int(numkeys)], args[int(numkeys):]
+        script = script.decode()
+        if script not in (LOCK_RELEASE_SCRIPT, LOCK_EXTEND_SCRIPT):
+            raise _Error("ERR mock_redis_server hanya mendukung skrip kunci RedisBackend")
+        if self._string(keys[0]) != argv[0]:
+            return 0
+        if script == LOCK_RELEASE_SCRIPT:
+            return self.cmd_del(keys[0])
+        return self.cmd_pexpire(keys[0], argv[1])
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._alive(key))
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b"1")
+
+    def cmd_incrby(self, key, amount):
+        value = int(self._string(key) or 0) + int(amount)
+        self.values[key] = str(value).encode()
+        return value
+
+    def cmd_sadd(self, key, *members):
+        current = self._set(key)
+        added = len(set(members) - current)
+        self.values[key] = current | set(members)
+        return added
+
+    def cmd_srem(self, key, *members):
+        current = self._set(key)
+        removed = len(current & set(members))
+        if current:
+            self.values[key] = current - set(members)
+        return removed
+
+    def cmd_smembers(self, key):
+        return sorted(self._set(key))
+
+    def cmd_flushdb(self, *args):
+        self.values.clear()
+        self.expires.clear()
+        return "OK"
+
+# --- 2. Protokol RESP ---
+def _encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, _Error):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, int):
+        return b":" + str(value).encode() + b"\r\n"
+    if isinstance(value, bytes):
+        return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+    return b"*" + str(len(value)).encode() + b"\r\n" + b"".join(_encode(v) for v in value)
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Perintah inline (mis. dari telnet / redis-cli sederhana)
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _run(self, name, args):
+        try:
+            return self.server.store.execute(name, args)
+        except _Error as e:
+            return e
+        except (TypeError, ValueError, IndexError):
+            return _Error(f"ERR wrong arguments for '{name}' command")
+
+    def handle(self):
+        queued = None  # Perintah di antara MULTI dan EXEC
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            if not command:
+                continue
+            name, args = command[0].decode().lower(), command[1:]
+            if name == "multi":
+                queued, reply = [], "OK"
+            elif name == "discard":
+                queued, reply = None, "OK"
+            elif name == "exec":
+                if queued is None:
+                    reply = _Error("ERR EXEC without MULTI")
+                else:
+                    # Satu lock untuk seluruh transaksi, seperti eksekusi atomik di Redis
+                    with self.server.store.lock:
+                        reply = [self._run(n, a) for n, a in queued]
+                    queued = None
+            elif queued is not None:
+                queued.append((name, args))
+                reply = "QUEUED"
+            else:
+                reply = self._run(name, args)
+            self.wfile.write(_encode(reply))
+
+class MockRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, store=None):
+        super().__init__(address, _Handler)
+        self.store = store or MemoryStore()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+def start_mock_redis(host="127.0.0.1", port=0):
+    """Menjalankan server di thread daemon; port=0 memilih port bebas. Mengembalikan server (lihat .url)."""
+    server = MockRedisServer((host, port))
+    threading.Thread(target=server.serve_forever, name="mock-redis", daemon=True).start()
+    return server
+
+# --- 3. CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Pengganti Redis in-memory untuk uji cache bersama.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    server = MockRedisServer((args.host, args.port))
+    print(f"Mock Redis di {server.url}")
+    print(f"  BACDIVE_CACHE_SHARED_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
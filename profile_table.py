@@ -0,0 +1,70 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from bacdive_mapper import RANGE_PARAMS, TEST_CATEGORIES, get_param_keys
+
+# --- 0. Konfigurasi Tabel Detail ---
+ID_COLUMNS = ['bacdive_id', 'genus_input', 'Nama Bakteri']
+
+# --- 1. Tabel Kolumnar dari Profile Store ---
+def _range_bounds(value):
+    if isinstance(value, (tuple, list)) and len(value) == 2:
+        try:
+            return float(value[0]), float(value[1])
+        except (TypeError, ValueError):
+            pass
+    return np.nan, np.nan
+
+def build_profile_table(cache, genera):
+    """
+    Membangun tabel detail langsung dari isi cache, kolom per kolom tanpa menyalin profil.
+    Hasil uji disimpan sebagai kategori; rentang dipecah menjadi kolom float <param>_min/_max
+    (ditambah kolom kategori <param> jika ada nilai yang bukan rentang).
+    """
+    ids, genus_col, rows = [], [], []
+    for genus in genera:
+        profiles = cache.get(genus, {}).get('profiles', {})
+        for bacdive_id, profile in profiles.items():
+            if isinstance(profile, dict):
+                ids.append(str(bacdive_id))
+                genus_col.append(genus)
+                rows.append(profile)
+
+    columns = {
+        'bacdive_id': ids,
+        'genus_input': pd.Categorical(genus_col),
+        'Nama Bakteri': [p.get('Nama Bakteri', 'N/A') for p in rows],
+    }
+    for param in get_param_keys():
+        if param in RANGE_PARAMS:
+            values = [p.get(param) for p in rows]
+            bounds = np.array([_range_bounds(v) for v in values], dtype=float).reshape(-1, 2)
+            columns[f'{param}_min'] = bounds[:, 0]
+            columns[f'{param}_max'] = bounds[:, 1]
+            # Nilai yang bukan rentang (mis. NaCl_tolerance 'positive'/'negative') tetap ditampilkan
+            if any(isinstance(v, str) for v in values):
+                labels = [v if isinstance(v, str) else 'N/A' for v in values]
+                extras = sorted(set(labels) - set(TEST_CATEGORIES))
+                columns[param] = pd.Categorical(labels, categories=list(TEST_CATEGORIES) + extras)
+        else:
+            values = [p.get(param) or 'N/A' for p in rows]
+            extras = sorted(set(values) - set(TEST_CATEGORIES))
+            columns[param] = pd.Categorical(values, categories=list(TEST_CATEGORIES) + extras)
+    return pd.DataFrame(columns)
+
+# --- 2. Ekspor ---
+def profile_table_to_csv(df):
+    return df.to_csv(index=False).encode('utf-8')
+
+def profile_table_to_parquet(df):
+    """Membutuhkan pyarrow (atau fastparquet); ImportError diteruskan ke pemanggil."""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+EXPORTERS = {
+    'csv': ('bacdive_detailed_data.csv', 'text/csv', profile_table_to_csv),
+    'parquet': ('bacdive_detailed_data.parquet', 'application/vnd.apache.parquet', profile_table_to_parquet),
+}
@@ -0,0 +1,86 @@
+import threading
+
+import numpy as np
+
+from bacdive_mapper import RANGE_PARAMS, _overlap_ratio_many, cache_version, profile_range_matrix
+
+# Index terakhir per genus: (versi cache, dict profil, index). Dipakai ulang antar sampel
+# selama cache tidak berubah dan profil yang diminta adalah dict yang sama dari load_cache.
+_index_memo = {}
+_index_memo_lock = threading.Lock()
+
+# --- Index Rentang (Suhu, pH, NaCl) untuk Prefilter Kandidat ---
+class RangeIndex:
+    """
+    Index endpoint terurut atas rentang pertumbuhan profil BacDive.
+
+    Untuk setiap parameter rentang, kandidat diurutkan berdasarkan batas bawah sehingga
+    pencarian "rentang yang overlap dengan X minimal r" cukup dengan satu binary search
+    ditambah filter vektor, tanpa membandingkan kandidat satu per satu.
+    """
+
+    def __init__(self, profiles):
+        self.ids = np.array([str(bid) for bid in profiles.keys()], dtype=object)
+        profile_list = list(profiles.values())
+        self._params = {}
+        for param in RANGE_PARAMS:
+            ranges = profile_range_matrix(profile_list, param)
+            known = ~np.isnan(ranges).any(axis=1)
+            lo = np.minimum(ranges[known, 0], ranges[known, 1])
+            hi = np.maximum(ranges[known, 0], ranges[known, 1])
+            order = np.argsort(lo, kind='stable')
+            self._params[param] = {
+                'positions': np.flatnonzero(known)[order],
+                'lo': lo[order],
+                'hi': hi[order],
+                'unknown': np.flatnonzero(~known),
+            }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _query_positions(self, param, urange, min_ratio=0.0, keep_unknown=False):
+        data = self._params[param]
+        u_lo, u_hi = min(urange), max(urange)
+        # Hanya kandidat dengan batas bawah <= batas atas user yang mungkin overlap
+        end = np.searchsorted(data['lo'], u_hi, side='right')
+        lo, hi = data['lo'][:end], data['hi'][:end]
+        mask = hi >= u_lo
+        if min_ratio > 0:
+            ratios = _overlap_ratio_many(urange, np.column_stack((lo[mask], hi[mask])))
+            hits = data['positions'][:end][mask][ratios >= min_ratio]
+        else:
+            hits = data['positions'][:end][mask]
+        if keep_unknown:
+            hits = np.concatenate((hits, data['unknown']))
+        return hits
+
+    def filter_ids(self, user_ranges, min_ratio=0.0, keep_unknown=True):
+        """
+        Irisan hasil query untuk semua rentang yang diisi user (hasil parse_user_ranges).
+        Parameter tanpa input user tidak membatasi. Mengembalikan None jika tidak ada batasan.
+        """
+        selected = None
+        for param, urange in user_ranges.items():
+            if urange is None or param not in self._params:
+                continue
+            positions = self._query_positions(param, urange, min_ratio, keep_unknown)
+            selected = positions if selected is None else np.intersect1d(selected, positions)
+        if selected is None:
+            return None
+        return set(self.ids[selected])
+
+def get_range_index(genus, profiles):
+    """
+    Index rentang untuk profil genus, dibangun sekali per versi cache lalu dipakai ulang oleh
+    semua sampel genus tersebut (argsort hanya dibayar sekali, bukan per query).
+    """
+    version = cache_version()
+    with _index_memo_lock:
+        memo = _index_memo.get(genus)
+        if memo is not None and memo[0] == version and memo[1] is profiles:
+            return memo[2]
+    index = RangeIndex(profiles)
+    with _index_memo_lock:
+        _index_memo[genus] = (version, profiles, index)
+    return index
@@ -0,0 +1,245 @@
+import hashlib
+import io
+import json
+import re
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+import metrics
+
+# --- 0. Konfigurasi Laporan ---
+REPORT_FORMATS = {
+    "docx": ("laporan_identifikasi_lengkap.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "xlsx": ("laporan_identifikasi_lengkap.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "html": ("laporan_identifikasi_lengkap.html", "text/html"),
+    "csv": ("laporan_identifikasi_lengkap.zip", "application/zip"),
+}
+CANDIDATE_COLUMNS = ["Rank", "Nama Bakteri", "Persentase", "ID"]
+MAX_CACHED_REPORTS = 8
+
+# Karakter kontrol tidak valid di XML (DOCX/XLSX)
+_INVALID_XML_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# --- 1. Tabel Laporan ---
+def build_report_tables(all_sample_reports, top_n=10):
+    """
+    Menyusun tabel laporan dari hasil identifikasi: ringkasan (satu baris per sampel),
+    kandidat teratas per sampel, dan perbandingan detail vs kandidat utama.
+    Mengembalikan (summary_df, [(sample_name, top_result, kandidat_df, detail_df), ...]).
+    """
+    summary_data = []
+    samples = []
+    for report in all_sample_reports:
+        results = report['results']
+        if results:
+            top_res = results[0]
+            summary_data.append({
+                'Nama Sampel': report['sample_name'],
+                'Kandidat Teratas': top_res['Nama Bakteri'],
+                'Skor Kemiripan': f"{top_res['Persentase']:.2f}%"
+            })
+            kandidat_df = pd.DataFrame(results[:top_n])[CANDIDATE_COLUMNS]
+            detail_df = pd.DataFrame(top_res['details'])
+            samples.append((report['sample_name'], top_res, kandidat_df, detail_df))
+        else:
+            summary_data.append({
+                'Nama Sampel': report['sample_name'],
+                'Kandidat Teratas': 'Tidak ditemukan',
+                'Skor Kemiripan': 'N/A'
+            })
+            samples.append((report['sample_name'], None, pd.DataFrame(), pd.DataFrame()))
+    return pd.DataFrame(summary_data), samples
+
+def _long_tables(samples):
+    """Menggabungkan tabel per sampel menjadi dua tabel panjang dengan kolom 'Nama Sampel'."""
+    kandidat = [df.assign(**{'Nama Sampel': name}) for name, _, df, _ in samples if not df.empty]
+    detail = [df.assign(**{'Nama Sampel': name}) for name, _, _, df in samples if not df.empty]
+    kandidat_df = pd.concat(kandidat, ignore_index=True) if kandidat else pd.DataFrame()
+    detail_df = pd.concat(detail, ignore_index=True) if detail else pd.DataFrame()
+    for df in (kandidat_df, detail_df):
+        if not df.empty:
+            df.insert(0, 'Nama Sampel', df.pop('Nama Sampel'))
+    return kandidat_df, detail_df
+
+# --- 2. DOCX (tabel dibangun sekaligus sebagai XML) ---
+def _cell_xml(value):
+    text = escape(_INVALID_XML_RE.sub("", str(value)))
+    return (
+        '<w:tc><w:tcPr><w:tcW w:type="auto" w:w="0"/></w:tcPr>'
+        f'<w:p><w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p></w:tc>'
+    )
+
+def add_df_to_doc(document, df):
+    """
+    Menambahkan DataFrame sebagai tabel 'Table Grid'. Seluruh tabel disusun sebagai satu
+    string XML lalu di-parse sekali, jauh lebih cepat daripada mengisi sel satu per satu.
+    """
+    from docx.oxml import parse_xml
+    from docx.oxml.ns import nsdecls
+
+    if df.empty:
+        document.add_paragraph().add_run("[Tidak ada data]").italic = True
+        return
+    rows = [df.columns.tolist()] + df.astype(object).values.tolist()
+    body = "".join("<w:tr>" + "".join(_cell_xml(v) for v in row) + "</w:tr>" for row in rows)
+    tbl = parse_xml(
+        f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        f'</w:tblPr><w:tblGrid>{"<w:gridCol/>" * df.shape[1]}</w:tblGrid>{body}</w:tbl>'
+    )
+    document.element.body._insert_tbl(tbl)
+
+def build_docx_report(all_sample_reports):
+    from docx import Document
+
+    summary_df, samples = build_report_tables(all_sample_reports)
+    document = Document()
+    document.add_heading('Laporan Lengkap Identifikasi Bakteri', 0)
+    document.add_paragraph(f"Laporan dibuat pada: {datetime.now().strftime('%d %B %Y, %H:%M')}")
+
+    document.add_heading('Ringkasan Hasil Identifikasi', level=1)
+    add_df_to_doc(document, summary_df)
+
+    document.add_page_break()
+    document.add_heading('Detail Identifikasi per Sampel', level=1)
+
+    for sample_name, top_result, kandidat_df, detail_df in samples:
+        document.add_heading(f"Sampel: {sample_name}", level=2)
+        if top_result is None:
+            document.add_paragraph("Tidak ada hasil yang cocok ditemukan untuk sampel ini.")
+            document.add_paragraph('---')
+            continue
+
+        p = document.add_paragraph()
+        p.add_run('Identifikasi Utama: ').bold = True
+        p.add_run(f"{top_result['Nama Bakteri']} ({top_result['Persentase']:.2f}%)")
+
+        document.add_heading('Daftar Kandidat Teratas', level=3)
+        add_df_to_doc(document, kandidat_df)
+
+        document.add_heading('Laporan Perbandingan Detail (vs Kandidat Utama)', level=3)
+        add_df_to_doc(document, detail_df)
+        document.add_paragraph('')  # Spacer
+
+    doc_io = io.BytesIO()
+    document.save(doc_io)
+    return doc_io.getvalue()
+
+# --- 3. Format Ringan: XLSX, HTML, CSV (zip) ---
+def build_xlsx_report(all_sample_reports):
+    summary_df, samples = build_report_tables(all_sample_reports)
+    kandidat_df, detail_df = _long_tables(samples)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        summary_df.to_excel(writer, sheet_name="Ringkasan", index=False)
+        kandidat_df.to_excel(writer, sheet_name="Kandidat", index=False)
+        detail_df.to_excel(writer, sheet_name="Perbandingan", index=False)
+    return buffer.getvalue()
+
+def build_html_report(all_sample_reports):
+    summary_df, samples = build_report_tables(all_sample_reports)
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        "<title>Laporan Lengkap Identifikasi Bakteri</title>",
+        "<style>body{font-family:sans-serif}table{border-collapse:collapse;margin-bottom:1em}"
+        "td,th{border:1px solid #999;padding:2px 6px}</style></head><body>",
+        "<h1>Laporan Lengkap Identifikasi Bakteri</h1>",
+        f"<p>Laporan dibuat pada: {datetime.now().strftime('%d %B %Y, %H:%M')}</p>",
+        "<h2>Ringkasan Hasil Identifikasi</h2>",
+        summary_df.to_html(index=False),
+        "<h2>Detail Identifikasi per Sampel</h2>",
+    ]
+    for sample_name, top_result, kandidat_df, detail_df in samples:
+        parts.append(f"<h3>Sampel: {escape(str(sample_name))}</h3>")
+        if top_result is None:
+            parts.append("<p>Tidak ada hasil yang cocok ditemukan untuk sampel ini.</p>")
+            continue
+        parts.append(
+            f"<p><b>Identifikasi Utama:</b> {escape(str(top_result['Nama Bakteri']))} "
+            f"({top_result['Persentase']:.2f}%)</p>"
+        )
+        parts.append("<h4>Daftar Kandidat Teratas</h4>" + kandidat_df.to_html(index=False))
+        parts.append("<h4>Laporan Perbandingan Detail (vs Kandidat Utama)</h4>" + detail_df.to_html(index=False))
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+def build_csv_bundle(all_sample_reports):
+    summary_df, samples = build_report_tables(all_sample_reports)
+    kandidat_df, detail_df = _long_tables(samples)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr("ringkasan.csv", summary_df.to_csv(index=False))
+        bundle.writestr("kandidat.csv", kandidat_df.to_csv(index=False))
+        bundle.writestr("perbandingan.csv", detail_df.to_csv(index=False))
+    return buffer.getvalue()
+
+_BUILDERS = {
+    "docx": build_docx_report,
+    "xlsx": build_xlsx_report,
+    "html": build_html_report,
+    "csv": build_csv_bundle,
+}
+
+def build_report(all_sample_reports, fmt="docx"):
+    """Membangun laporan dalam format `fmt` dan mengembalikan isinya sebagai bytes."""
+    if fmt not in _BUILDERS:
+        raise ValueError(f"Format laporan tidak dikenal: {fmt}")
+    with metrics.span("report_build", format=fmt):
+        return _BUILDERS[fmt](all_sample_reports)
+
+def report_format_for_path(path):
+    """Format laporan dari ekstensi file (.zip = csv); ValueError jika tidak didukung."""
+    ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+    fmt = "csv" if ext == "zip" else ext
+    if fmt not in _BUILDERS:
+        raise ValueError(f"Format laporan tidak dikenal: .{ext or '?'} (pilihan: .docx, .xlsx, .html, .zip)")
+    return fmt
+
+def write_report(all_sample_reports, path, fmt=None):
+    """Menulis laporan ke file; format diambil dari ekstensi jika tidak diberikan (.zip = csv)."""
+    if fmt is None:
+        fmt = report_format_for_path(path)
+    with open(path, "wb") as f:
+        f.write(build_report(all_sample_reports, fmt))
+    return fmt
+
+# --- 4. Pembuatan di Latar Belakang, Di-cache per Hash Hasil ---
+def results_hash(all_sample_reports):
+    """Hash stabil dari hasil identifikasi (nama sampel, kandidat, detail) untuk kunci cache laporan."""
+    digest = hashlib.sha256()
+    for report in all_sample_reports:
+        results = report['results']
+        payload = {
+            "sample": report['sample_name'],
+            "candidates": [[r.get(c) for c in CANDIDATE_COLUMNS] for r in results[:10]],
+            "details": results[0]['details'] if results else None,
+        }
+        digest.update(json.dumps(payload, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="report-builder")
+_report_jobs = OrderedDict()
+_report_jobs_lock = threading.Lock()
+
+def submit_report(all_sample_reports, fmt="docx"):
+    """
+    Menjadwalkan pembuatan laporan di thread latar belakang dan mengembalikan Future.
+    Hasil yang sama (hash identik) dengan format yang sama memakai Future yang sudah ada.
+    """
+    key = (results_hash(all_sample_reports), fmt)
+    with _report_jobs_lock:
+        future = _report_jobs.get(key)
+        if future is not None and not (future.done() and future.exception() is not None):
+            _report_jobs.move_to_end(key)
+            return future
+        future = _executor.submit(build_report, all_sample_reports, fmt)
+        _report_jobs[key] = future
+        while len(_report_jobs) > MAX_CACHED_REPORTS:
+            _report_jobs.popitem(last=False)
+    return future
@@ -0,0 +1,113 @@
+import re
+
+from bacdive_mapper import (
+    RANGE_PARAMS,
+    _parse_range,
+    get_param_keys,
+    load_cache,
+    profiles_fingerprint,
+    save_cache,
+)
+
+# Proporsi minimal (dari strain yang punya data) agar konsensus dianggap positive/negative.
+# Di bawah ambang ini hasil uji spesies dianggap 'variable'.
+CONSENSUS_THRESHOLD = 0.8
+
+_TAG_RE = re.compile(r"</?i>", re.IGNORECASE)
+
+# --- 1. Kunci Spesies ---
+def species_key(name):
+    """
+    Mengambil nama spesies (genus + epitet, plus subspesies bila ada) dari 'Nama Bakteri'.
+    Contoh: 'Streptococcus agalactiae Lehmann and Neumann 1896' -> 'Streptococcus agalactiae'.
+    """
+    tokens = _TAG_RE.sub("", str(name or "")).split()
+    if not tokens:
+        return "Unknown"
+    if len(tokens) == 1 or not tokens[1][:1].islower():
+        return tokens[0]
+    key = tokens[:2]
+    if len(tokens) >= 4 and tokens[2] == "subsp.":
+        key = tokens[:4]
+    return " ".join(key)
+
+# --- 2. Profil Konsensus ---
+def _consensus_call(counts):
+    known = counts['positive'] + counts['negative'] + counts['variable']
+    if known == 0:
+        return 'N/A'
+    if counts['positive'] / known >= CONSENSUS_THRESHOLD:
+        return 'positive'
+    if counts['negative'] / known >= CONSENSUS_THRESHOLD:
+        return 'negative'
+    return 'variable'
+
+def build_species_consensus(profiles):
+    """
+    Menggabungkan profil strain menjadi satu profil konsensus per spesies.
+
+    Setiap profil konsensus memiliki kunci parameter yang sama dengan profil strain
+    (sehingga bisa dinilai dengan calculate_weighted_similarity), ditambah:
+      - 'strain_ids': daftar ID strain anggota spesies
+      - 'frequencies': {param: {'positive', 'negative', 'variable', 'n'}} dalam proporsi
+    Parameter rentang diringkas menjadi rentang gabungan (min terendah, max tertinggi).
+    """
+    param_keys = get_param_keys()
+    groups = {}
+    for bacdive_id, profile in profiles.items():
+        if not isinstance(profile, dict):
+            continue
+        key = species_key(profile.get('Nama Bakteri'))
+        groups.setdefault(key, []).append((str(bacdive_id), profile))
+
+    consensus = {}
+    for key, members in groups.items():
+        species_profile = {
+            'Nama Bakteri': key,
+            'strain_ids': [bid for bid, _ in members],
+            'frequencies': {},
+        }
+        for param in param_keys:
+            if param in RANGE_PARAMS:
+                ranges = [_parse_range(p.get(param)) for _, p in members]
+                ranges = [r for r in ranges if r is not None]
+                species_profile[param] = (
+                    (min(min(r) for r in ranges), max(max(r) for r in ranges)) if ranges else None
+                )
+                continue
+
+            counts = {'positive': 0, 'negative': 0, 'variable': 0}
+            for _, p in members:
+                value = p.get(param)
+                if value in counts:
+                    counts[value] += 1
+            known = sum(counts.values())
+            species_profile[param] = _consensus_call(counts)
+            species_profile['frequencies'][param] = {
+                **{k: (v / known if known else 0.0) for k, v in counts.items()},
+                'n': known,
+            }
+        consensus[key] = species_profile
+    return consensus
+
+def get_species_profiles(genus, profiles):
+    """
+    Mengembalikan profil konsensus spesies untuk genus, disimpan di cache di samping
+    profil strain (kunci 'species'). Dibangun ulang jika belum ada atau isi profil strain
+    berubah (dibandingkan lewat profiles_fingerprint, bukan hanya jumlah strain).
+    """
+    cache = load_cache()
+    entry = cache.get(genus)
+    fingerprint = profiles_fingerprint(profiles)
+    if isinstance(entry, dict):
+        species = entry.get('species')
+        if isinstance(species, dict) and entry.get('species_fingerprint') == fingerprint:
+            return species
+
+    species = build_species_consensus(profiles)
+    if isinstance(entry, dict) and entry.get('profiles'):
+        entry['species'] = species
+        entry['species_fingerprint'] = fingerprint
+        entry.pop('species_strain_count', None)
+        save_cache(cache)
+    return species
@@ -0,0 +1,75 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from bacdive_mapper import fetch_and_cache_profiles_by_taxonomy, load_cache
+
+# --- Startup: Timing per Fase & Warm-up di Latar Belakang ---
+class NullPlaceholder:
+    """Meniru st.empty() tanpa menampilkan apa pun (untuk fetch di thread latar belakang)."""
+    def text(self, message):
+        pass
+
+    def success(self, message):
+        pass
+
+    def warning(self, message):
+        pass
+
+    def error(self, message):
+        pass
+
+    def empty(self):
+        pass
+
+class StartupTimer:
+    """Mencatat durasi setiap fase startup (detik). Aman dipakai dari beberapa thread."""
+
+    def __init__(self):
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases[name] = seconds
+        print(f"[STARTUP] {name}: {seconds:.3f} s")
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.phases)
+
+def _warm_up(session, prefetch_genera, timer):
+    with timer.phase("warmup: load_cache"):
+        cache = load_cache()
+    if not prefetch_genera or session is None:
+        return
+    with timer.phase(f"warmup: prefetch {len(prefetch_genera)} genus"):
+        placeholder = NullPlaceholder()
+        for genus in prefetch_genera:
+            try:
+                fetch_and_cache_profiles_by_taxonomy(session, genus, placeholder)
+            except Exception as e:
+                print(f"[STARTUP] Prefetch genus {genus} gagal: {e}")
+    print(f"[STARTUP] Cache siap: {len(cache)} genus (sebelum prefetch)")
+
+def start_background_warmup(session, prefetch_genera=(), timer=None):
+    """
+    Memuat profile store (dan opsional mengambil genus di `prefetch_genera`) di thread daemon,
+    sehingga upload pertama tidak menunggu parsing cache atau download.
+    """
+    thread = threading.Thread(
+        target=_warm_up,
+        args=(session, list(prefetch_genera), timer or StartupTimer()),
+        name="cache-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread